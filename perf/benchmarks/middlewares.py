@@ -0,0 +1,59 @@
+"""
+Chains of middlewares, handling requests with six middlewares that only call
+the next handler.
+"""
+
+from functools import partial
+
+from shuttleasgi import Application, Router
+from shuttleasgi.testing.helpers import get_example_scope
+from shuttleasgi.testing.messages import MockReceive, MockSend
+from perf.benchmarks import async_benchmark, main_run
+
+ITERATIONS = 10000
+MIDDLEWARES_COUNT = 6
+
+
+async def passthrough_middleware(request, handler):
+    return await handler(request)
+
+
+async def test_app_handle_with_middlewares(application: Application):
+    scope = get_example_scope("GET", "/test")
+    mock_send = MockSend()
+    await application(scope, MockReceive(), mock_send)
+    assert mock_send.messages[1]["body"] == b"Hello, World!"
+
+
+async def benchmark_app_handle_with_middlewares(iterations=ITERATIONS):
+    application = Application(router=Router())
+    application.middlewares.extend([passthrough_middleware] * MIDDLEWARES_COUNT)
+    application.router.add_get("/test", lambda _: "Hello, World!")
+    await application.start()
+    return await async_benchmark(
+        partial(test_app_handle_with_middlewares, application), iterations
+    )
+
+
+async def test_middlewares_chain(chain, request):
+    await chain(request)
+
+
+async def benchmark_middlewares_chain(iterations=ITERATIONS * 10):
+    from shuttleasgi.messages import Request
+    from shuttleasgi.middlewares import get_middlewares_chain
+
+    async def handler(request):
+        return None
+
+    chain = get_middlewares_chain(
+        [passthrough_middleware] * MIDDLEWARES_COUNT, handler
+    )
+    request = Request("GET", b"/test", None)
+    return await async_benchmark(
+        partial(test_middlewares_chain, chain, request), iterations
+    )
+
+
+if __name__ == "__main__":
+    main_run(benchmark_app_handle_with_middlewares)
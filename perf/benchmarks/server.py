@@ -0,0 +1,101 @@
+"""
+Benchmarks comparing the native HTTP server with uvicorn, serving the same
+application over a keep-alive connection.
+"""
+
+import asyncio
+
+from shuttleasgi.server import Application
+from shuttleasgi.server.native import create_socket, serve
+from shuttleasgi.server.responses import json
+from perf.benchmarks import async_benchmark, main_run
+
+try:
+    import uvicorn
+except ImportError:  # pragma: no cover
+    uvicorn = None
+
+ITERATIONS = 2000
+
+REQUEST = b"GET / HTTP/1.1\r\nhost: localhost\r\n\r\n"
+
+
+def get_app() -> Application:
+    app = Application()
+
+    @app.router.get("/")
+    async def home():
+        return json({"object": "model", "id": "gpt-4o", "owned_by": "shuttleai"})
+
+    return app
+
+
+async def _send_request(reader, writer) -> bytes:
+    writer.write(REQUEST)
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = int(head.lower().split(b"content-length: ")[1].split(b"\r\n")[0])
+    return await reader.readexactly(length)
+
+
+async def _benchmark_server(start_server, iterations: int):
+    sock = create_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    stop = await start_server(sock)
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        return await async_benchmark(
+            lambda: _send_request(reader, writer), iterations
+        )
+    finally:
+        writer.close()
+        await stop()
+
+
+async def _start_native_server(sock):
+    started = asyncio.Event()
+    task = asyncio.create_task(serve(get_app(), sock=sock, started=started))
+    await started.wait()
+
+    async def stop():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    return stop
+
+
+async def _start_uvicorn_server(sock):
+    config = uvicorn.Config(get_app(), log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    async def stop():
+        server.should_exit = True
+        await task
+
+    return stop
+
+
+async def benchmark_native_server(iterations=ITERATIONS):
+    return await _benchmark_server(_start_native_server, iterations)
+
+
+if uvicorn is not None:
+
+    async def benchmark_uvicorn_server(iterations=ITERATIONS):
+        return await _benchmark_server(_start_uvicorn_server, iterations)
+
+
+async def main():
+    await benchmark_native_server(ITERATIONS)
+    if uvicorn is not None:
+        await benchmark_uvicorn_server(ITERATIONS)
+
+
+if __name__ == "__main__":
+    main_run(main)
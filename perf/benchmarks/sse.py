@@ -0,0 +1,69 @@
+"""
+Benchmarks testing the client decoder of Server-Sent Events streams.
+"""
+
+from shuttleasgi.client.sse import SSEDecoder
+from shuttleasgi.contents import DONEServerSentEvent, ServerSentEvent
+from shuttleasgi.scribe import write_sse
+from perf.benchmarks import main_run, sync_benchmark
+
+ITERATIONS = 1000
+
+# an OpenAI style stream of chat completion chunks, as proxied from upstreams
+STREAM = b"".join(
+    write_sse(
+        ServerSentEvent(
+            {
+                "id": "chatcmpl-0123456789",
+                "object": "chat.completion.chunk",
+                "model": "gpt-4o",
+                "choices": [{"index": 0, "delta": {"content": f"token {i} "}}],
+            }
+        )
+    )
+    for i in range(200)
+) + write_sse(DONEServerSentEvent())
+
+# network chunks rarely align with events
+CHUNKS = [STREAM[i : i + 1500] for i in range(0, len(STREAM), 1500)]
+SMALL_CHUNKS = [STREAM[i : i + 37] for i in range(0, len(STREAM), 37)]
+
+
+def decode_stream(chunks):
+    decoder = SSEDecoder()
+    events = []
+    for chunk in chunks:
+        events.extend(decoder.feed(chunk))
+    return events
+
+
+def test_decode_sse_stream():
+    return decode_stream(CHUNKS)
+
+
+def test_decode_sse_stream_small_chunks():
+    return decode_stream(SMALL_CHUNKS)
+
+
+def benchmark_decode_sse_stream(iterations=ITERATIONS):
+    return sync_benchmark(test_decode_sse_stream, iterations)
+
+
+def benchmark_decode_sse_stream_small_chunks(iterations=ITERATIONS):
+    return sync_benchmark(test_decode_sse_stream_small_chunks, iterations)
+
+
+async def main():
+    for name, fn in (
+        ("decode_sse_stream", benchmark_decode_sse_stream),
+        ("decode_sse_stream_small_chunks", benchmark_decode_sse_stream_small_chunks),
+    ):
+        result = fn(ITERATIONS)
+        print(
+            f"{name}: {result['avg_time'] * 1e6:.2f} µs per stream, "
+            f"{len(STREAM) / result['avg_time'] / 1e6:.1f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main_run(main)
@@ -4,9 +4,13 @@ Benchmarks testing functions used to write response bytes.
 
 from pathlib import Path
 
-from shuttleasgi.contents import TextContent
+from shuttleasgi.contents import Content, TextContent
 from shuttleasgi.messages import Response
-from shuttleasgi.scribe import write_response
+from shuttleasgi.scribe import (
+    DEFAULT_RESPONSE_CHUNK_THRESHOLD,
+    send_asgi_response,
+    write_response,
+)
 from perf.benchmarks import async_benchmark, main_run
 
 ITERATIONS = 10000
@@ -43,6 +47,35 @@ async def test_write_small_response():
     return data
 
 
+# a large JSON body, like a batch of embeddings
+SMALL_CHUNK_SIZE = 61440
+LARGE_BODY = b'{"data": [' + b", ".join([b"0.0123456789"] * 40000) + b"]}"
+
+
+async def _noop_send(message):
+    pass
+
+
+async def test_send_asgi_large_response():
+    response = Response(200).with_content(Content(b"application/json", LARGE_BODY))
+    await send_asgi_response(response, _noop_send, DEFAULT_RESPONSE_CHUNK_THRESHOLD)
+
+
+async def test_send_asgi_large_response_small_chunks():
+    response = Response(200).with_content(Content(b"application/json", LARGE_BODY))
+    await send_asgi_response(response, _noop_send, SMALL_CHUNK_SIZE)
+
+
+async def benchmark_send_asgi_large_response(iterations=ITERATIONS):
+    return await async_benchmark(test_send_asgi_large_response, iterations)
+
+
+async def benchmark_send_asgi_large_response_small_chunks(iterations=ITERATIONS):
+    return await async_benchmark(
+        test_send_asgi_large_response_small_chunks, iterations
+    )
+
+
 async def benchmark_write_small_response(iterations=ITERATIONS):
     return await async_benchmark(test_write_small_response, iterations)
 
@@ -54,6 +87,8 @@ async def benchmark_write_text_response(iterations=ITERATIONS):
 async def main():
     await benchmark_write_text_response(ITERATIONS)
     await benchmark_write_small_response(ITERATIONS)
+    await benchmark_send_asgi_large_response(ITERATIONS)
+    await benchmark_send_asgi_large_response_small_chunks(ITERATIONS)
 
 
 if __name__ == "__main__":
@@ -47,7 +47,12 @@ def main():
         "shuttleasgi/contents.pyx",
         "shuttleasgi/messages.pyx",
         "shuttleasgi/scribe.pyx",
+        "shuttleasgi/metrics.pyx",
         "shuttleasgi/baseapp.pyx",
+        "shuttleasgi/client/sse.pyx",
+        "shuttleasgi/context.pyx",
+        "shuttleasgi/utils/ids.pyx",
+        "shuttleasgi/middlewares/pipeline.pyx",
         "shuttleasgi/middlewares/shuttle_headers.pyx",
         "shuttleasgi/validation/sai/common.pyx",
         "shuttleasgi/validation/sai/chat.pyx"
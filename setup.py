@@ -51,11 +51,36 @@ if platform.python_implementation() == "CPython" and not skip_ext:
             ["shuttleasgi/scribe.c"],
             extra_compile_args=COMPILE_ARGS,
         ),
+        Extension(
+            "shuttleasgi.context",
+            ["shuttleasgi/context.c"],
+            extra_compile_args=COMPILE_ARGS,
+        ),
+        Extension(
+            "shuttleasgi.utils.ids",
+            ["shuttleasgi/utils/ids.c"],
+            extra_compile_args=COMPILE_ARGS,
+        ),
+        Extension(
+            "shuttleasgi.metrics",
+            ["shuttleasgi/metrics.c"],
+            extra_compile_args=COMPILE_ARGS,
+        ),
         Extension(
             "shuttleasgi.baseapp",
             ["shuttleasgi/baseapp.c"],
             extra_compile_args=COMPILE_ARGS,
         ),
+        Extension(
+            "shuttleasgi.client.sse",
+            ["shuttleasgi/client/sse.c"],
+            extra_compile_args=COMPILE_ARGS,
+        ),
+        Extension(
+            "shuttleasgi.middlewares.pipeline",
+            ["shuttleasgi/middlewares/pipeline.c"],
+            extra_compile_args=COMPILE_ARGS,
+        ),
         Extension(
             "shuttleasgi.middlewares.shuttle_headers",
             ["shuttleasgi/middlewares/shuttle_headers.c"],
@@ -2,11 +2,14 @@
 
 from .exceptions cimport HTTPException
 from .messages cimport Request, Response
+from .metrics cimport RequestMetrics
 
 cdef class BaseApplication:
     cdef public bint show_error_details
     cdef readonly object router
     cdef readonly object logger
+    cdef public RequestMetrics metrics
+    cdef public object access_log
     cdef public dict exceptions_handlers
     cdef object _default_404
     cdef object _default_405
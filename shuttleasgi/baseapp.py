@@ -1,7 +1,8 @@
 import http
 import logging
+import time
 
-from .contents import Content, TextContent, JSONContent
+from .contents import Content, JSONContent, StreamedContent, TextContent
 from .exceptions import HTTPException, InternalServerError, NotFound, WrongMethod
 from .messages import Response
 from .utils import get_class_instance_hierarchy
@@ -88,6 +89,8 @@ class BaseApplication:
         self.exceptions_handlers = self.init_exceptions_handlers()
         self.show_error_details = show_error_details
         self.logger = get_logger()
+        self.metrics = None
+        self.access_log = None
 
     def init_exceptions_handlers(self):
         default_handlers = {405: handle_wrong_method, 404: handle_not_found, 400: handle_bad_request}
@@ -123,6 +126,11 @@ class BaseApplication:
             )
 
     async def handle(self, request):
+        metrics = self.metrics
+        access_log = self.access_log
+        if metrics is not None or access_log is not None:
+            start = time.perf_counter()
+
         route = self.router.get_match(request)
         if route:
             request.route_values = route.values
@@ -137,7 +145,21 @@ class BaseApplication:
             response = await not_found_handler(self, request, None)
             if not response:
                 response = Response(404)
-        return response or Response(204)
+
+        response = response or Response(204)
+        if metrics is not None or access_log is not None:
+            duration = time.perf_counter() - start
+            pattern = route.pattern if route is not None else None
+            if metrics is not None:
+                route_metrics = metrics.record(
+                    request.method, pattern, response.status, duration
+                )
+                if isinstance(response.content, StreamedContent):
+                    # streamed bodies are measured while they are sent
+                    response.route_metrics = route_metrics
+            if access_log is not None:
+                access_log.record(request, response, pattern, duration)
+        return response
 
     async def handle_request_handler_exception(self, request, exc):
         if isinstance(exc, HTTPException):
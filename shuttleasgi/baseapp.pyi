@@ -3,7 +3,9 @@ from typing import Awaitable, Callable, Dict, Optional, Type, TypeVar, Union
 
 from shuttleasgi.exceptions import HTTPException
 from shuttleasgi.messages import Request, Response
+from shuttleasgi.server.accesslog import AccessLog
 from shuttleasgi.server.application import Application
+from shuttleasgi.metrics import RequestMetrics
 from shuttleasgi.server.routing import RouteMatch, Router
 
 ExcT = TypeVar("ExcT", bound=Exception)
@@ -17,6 +19,8 @@ class BaseApplication:
     router: Router
     exceptions_handlers: ExceptionHandlersType
     show_error_details: bool
+    metrics: Optional[RequestMetrics]
+    access_log: Optional[AccessLog]
     _default_404: Callable
     _default_405: Callable
     
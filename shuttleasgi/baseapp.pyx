@@ -5,8 +5,9 @@
 import http
 import logging
 import time
+from time import perf_counter
 
-from .contents cimport Content, TextContent, JSONContent
+from .contents cimport Content, JSONContent, StreamedContent, TextContent
 from .exceptions cimport BadRequest, HTTPException, InternalServerError, NotFound, WrongMethod
 from .messages cimport Request, Response
 from .context import RequestContext, _request_context
@@ -92,6 +93,8 @@ cdef class BaseApplication:
         self._default_405 = self.exceptions_handlers.get(405, handle_wrong_method)
         self.show_error_details = show_error_details
         self.logger = get_logger()
+        self.metrics = None
+        self.access_log = None
 
     def init_exceptions_handlers(self):
         default_handlers = {
@@ -133,6 +136,13 @@ cdef class BaseApplication:
         cdef Response response
         cdef set allowed_methods
         cdef bytes path_bytes = request._path
+        cdef RequestMetrics metrics = self.metrics
+        cdef object access_log = self.access_log
+        cdef double start = 0, duration
+        cdef object pattern
+
+        if metrics is not None or access_log is not None:
+            start = perf_counter()
 
         route = self.router.get_match(request)
         if route is not None:
@@ -157,7 +167,22 @@ cdef class BaseApplication:
             if response is None:
                 response = Response(404)
 
-        return response or Response(204)
+        if response is None:
+            response = Response(204)
+
+        if metrics is not None or access_log is not None:
+            duration = perf_counter() - start
+            pattern = route.pattern if route is not None else None
+            if metrics is not None:
+                route_metrics = metrics.record(
+                    request.method, pattern, response.status, duration
+                )
+                if isinstance(response.content, StreamedContent):
+                    # streamed bodies are measured while they are sent
+                    response.route_metrics = route_metrics
+            if access_log is not None:
+                access_log.record(request, response, pattern, duration)
+        return response
 
     async def handle_request_handler_exception(self, request, exc):
         if isinstance(exc, HTTPException):
@@ -4,3 +4,18 @@ from .session import ConnectionTimeout as ConnectionTimeout
 from .session import MaximumRedirectsExceededError as MaximumRedirectsExceededError
 from .session import MissingLocationForRedirect as MissingLocationForRedirect
 from .session import RequestTimeout as RequestTimeout
+from .sse import IncomingServerSentEvent as IncomingServerSentEvent
+from .sse import SSEDecoder as SSEDecoder
+from .sse import read_sse as read_sse
+from .dns import DNSCache as DNSCache
+from .policies import HedgingPolicy as HedgingPolicy
+from .policies import RetryBudget as RetryBudget
+from .policies import RetryPolicy as RetryPolicy
+from .policies import TimeoutPolicy as TimeoutPolicy
+from .policies import deadline_scope as deadline_scope
+from .compression import DecompressionMiddleware as DecompressionMiddleware
+from .breaker import CircuitBreakerMiddleware as CircuitBreakerMiddleware
+from .breaker import CircuitBreakers as CircuitBreakers
+from .exceptions import CircuitOpenError as CircuitOpenError
+from .balancing import Upstream as Upstream
+from .exceptions import UpstreamSaturatedError as UpstreamSaturatedError
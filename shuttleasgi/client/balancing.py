@@ -0,0 +1,211 @@
+"""
+This module implements client-side load balancing for the ClientSession,
+across the endpoints of a logical upstream, such as the replicas of a
+service:
+
+    upstream = Upstream(
+        "models",
+        ["http://10.0.0.1:8000", "http://10.0.0.2:8000"],
+        strategy="least-outstanding",
+    )
+    session = ClientSession(upstreams=[upstream])
+
+    response = await session.get("http://models/v1/models")
+
+Requests whose host is the name of an upstream are sent to one of its
+endpoints, each backed by its own ConnectionPool. The Host header of the
+request keeps the name of the upstream.
+"""
+
+import random
+from abc import ABC, abstractmethod
+from itertools import count
+from typing import Iterable, List, Optional, Sequence, Union
+
+from shuttleasgi import URL
+
+from .breaker import CircuitBreaker, CircuitBreakers
+from .exceptions import CircuitOpenError, UpstreamSaturatedError
+from .pool import ConnectionPool, ConnectionPools
+
+
+class LoadBalancingStrategy(ABC):
+    """
+    Base class for strategies selecting the endpoint for a request, among the
+    connection pools of the endpoints of an upstream.
+    """
+
+    @abstractmethod
+    def select(self, pools: Sequence[ConnectionPool]) -> ConnectionPool:
+        """Returns the pool of the endpoint that should handle a request."""
+
+
+class RoundRobinStrategy(LoadBalancingStrategy):
+    """
+    Selects the endpoints in turn.
+    """
+
+    def __init__(self) -> None:
+        self._counter = count()
+
+    def select(self, pools: Sequence[ConnectionPool]) -> ConnectionPool:
+        return pools[next(self._counter) % len(pools)]
+
+
+class LeastOutstandingStrategy(LoadBalancingStrategy):
+    """
+    Selects the endpoint with the least requests in flight. Ties are broken
+    in turn, to not always favour the first endpoints.
+    """
+
+    def __init__(self) -> None:
+        self._counter = count()
+
+    def select(self, pools: Sequence[ConnectionPool]) -> ConnectionPool:
+        size = len(pools)
+        offset = next(self._counter) % size
+        selected = pools[offset]
+        least = selected.in_flight
+
+        for i in range(1, size):
+            pool = pools[(offset + i) % size]
+            in_flight = pool.in_flight
+            if in_flight < least:
+                selected = pool
+                least = in_flight
+        return selected
+
+
+class PowerOfTwoChoicesStrategy(LoadBalancingStrategy):
+    """
+    Selects two endpoints at random, and uses the one with less requests in
+    flight. This avoids scanning all the endpoints, and avoids herding on the
+    least loaded one when many clients share the same endpoints.
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None) -> None:
+        self._rng = rng or random.Random()
+
+    def select(self, pools: Sequence[ConnectionPool]) -> ConnectionPool:
+        if len(pools) == 1:
+            return pools[0]
+        first, second = self._rng.sample(pools, 2)
+        return first if first.in_flight <= second.in_flight else second
+
+
+STRATEGIES = {
+    "round-robin": RoundRobinStrategy,
+    "least-outstanding": LeastOutstandingStrategy,
+    "power-of-two-choices": PowerOfTwoChoicesStrategy,
+}
+
+
+def get_strategy(
+    strategy: Union[None, str, LoadBalancingStrategy],
+) -> LoadBalancingStrategy:
+    if strategy is None:
+        return RoundRobinStrategy()
+    if isinstance(strategy, LoadBalancingStrategy):
+        return strategy
+    try:
+        return STRATEGIES[strategy]()
+    except KeyError:
+        raise ValueError(
+            f"Invalid load balancing strategy: {strategy}. "
+            "Valid strategies: " + ", ".join(STRATEGIES)
+        )
+
+
+class Upstream:
+    """
+    A logical upstream, whose requests are balanced across a list of
+    endpoints.
+
+    Parameters
+    ----------
+    name: str
+        The name of the upstream, used as host in the URLs of its requests.
+    endpoints: Iterable[Union[str, bytes, URL]]
+        The base URLs of the endpoints, for example "http://10.0.0.1:8000".
+    strategy: Union[None, str, LoadBalancingStrategy]
+        The balancing strategy: "round-robin" (default), "least-outstanding",
+        "power-of-two-choices", or an instance of LoadBalancingStrategy.
+    max_in_flight: Optional[int]
+        If specified, endpoints with this number of requests in flight don't
+        receive more requests; UpstreamSaturatedError is raised when all the
+        endpoints are saturated.
+    breakers: Optional[CircuitBreakers]
+        If specified, a circuit breaker is kept for each endpoint, recording
+        the outcome of the requests it handles, and endpoints whose circuit is
+        open don't receive requests; CircuitOpenError is raised when the
+        circuits of all the endpoints are open.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        endpoints: Iterable[Union[str, bytes, URL]],
+        strategy: Union[None, str, LoadBalancingStrategy] = None,
+        max_in_flight: Optional[int] = None,
+        breakers: Optional[CircuitBreakers] = None,
+    ) -> None:
+        self.name = name
+        self.endpoints = [self._get_endpoint_url(value) for value in endpoints]
+        if not self.endpoints:
+            raise ValueError("An upstream requires at least one endpoint.")
+        self.strategy = get_strategy(strategy)
+        self.max_in_flight = max_in_flight
+        self.breakers = breakers
+
+    @staticmethod
+    def _get_endpoint_url(value: Union[str, bytes, URL]) -> URL:
+        if isinstance(value, str):
+            value = value.encode()
+        url = value if isinstance(value, URL) else URL(value)
+        if not url.is_absolute:
+            raise ValueError("The endpoints of an upstream must be absolute URLs.")
+        return url
+
+    def get_pools(self, pools: ConnectionPools, ssl=None) -> List[ConnectionPool]:
+        """
+        Returns the connection pools of the endpoints of this upstream.
+        """
+        return [
+            pools.get_pool(url.schema, url.host, url.port, ssl)
+            for url in self.endpoints
+        ]
+
+    def select(self, pools: Sequence[ConnectionPool]) -> ConnectionPool:
+        """
+        Selects the connection pool of the endpoint for a request.
+        """
+        max_in_flight = self.max_in_flight
+        if max_in_flight is not None:
+            pools = [pool for pool in pools if pool.in_flight < max_in_flight]
+            if not pools:
+                raise UpstreamSaturatedError(self.name, max_in_flight)
+
+        breakers = self.breakers
+        if breakers is None:
+            return self.strategy.select(pools)
+
+        candidates = list(pools)
+        while candidates:
+            pool = self.strategy.select(candidates)
+            if breakers.get_for_pool(pool).allow():
+                return pool
+            candidates.remove(pool)
+
+        raise CircuitOpenError(
+            URL(self.endpoints[0].schema + b"://" + self.name.encode()),
+            min(breakers.get_for_pool(pool).retry_after for pool in pools),
+        )
+
+    def get_breaker(self, pool: ConnectionPool) -> Optional[CircuitBreaker]:
+        """
+        Returns the circuit breaker of the endpoint of the given connection
+        pool, if this upstream keeps circuit breakers.
+        """
+        if self.breakers is None:
+            return None
+        return self.breakers.get_for_pool(pool)
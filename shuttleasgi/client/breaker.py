@@ -0,0 +1,299 @@
+"""
+This module implements circuit breakers for the ClientSession, to fail fast
+the requests directed to origins that are failing, or responding too slowly,
+instead of waiting for connection errors or timeouts.
+
+    breakers = CircuitBreakers()
+    session = ClientSession(middlewares=[CircuitBreakerMiddleware(breakers)])
+
+Circuit breakers are kept per origin, using the same (scheme, host, port) key
+of the connection pools. For upstreams balanced across endpoints, circuit
+breakers are kept per endpoint by passing them to the Upstream, so that
+endpoints whose circuit is open are skipped by the load balancer:
+
+    upstream = Upstream("models", endpoints, breakers=CircuitBreakers())
+"""
+
+import time
+from collections import deque
+from enum import Enum
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Collection,
+    Deque,
+    Dict,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from shuttleasgi.messages import Request, Response
+
+from .connection import ConnectionException
+from .exceptions import CircuitOpenError
+from .pool import ConnectionPool, get_pool_key
+
+DEFAULT_FAILURE_STATUSES = frozenset({502, 503, 504})
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of the latest calls to an origin, in a sliding window.
+    The circuit opens when the failure rate in the window reaches
+    `failure_rate_threshold`, or after `consecutive_failures` failures in a
+    row. Calls slower than `slow_call_duration` count as failures, to eject
+    slow outliers. While open, calls are refused; after `open_duration` the
+    circuit becomes half-open and lets `half_open_max_calls` probe calls
+    through: if they succeed the circuit closes, otherwise it opens again,
+    doubling the open duration up to `max_open_duration`.
+    """
+
+    __slots__ = (
+        "failure_rate_threshold",
+        "minimum_calls",
+        "consecutive_failures",
+        "slow_call_duration",
+        "open_duration",
+        "max_open_duration",
+        "half_open_max_calls",
+        "_state",
+        "_outcomes",
+        "_failures",
+        "_consecutive_failures",
+        "_current_open_duration",
+        "_opened_at",
+        "_probes",
+    )
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        minimum_calls: int = 10,
+        window_size: int = 50,
+        consecutive_failures: int = 5,
+        slow_call_duration: Optional[float] = None,
+        open_duration: float = 5.0,
+        max_open_duration: float = 60.0,
+        half_open_max_calls: int = 1,
+    ) -> None:
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.consecutive_failures = consecutive_failures
+        self.slow_call_duration = slow_call_duration
+        self.open_duration = open_duration
+        self.max_open_duration = max_open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CircuitState.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window_size)
+        self._failures = 0
+        self._consecutive_failures = 0
+        self._current_open_duration = open_duration
+        self._opened_at = 0.0
+        self._probes = 0
+
+    @property
+    def state(self) -> CircuitState:
+        if (
+            self._state is CircuitState.OPEN
+            and time.monotonic() >= self._opened_at + self._current_open_duration
+        ):
+            return CircuitState.HALF_OPEN
+        return self._state
+
+    @property
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._failures / len(self._outcomes)
+
+    @property
+    def retry_after(self) -> float:
+        """
+        Returns the number of seconds before the circuit becomes half-open.
+        """
+        if self._state is not CircuitState.OPEN:
+            return 0.0
+        return max(
+            0.0, self._opened_at + self._current_open_duration - time.monotonic()
+        )
+
+    def allow(self) -> bool:
+        """
+        Returns a value indicating whether a call can be made, registering a
+        probe call if the circuit is half-open.
+        """
+        state = self._state
+
+        if state is CircuitState.CLOSED:
+            return True
+
+        if state is CircuitState.OPEN:
+            if time.monotonic() < self._opened_at + self._current_open_duration:
+                return False
+            self._state = CircuitState.HALF_OPEN
+            self._probes = 0
+
+        if self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return True
+        return False
+
+    def on_success(self, duration: float) -> None:
+        if self.slow_call_duration is not None and duration >= self.slow_call_duration:
+            self.on_failure()
+            return
+
+        if self._state is CircuitState.HALF_OPEN:
+            self._close()
+            return
+
+        self._consecutive_failures = 0
+        self._record(False)
+
+    def on_failure(self) -> None:
+        if self._state is CircuitState.HALF_OPEN:
+            self._open(min(self._current_open_duration * 2, self.max_open_duration))
+            return
+
+        if self._state is CircuitState.OPEN:
+            return
+
+        self._consecutive_failures += 1
+        self._record(True)
+
+        if self._consecutive_failures >= self.consecutive_failures or (
+            len(self._outcomes) >= self.minimum_calls
+            and self.failure_rate >= self.failure_rate_threshold
+        ):
+            self._open(self.open_duration)
+
+    def on_cancelled(self) -> None:
+        """
+        Handles a call that ended without an outcome, releasing its probe.
+        """
+        if self._state is CircuitState.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def _record(self, failure: bool) -> None:
+        outcomes = self._outcomes
+        if len(outcomes) == outcomes.maxlen and outcomes[0]:
+            self._failures -= 1
+        outcomes.append(failure)
+        if failure:
+            self._failures += 1
+
+    def _open(self, duration: float) -> None:
+        self._state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self._current_open_duration = duration
+        self._probes = 0
+
+    def _close(self) -> None:
+        self._state = CircuitState.CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+        self._consecutive_failures = 0
+        self._current_open_duration = self.open_duration
+        self._probes = 0
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "failure_rate": self.failure_rate,
+            "calls": len(self._outcomes),
+            "consecutive_failures": self._consecutive_failures,
+            "retry_after": self.retry_after,
+        }
+
+
+class CircuitBreakers:
+    """
+    Keeps the circuit breakers of origins, keyed like connection pools. The
+    given options are used to create the circuit breaker of each origin.
+    """
+
+    def __init__(self, **options: Any) -> None:
+        self.options = options
+        self._breakers: Dict[Tuple[bytes, bytes, int], CircuitBreaker] = {}
+
+    def get(self, scheme: bytes, host: bytes, port: Optional[int]) -> CircuitBreaker:
+        key = get_pool_key(scheme, host, port)
+        try:
+            return self._breakers[key]
+        except KeyError:
+            breaker = CircuitBreaker(**self.options)
+            self._breakers[key] = breaker
+            return breaker
+
+    def get_for_pool(self, pool: ConnectionPool) -> CircuitBreaker:
+        """
+        Returns the circuit breaker of the origin of the given connection pool.
+        """
+        return self.get(pool.scheme, pool.host.encode(), pool.port)
+
+    def get_info(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns information about the state of the circuit breakers, by origin.
+        """
+        return {
+            f"{scheme.decode()}://{host.decode()}:{port}": breaker.get_info()
+            for (scheme, host, port), breaker in self._breakers.items()
+        }
+
+
+class CircuitBreakerMiddleware:
+    """
+    Client middleware that refuses requests to origins whose circuit is open,
+    raising CircuitOpenError immediately. Connection errors and responses
+    with a status in `failure_statuses` are recorded as failures.
+
+    Breakers are keyed by the origin of the request URL: for upstreams, whose
+    requests are balanced across endpoints, configure the Upstream with
+    CircuitBreakers instead, to keep a circuit breaker per endpoint.
+    """
+
+    def __init__(
+        self,
+        breakers: Optional[CircuitBreakers] = None,
+        failure_statuses: Collection[int] = DEFAULT_FAILURE_STATUSES,
+        failure_exceptions: Tuple[Type[BaseException], ...] = (
+            ConnectionException,
+            OSError,
+        ),
+    ) -> None:
+        self.breakers = breakers or CircuitBreakers()
+        self.failure_statuses = frozenset(failure_statuses)
+        self.failure_exceptions = failure_exceptions
+
+    async def __call__(
+        self, request: Request, next_handler: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        url = request.url
+        breaker = self.breakers.get(url.schema, url.host, url.port)
+
+        if not breaker.allow():
+            raise CircuitOpenError(url.base_url(), breaker.retry_after)
+
+        start = time.perf_counter()
+        try:
+            response = await next_handler(request)
+        except self.failure_exceptions:
+            breaker.on_failure()
+            raise
+        except BaseException:
+            breaker.on_cancelled()
+            raise
+
+        if response.status in self.failure_statuses:
+            breaker.on_failure()
+        else:
+            breaker.on_success(time.perf_counter() - start)
+        return response
@@ -0,0 +1,296 @@
+"""
+This module implements the negotiation of compressed responses for the
+ClientSession, with streaming decompression of response bodies.
+"""
+
+import asyncio
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Type
+
+from shuttleasgi.messages import Request, Response
+
+from .connection import IncomingContent
+from .exceptions import DecompressedContentTooLarge
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    from compression import zstd  # Python >= 3.14
+except ImportError:  # pragma: no cover
+    zstd = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class Decompressor(ABC):
+    """
+    Base class for decompressors of a content encoding. Decompressors are
+    stateful, and handle chunks of a compressed stream.
+    """
+
+    @abstractmethod
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        """
+        Decompresses a chunk, producing up to about max_length bytes: when
+        more output would follow, the decompressed content is too large.
+        """
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class ZlibDecompressor(Decompressor):
+    wbits = zlib.MAX_WBITS
+
+    def __init__(self) -> None:
+        self._obj = zlib.decompressobj(self.wbits)
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        # NB: max_length prevents allocating the whole output of a bomb
+        return self._obj.decompress(data, max_length)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+class GzipDecompressor(ZlibDecompressor):
+    wbits = zlib.MAX_WBITS | 16
+
+
+class DeflateDecompressor(ZlibDecompressor):
+    """
+    Decompresses deflate content, zlib-wrapped as specified by RFC 9110, or
+    raw like sent by some servers.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._head = b""
+        self._checked = False
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        if self._checked:
+            return self._obj.decompress(data, max_length)
+
+        # the first two bytes tell whether the stream has a zlib header
+        self._head += data
+        if len(self._head) < 2:
+            return b""
+        data, self._head = self._head, b""
+        self._checked = True
+        try:
+            return self._obj.decompress(data, max_length)
+        except zlib.error:
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._obj.decompress(data, max_length)
+
+
+class BrotliDecompressor(Decompressor):
+    def __init__(self) -> None:
+        self._obj = brotli.Decompressor()
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        return self._obj.process(data, output_buffer_limit=max_length)
+
+
+class _OutputLimitReached(Exception):
+    pass
+
+
+class _BoundedSink:
+    """
+    Collects the output of a zstandard stream writer, stopping the
+    decompression when the output reaches the limit.
+    """
+
+    __slots__ = ("parts", "size", "limit")
+
+    def __init__(self) -> None:
+        self.parts: List[bytes] = []
+        self.size = 0
+        self.limit = 0
+
+    def write(self, data: bytes) -> int:
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        if self.size >= self.limit:
+            raise _OutputLimitReached()
+        return len(data)
+
+    def take(self) -> bytes:
+        value = b"".join(self.parts)
+        self.parts.clear()
+        self.size = 0
+        return value
+
+
+class ZstdDecompressor(Decompressor):
+    def __init__(self) -> None:
+        if zstd is not None:
+            self._obj = zstd.ZstdDecompressor()
+            self._sink = None
+        else:
+            # zstandard cannot limit the output of a decompressobj call: a
+            # stream writer writes the output in chunks of write_size to a
+            # sink, which stops the call when max_length is reached
+            self._sink = _BoundedSink()
+            self._obj = zstandard.ZstdDecompressor().stream_writer(
+                self._sink, write_size=65536
+            )
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        sink = self._sink
+        if sink is None:
+            return self._obj.decompress(data, max_length)
+
+        sink.limit = max_length
+        try:
+            self._obj.write(data)
+        except _OutputLimitReached:
+            pass
+        return sink.take()
+
+
+def _get_available_decompressors() -> Dict[bytes, Type[Decompressor]]:
+    decompressors: Dict[bytes, Type[Decompressor]] = {}
+    if zstd is not None or zstandard is not None:
+        decompressors[b"zstd"] = ZstdDecompressor
+    if brotli is not None:
+        decompressors[b"br"] = BrotliDecompressor
+    decompressors[b"gzip"] = GzipDecompressor
+    decompressors[b"deflate"] = DeflateDecompressor
+    return decompressors
+
+
+AVAILABLE_DECOMPRESSORS = _get_available_decompressors()
+
+
+class ContentDecoder:
+    """
+    Decodes the chunks of a compressed response body, as they are read,
+    enforcing a maximum size for the decompressed content. Chunks larger than
+    `thread_threshold` are decompressed in an executor, to not block the
+    event loop.
+    """
+
+    __slots__ = ("decompressor", "max_size", "thread_threshold", "executor", "size")
+
+    def __init__(
+        self,
+        decompressor: Decompressor,
+        max_size: int,
+        thread_threshold: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        self.decompressor = decompressor
+        self.max_size = max_size
+        self.thread_threshold = thread_threshold
+        self.executor = executor
+        self.size = 0
+
+    def _decompress(self, data: bytes) -> bytes:
+        remaining = self.max_size - self.size
+        # ask for one byte more than allowed, to detect bombs
+        value = self.decompressor.decompress(data, remaining + 1)
+        self.size += len(value)
+        if self.size > self.max_size:
+            raise DecompressedContentTooLarge(self.max_size)
+        return value
+
+    async def decode(self, data: bytes) -> bytes:
+        if self.thread_threshold is not None and len(data) >= self.thread_threshold:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._decompress, data
+            )
+        return self._decompress(data)
+
+    async def flush(self) -> bytes:
+        value = self.decompressor.flush()
+        self.size += len(value)
+        if self.size > self.max_size:
+            raise DecompressedContentTooLarge(self.max_size)
+        return value
+
+
+class DecompressionMiddleware:
+    """
+    Client middleware that advertises the supported content encodings in the
+    `Accept-Encoding` request header, and decompresses response bodies while
+    they are read. The `Content-Encoding` and `Content-Length` headers of
+    decompressed responses are removed, since they describe the compressed
+    content.
+
+    Parameters
+    ----------
+    encodings: Optional[Iterable[str]]
+        The encodings to accept, by order of preference. By default, all the
+        available encodings: zstd and br are available only if their optional
+        libraries are installed.
+    max_size: int
+        The maximum size of a decompressed response body, in bytes.
+    thread_threshold: Optional[int]
+        If specified, compressed chunks of this size or larger are decompressed
+        in an executor.
+    executor: Optional[Executor]
+        The executor to use for decompression, defaults to the loop executor.
+    """
+
+    def __init__(
+        self,
+        encodings: Optional[Iterable[str]] = None,
+        max_size: int = 100 * 1024 * 1024,
+        thread_threshold: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        if encodings is None:
+            self.decompressors = dict(AVAILABLE_DECOMPRESSORS)
+        else:
+            self.decompressors = {}
+            for encoding in encodings:
+                key = encoding.encode("ascii").lower()
+                try:
+                    self.decompressors[key] = AVAILABLE_DECOMPRESSORS[key]
+                except KeyError:
+                    raise ValueError(
+                        f"Unsupported content encoding: {encoding}. Available "
+                        "encodings: "
+                        + ", ".join(x.decode() for x in AVAILABLE_DECOMPRESSORS)
+                    )
+        self.max_size = max_size
+        self.thread_threshold = thread_threshold
+        self.executor = executor
+        self.accept_encoding = b", ".join(self.decompressors)
+
+    def get_decoder(self, content_encoding: bytes) -> Optional[ContentDecoder]:
+        try:
+            decompressor_type = self.decompressors[content_encoding.strip().lower()]
+        except KeyError:
+            return None
+        return ContentDecoder(
+            decompressor_type(), self.max_size, self.thread_threshold, self.executor
+        )
+
+    async def __call__(
+        self, request: Request, next_handler: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        if not request.has_header(b"accept-encoding"):
+            request.add_header(b"accept-encoding", self.accept_encoding)
+
+        response = await next_handler(request)
+
+        content_encoding = response.get_first_header(b"content-encoding")
+        if content_encoding and isinstance(response.content, IncomingContent):
+            decoder = self.get_decoder(content_encoding)
+            if decoder is not None:
+                response.content.decoder = decoder
+                response.remove_header(b"content-encoding")
+                response.remove_header(b"content-length")
+        return response
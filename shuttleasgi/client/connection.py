@@ -12,6 +12,7 @@ from shuttleasgi.scribe import (
     request_has_body,
     write_request,
     write_request_body_only,
+    write_request_parts,
     write_request_without_body,
     write_small_request,
 )
@@ -38,12 +39,14 @@ class HTTPResponseParserProtocol(Protocol):
 
 
 class IncomingContent(Content):
-    def __init__(self, content_type: bytes):
+    def __init__(self, content_type: bytes, connection=None):
         super().__init__(content_type, b"")
         self._body = bytearray()
         self._chunk = asyncio.Event()
         self.complete = asyncio.Event()
         self._exc: Optional[Exception] = None
+        self._connection = connection
+        self.decoder = None
 
     @property
     def exc(self) -> Optional[Exception]:
@@ -68,7 +71,38 @@ class IncomingContent(Content):
         self._body.extend(chunk)
         self._chunk.set()
 
+    def dispose(self) -> None:
+        """
+        Discards a body that is not going to be read. If the body was not
+        received completely, its connection is closed, since it cannot be
+        used for other request-response cycles.
+        """
+        connection = self._connection
+        self._connection = None
+        if connection is not None and not self.complete.is_set():
+            connection.close()
+
     async def stream(self):
+        if self.decoder is not None:
+            async for chunk in self._stream_decoded():
+                yield chunk
+            return
+
+        async for chunk in self._stream_raw():
+            yield chunk
+
+    async def _stream_decoded(self):
+        # the body is decompressed as chunks are read, not when received
+        async for chunk in self._stream_raw():
+            data = await self.decoder.decode(chunk)
+            if data:
+                yield data
+
+        data = await self.decoder.flush()
+        if data:
+            yield data
+
+    async def _stream_raw(self):
         completed = False
         while not completed:
             await self._chunk.wait()
@@ -93,6 +127,13 @@ class IncomingContent(Content):
 
     async def read(self):
         await self.complete.wait()
+        if self.decoder is not None:
+            decoder = self.decoder
+            data = await decoder.decode(bytes(self._body)) + await decoder.flush()
+            # keep the decoded body, for the case it is read again
+            self._body = bytearray(data)
+            self.decoder = None
+            return data
         return bytes(self._body)
 
 
@@ -281,6 +322,22 @@ class ClientConnection(asyncio.Protocol):
                 await self.writable.wait()
             self.transport.write(chunk)
 
+    async def _write_parts(self, parts) -> Optional[Response]:
+        # the request head and the first part of the body are written together,
+        # the body is written using memoryview slices: it is never copied
+        self.transport.writelines(parts[:2])
+
+        for part in parts[2:]:
+            if self._can_release:
+                return await self._wait_response()
+
+            if not self.open:
+                raise ConnectionClosedError(False)
+
+            if self.writing_paused:
+                await self.writable.wait()
+            self.transport.write(part)
+
     async def _send_body(self, request: Request) -> None:
         await self._write_chunks(request, write_request_body_only)
 
@@ -306,7 +363,11 @@ class ClientConnection(asyncio.Protocol):
         if is_small_request(request):
             self.transport.write(write_small_request(request))
         else:
-            response = await self._write_chunks(request, write_request)
+            parts = write_request_parts(request)
+            if parts is not None:
+                response = await self._write_parts(parts)
+            else:
+                response = await self._write_chunks(request, write_request)
 
             if response is not None:
                 # this happens if the server sent a response before we completed
@@ -328,6 +389,12 @@ class ClientConnection(asyncio.Protocol):
                 self.transport.close()
 
             self.parser = None
+            self._discard()
+
+    def _discard(self) -> None:
+        pool = self.pool()
+        if pool is not None:
+            pool.discard_connection(self)
 
     def data_received(self, data: bytes) -> None:
         try:
@@ -340,6 +407,7 @@ class ClientConnection(asyncio.Protocol):
         self._connection_lost = True
         self.ready.clear()
         self.open = False
+        self._discard()
 
         # if the client was handling a stream, we need to stop the loop
         if self.response is not None and isinstance(
@@ -363,7 +431,8 @@ class ClientConnection(asyncio.Protocol):
                 (
                     self.response.get_first_header(b"content-type")
                     or b"application/octet-stream"
-                )
+                ),
+                self,
             )
         self.response_ready.set()
 
@@ -0,0 +1,247 @@
+"""
+This module implements the resolution of host names for client connections,
+with a cache shared by connection pools, and a happy eyeballs algorithm to
+connect to the resolved addresses (RFC 8305).
+"""
+
+import asyncio
+import ipaddress
+import socket
+import time
+from abc import ABC, abstractmethod
+from asyncio import AbstractEventLoop
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from shuttleasgi.utils.aio import get_running_loop
+
+# (address family, socket address)
+AddressInfo = Tuple[int, tuple]
+
+
+class Resolver(ABC):
+    """
+    Base class for classes that resolve host names into socket addresses.
+    """
+
+    @abstractmethod
+    async def resolve(self, host: str, port: int) -> Tuple[List[AddressInfo], float]:
+        """
+        Resolves the given host name, returning the list of addresses and the
+        number of seconds for which they can be cached.
+        """
+
+
+class SystemResolver(Resolver):
+    """
+    Resolves host names using the getaddrinfo function of the event loop.
+    Since getaddrinfo does not expose the TTL of DNS records, the configured
+    ttl is used.
+    """
+
+    def __init__(self, ttl: float = 60.0) -> None:
+        self.ttl = ttl
+
+    async def resolve(self, host: str, port: int) -> Tuple[List[AddressInfo], float]:
+        infos = await get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+        return [(info[0], info[4]) for info in infos], self.ttl
+
+
+class StaticResolver(Resolver):
+    """
+    Resolves host names using a static map of IP addresses, useful for local
+    development and tests.
+    """
+
+    def __init__(self, records: Dict[str, List[str]], ttl: float = 60.0) -> None:
+        self.records = records
+        self.ttl = ttl
+        self.calls = 0
+
+    async def resolve(self, host: str, port: int) -> Tuple[List[AddressInfo], float]:
+        self.calls += 1
+        try:
+            ips = self.records[host]
+        except KeyError:
+            raise socket.gaierror(socket.EAI_NONAME, f"Unknown host: {host}")
+        return [get_address_info(ip, port) for ip in ips], self.ttl
+
+
+def get_address_info(ip: str, port: int) -> AddressInfo:
+    if ipaddress.ip_address(ip).version == 6:
+        return socket.AF_INET6, (ip, port, 0, 0)
+    return socket.AF_INET, (ip, port)
+
+
+def _get_ip_address_info(host: str, port: int) -> Optional[AddressInfo]:
+    try:
+        return get_address_info(host.strip("[]"), port)
+    except ValueError:
+        return None
+
+
+class DNSCache:
+    """
+    Caches the addresses of host names, respecting the TTL returned by the
+    resolver. Concurrent resolutions of the same host are coalesced into a
+    single call to the resolver, running in a task shared by the callers, so
+    that a caller giving up does not cancel the resolution for the others.
+    Resolutions in progress are tracked per event loop, therefore a cache can
+    be shared by event loops.
+    """
+
+    def __init__(
+        self,
+        resolver: Optional[Resolver] = None,
+        max_ttl: float = 300.0,
+    ) -> None:
+        self.resolver = resolver or SystemResolver()
+        self.max_ttl = max_ttl
+        self._entries: Dict[Tuple[str, int], Tuple[List[AddressInfo], float]] = {}
+        self._pending: Dict[Tuple[AbstractEventLoop, str, int], asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def resolve(self, host: str, port: int) -> List[AddressInfo]:
+        ip_address_info = _get_ip_address_info(host, port)
+        if ip_address_info is not None:
+            return [ip_address_info]
+
+        entry = self._entries.get((host, port))
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+
+        loop = get_running_loop()
+        pending_key = (loop, host, port)
+        task = self._pending.get(pending_key)
+        if task is None:
+            task = loop.create_task(self._resolve(host, port))
+            self._pending[pending_key] = task
+            task.add_done_callback(partial(self._on_resolved, pending_key))
+        # cancelling a caller does not cancel the shared task
+        return await asyncio.shield(task)
+
+    async def _resolve(self, host: str, port: int) -> List[AddressInfo]:
+        addresses, ttl = await self.resolver.resolve(host, port)
+        if not addresses:
+            raise socket.gaierror(
+                socket.EAI_NODATA, f"No addresses found for host: {host}"
+            )
+        ttl = min(ttl, self.max_ttl)
+        if ttl > 0:
+            self._entries[(host, port)] = (addresses, time.monotonic() + ttl)
+        return addresses
+
+    def _on_resolved(
+        self, pending_key: Tuple[AbstractEventLoop, str, int], task: asyncio.Task
+    ) -> None:
+        if self._pending.get(pending_key) is task:
+            del self._pending[pending_key]
+        # mark the exception as retrieved, for the case nobody is waiting
+        if not task.cancelled():
+            task.exception()
+
+    def invalidate(self, host: str, port: int) -> None:
+        self._entries.pop((host, port), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def interleave_addresses(addresses: Sequence[AddressInfo]) -> List[AddressInfo]:
+    """
+    Reorders the given addresses alternating address families, starting with
+    the family of the first address (RFC 8305 section 4).
+    """
+    if not addresses:
+        return []
+
+    first_family = addresses[0][0]
+    preferred = [item for item in addresses if item[0] == first_family]
+    others = [item for item in addresses if item[0] != first_family]
+    result = []
+    for index in range(max(len(preferred), len(others))):
+        if index < len(preferred):
+            result.append(preferred[index])
+        if index < len(others):
+            result.append(others[index])
+    return result
+
+
+async def _connect_socket(
+    loop: AbstractEventLoop, address_info: AddressInfo
+) -> socket.socket:
+    family, address = address_info
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.setblocking(False)
+        await loop.sock_connect(sock, address)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def _close_late_socket(task: asyncio.Future) -> None:
+    # an attempt can complete between its cancellation and its end
+    if not task.cancelled() and task.exception() is None:
+        task.result().close()
+
+
+async def connect_happy_eyeballs(
+    loop: AbstractEventLoop,
+    addresses: Sequence[AddressInfo],
+    delay: float = 0.25,
+) -> socket.socket:
+    """
+    Connects a socket to the first address that accepts the connection: a new
+    attempt is started every time an attempt fails, or when the previous one
+    is not completed after the given delay. Pending attempts are cancelled
+    as soon as one succeeds.
+    """
+    remaining = interleave_addresses(addresses)
+    running: Set[asyncio.Future] = set()
+    errors: List[BaseException] = []
+    winner: Optional[socket.socket] = None
+
+    try:
+        while remaining or running:
+            if remaining:
+                running.add(
+                    loop.create_task(_connect_socket(loop, remaining.pop(0)))
+                )
+
+            done, running = await asyncio.wait(
+                running,
+                timeout=delay if remaining else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+
+            for task in done:
+                error = task.exception()
+                if error is not None:
+                    errors.append(error)
+                elif winner is None:
+                    winner = task.result()
+                else:
+                    task.result().close()
+
+            if winner is not None:
+                return winner
+    finally:
+        for task in running:
+            task.cancel()
+            task.add_done_callback(_close_late_socket)
+
+    if len(errors) == 1:
+        raise errors[0]
+    raise OSError(
+        "Multiple exceptions: {}".format(", ".join(str(error) for error in errors))
+    )
+
+
+# cache shared by all connection pools that are not configured explicitly
+DEFAULT_DNS_CACHE = DNSCache()
@@ -26,6 +26,8 @@ class ConnectionTimeout(TimeoutError):
             f"Connection attempt timed out, to {url.value.decode()}. "
             f"Current timeout setting: {timeout}."
         )
+        self.url = url
+        self.timeout = timeout
 
 
 class RequestTimeout(TimeoutError):
@@ -34,6 +36,52 @@ class RequestTimeout(TimeoutError):
             f"Request timed out, to: {url.value.decode()}. "
             f"Current timeout setting: {timeout}."
         )
+        self.url = url
+        self.timeout = timeout
+
+
+class DecompressedContentTooLarge(ClientException):
+    """
+    Exception raised when the decompressed body of a response exceeds the
+    configured maximum size, for example because of a decompression bomb.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        super().__init__(
+            f"The decompressed response content exceeds the maximum size "
+            f"({max_size} bytes)."
+        )
+        self.max_size = max_size
+
+
+class CircuitOpenError(ClientException):
+    """
+    Exception raised when a request is refused because the circuit breaker of
+    its origin is open, after too many failures.
+    """
+
+    def __init__(self, url: URL, retry_after: float) -> None:
+        super().__init__(
+            f"The circuit breaker for {url.value.decode()} is open, "
+            f"requests are refused for {retry_after:.3f} seconds."
+        )
+        self.url = url
+        self.retry_after = retry_after
+
+
+class UpstreamSaturatedError(ClientException):
+    """
+    Exception raised when a request is refused because all the endpoints of
+    its upstream reached their maximum number of in-flight requests.
+    """
+
+    def __init__(self, name: str, max_in_flight: int) -> None:
+        super().__init__(
+            f"All the endpoints of the upstream {name} have {max_in_flight} "
+            "requests in flight."
+        )
+        self.name = name
+        self.max_in_flight = max_in_flight
 
 
 class CircularRedirectError(InvalidResponseException):
@@ -0,0 +1,434 @@
+"""
+This module defines middlewares for the ClientSession, implementing timeouts
+with deadline propagation, retries with jittered exponential backoff and a
+retry budget, and hedged requests.
+
+    session = ClientSession(
+        middlewares=[
+            TimeoutPolicy(total=5.0),
+            RetryPolicy(attempts=3),
+            HedgingPolicy(),
+        ]
+    )
+
+The order of middlewares matters: a TimeoutPolicy configured before other
+policies sets a deadline for the whole operation, including retries and
+hedged requests.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Awaitable,
+    Callable,
+    Collection,
+    Deque,
+    Iterator,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from shuttleasgi.messages import Request, Response
+
+from .connection import ConnectionException, IncomingContent
+from .exceptions import ConnectionTimeout, RequestTimeout
+
+NextHandler = Callable[[Request], Awaitable[Response]]
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"})
+
+
+class Deadline:
+    """
+    Represents the point in time by which an operation must be completed,
+    using the monotonic clock.
+    """
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, expires_at: float) -> None:
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def __repr__(self) -> str:
+        return f"<Deadline remaining={self.remaining():.3f}s>"
+
+
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("_deadline", default=None)
+
+
+def get_deadline() -> Optional[Deadline]:
+    """
+    Returns the deadline of the current context, if any.
+    """
+    return _deadline.get()
+
+
+def get_remaining_time(default: float) -> float:
+    """
+    Returns the time remaining before the deadline of the current context,
+    or the given default if it is lower or there is no deadline.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    return min(default, deadline.remaining())
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[Deadline]:
+    """
+    Sets a deadline for the client calls made in the current context. This is
+    useful to propagate the time budget of a web request to the calls it
+    makes to upstream services. Nested scopes cannot extend the deadline of
+    the outer scope.
+    """
+    new_deadline = Deadline.after(seconds)
+    current = _deadline.get()
+    if current is not None and current.expires_at < new_deadline.expires_at:
+        new_deadline = current
+    token = _deadline.set(new_deadline)
+    try:
+        yield new_deadline
+    finally:
+        _deadline.reset(token)
+
+
+def has_buffered_body(request: Request) -> bool:
+    """
+    Returns a value indicating whether the request has no body or a body held
+    in memory, so that it can be sent more than once.
+    """
+    content = request.content
+    return content is None or content.body is not None
+
+
+def discard_response(response: Response) -> None:
+    """
+    Discards a response that is not returned to the caller, closing its
+    connection if its body was not received completely.
+    """
+    content = response.content
+    if isinstance(content, IncomingContent):
+        content.dispose()
+
+
+class TimeoutPolicy:
+    """
+    Client middleware that sets a total timeout for requests, including
+    redirects, retries, and hedged requests handled by the following
+    middlewares. The deadline is propagated to the connection and request
+    timeouts of the ClientSession, and optionally to the upstream service
+    through a header containing the remaining time in milliseconds.
+    """
+
+    def __init__(self, total: float, header: Optional[bytes] = None) -> None:
+        self.total = total
+        self.header = header
+
+    async def __call__(self, request: Request, next_handler: NextHandler) -> Response:
+        with deadline_scope(self.total) as deadline:
+            remaining = deadline.remaining()
+
+            if remaining <= 0:
+                raise RequestTimeout(request.url, self.total)
+
+            if self.header:
+                request.set_header(self.header, str(int(remaining * 1000)).encode())
+
+            try:
+                return await asyncio.wait_for(next_handler(request), remaining)
+            except asyncio.TimeoutError as timeout_error:
+                if isinstance(timeout_error, (ConnectionTimeout, RequestTimeout)):
+                    raise
+                raise RequestTimeout(request.url, self.total)
+
+
+class RetryBudget:
+    """
+    Limits the number of retries to a ratio of the number of requests, to
+    avoid retry storms when an upstream service is overloaded. Each request
+    deposits `ratio` in the budget, each retry withdraws 1. A reserve
+    refilled at `min_retries_per_second` allows retries under low traffic.
+    """
+
+    __slots__ = (
+        "ratio",
+        "min_retries_per_second",
+        "max_balance",
+        "_balance",
+        "_reserve",
+        "_last_refill",
+    )
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_retries_per_second: float = 10.0,
+        max_balance: float = 100.0,
+    ) -> None:
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_balance = max_balance
+        self._balance = 0.0
+        self._reserve = min_retries_per_second
+        self._last_refill = time.monotonic()
+
+    def deposit(self) -> None:
+        self._balance = min(self._balance + self.ratio, self.max_balance)
+
+    def try_withdraw(self) -> bool:
+        if self._balance >= 1:
+            self._balance -= 1
+            return True
+
+        now = time.monotonic()
+        self._reserve = min(
+            self._reserve + (now - self._last_refill) * self.min_retries_per_second,
+            self.min_retries_per_second,
+        )
+        self._last_refill = now
+
+        if self._reserve >= 1:
+            self._reserve -= 1
+            return True
+        return False
+
+
+class RetryPolicy:
+    """
+    Client middleware that retries failed requests, waiting a jittered
+    exponential delay between attempts ("full jitter"). By default only
+    idempotent methods are retried. Retries are not attempted if the delay
+    exceeds the deadline of the current context, or if the retry budget is
+    exhausted. Requests with a streamed body are not retried.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.1,
+        max_delay: float = 2.0,
+        retry_on_status: Collection[int] = (502, 503, 504),
+        retry_on_exceptions: Tuple[Type[BaseException], ...] = (
+            ConnectionException,
+            ConnectionTimeout,
+            OSError,
+        ),
+        methods: Collection[str] = IDEMPOTENT_METHODS,
+        budget: Optional[RetryBudget] = None,
+    ) -> None:
+        if attempts < 1:
+            raise ValueError("attempts must be greater than 0")
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on_status = frozenset(retry_on_status)
+        self.retry_on_exceptions = retry_on_exceptions
+        self.methods = frozenset(methods)
+        self.budget = budget or RetryBudget()
+
+    def get_delay(self, attempt: int) -> float:
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        )
+
+    def _can_retry(self, attempt: int) -> Optional[float]:
+        if attempt >= self.attempts:
+            return None
+
+        delay = self.get_delay(attempt)
+        deadline = _deadline.get()
+        if deadline is not None and deadline.remaining() <= delay:
+            return None
+
+        if not self.budget.try_withdraw():
+            return None
+        return delay
+
+    async def __call__(self, request: Request, next_handler: NextHandler) -> Response:
+        self.budget.deposit()
+
+        if request.method not in self.methods or not has_buffered_body(request):
+            return await next_handler(request)
+
+        attempt = 1
+        while True:
+            try:
+                response = await next_handler(request)
+            except self.retry_on_exceptions:
+                delay = self._can_retry(attempt)
+                if delay is None:
+                    raise
+            else:
+                if response.status not in self.retry_on_status:
+                    return response
+                delay = self._can_retry(attempt)
+                if delay is None:
+                    return response
+                discard_response(response)
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+class LatencyTracker:
+    """
+    Keeps a window of the latest observed latencies, to estimate a
+    percentile. The percentile is recomputed every `refresh_every` samples,
+    to keep the cost of each observation constant.
+    """
+
+    __slots__ = ("percentile", "refresh_every", "_samples", "_count", "_value")
+
+    def __init__(
+        self, percentile: float = 0.95, window: int = 200, refresh_every: int = 20
+    ) -> None:
+        self.percentile = percentile
+        self.refresh_every = refresh_every
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._count = 0
+        self._value: Optional[float] = None
+
+    def observe(self, latency: float) -> None:
+        self._samples.append(latency)
+        self._count += 1
+        if self._value is None or self._count % self.refresh_every == 0:
+            ordered = sorted(self._samples)
+            self._value = ordered[
+                min(len(ordered) - 1, int(len(ordered) * self.percentile))
+            ]
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._value
+
+
+def copy_request(request: Request) -> Request:
+    """
+    Returns a copy of the given request, that can be sent concurrently.
+    """
+    copy = Request(request.method, request.url.value, list(request.headers))
+    if request.content is not None:
+        copy.content = request.content
+    context = getattr(request, "context", None)
+    if context is not None:
+        copy.context = context  # type: ignore
+    return copy
+
+
+class HedgingPolicy:
+    """
+    Client middleware that sends a duplicate of a request if a response is
+    not received within a delay, and returns the first response received,
+    cancelling the other requests. By default the delay is the 95th
+    percentile of the observed latencies, so that at most ~5% of requests
+    are hedged; until enough latencies are observed, `initial_delay` is used.
+    Only idempotent methods are hedged, and only requests whose body is not
+    streamed.
+    """
+
+    def __init__(
+        self,
+        delay: Optional[float] = None,
+        initial_delay: float = 1.0,
+        max_hedges: int = 1,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        methods: Collection[str] = IDEMPOTENT_METHODS,
+    ) -> None:
+        self.delay = delay
+        self.initial_delay = initial_delay
+        self.max_hedges = max_hedges
+        self.min_samples = min_samples
+        self.methods = frozenset(methods)
+        self.latencies = LatencyTracker(percentile)
+
+    def get_delay(self) -> float:
+        if self.delay is not None:
+            return self.delay
+        if self.latencies.count < self.min_samples:
+            return self.initial_delay
+        return self.latencies.value  # type: ignore
+
+    async def _send(self, request: Request, next_handler: NextHandler) -> Response:
+        start = time.perf_counter()
+        try:
+            response = await next_handler(request)
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            # failed attempts are observed too, not to underestimate latencies
+            self.latencies.observe(time.perf_counter() - start)
+            raise
+        self.latencies.observe(time.perf_counter() - start)
+        return response
+
+    async def __call__(self, request: Request, next_handler: NextHandler) -> Response:
+        if (
+            request.method not in self.methods
+            or self.max_hedges < 1
+            or not has_buffered_body(request)
+        ):
+            return await self._send(request, next_handler)
+
+        loop = asyncio.get_running_loop()
+        tasks = {loop.create_task(self._send(request, next_handler))}
+        hedges = 0
+        error: Optional[BaseException] = None
+
+        try:
+            while tasks:
+                can_hedge = hedges < self.max_hedges
+                done, tasks = await asyncio.wait(
+                    tasks,
+                    timeout=self.get_delay() if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                response: Optional[Response] = None
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif response is None:
+                        response = task.result()
+                    else:
+                        # a losing response completed in the same batch
+                        discard_response(task.result())
+
+                if response is not None:
+                    return response
+
+                if can_hedge and (not done or not tasks):
+                    # no response within the delay, or all requests failed
+                    hedges += 1
+                    tasks.add(
+                        loop.create_task(
+                            self._send(copy_request(request), next_handler)
+                        )
+                    )
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        assert error is not None
+        raise error
@@ -1,13 +1,15 @@
+import asyncio
 import logging
 import ssl
 from asyncio import AbstractEventLoop, Queue, QueueEmpty, QueueFull
 from ssl import SSLContext
-from typing import Dict, Optional, Tuple, Union
+from typing import Dict, Optional, Set, Tuple, Union
 
 from shuttleasgi.exceptions import InvalidArgument
 from shuttleasgi.utils.aio import get_running_loop
 
 from .connection import INSECURE_SSLCONTEXT, SECURE_SSLCONTEXT, ClientConnection
+from .dns import DEFAULT_DNS_CACHE, DNSCache, connect_happy_eyeballs
 
 logger = logging.getLogger("shuttleasgi.client")
 
@@ -33,6 +35,13 @@ def get_ssl_context(
     return None
 
 
+def get_pool_key(scheme: bytes, host: bytes, port: Optional[int]):
+    assert scheme in (b"http", b"https"), "URL schema must be http or https"
+    if port is None or port == 0:
+        port = 80 if scheme == b"http" else 443
+    return (scheme, host, port)
+
+
 class ConnectionPool:
     def __init__(
         self,
@@ -42,6 +51,8 @@ class ConnectionPool:
         port: int,
         ssl: Union[None, bool, ssl.SSLContext] = None,
         max_size: int = 0,
+        dns_cache: Optional[DNSCache] = None,
+        happy_eyeballs_delay: float = 0.25,
     ) -> None:
         self.loop = loop
         self.scheme = scheme
@@ -51,6 +62,19 @@ class ConnectionPool:
         self.max_size = max_size
         self._idle_connections: Queue[ClientConnection] = Queue(maxsize=max_size)
         self.disposed = False
+        self.dns_cache = DEFAULT_DNS_CACHE if dns_cache is None else dns_cache
+        self.happy_eyeballs_delay = happy_eyeballs_delay
+        self._active_connections: Set[ClientConnection] = set()
+        self._acquiring = 0
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Returns the number of connections currently used by request-response
+        cycles, including responses whose body is still being read, and
+        connections being acquired, for example while they are created.
+        """
+        return len(self._active_connections) + self._acquiring
 
     def _get_connection(self) -> ClientConnection:
         # if there are no connections, let QueueEmpty exception happen
@@ -67,6 +91,8 @@ class ConnectionPool:
                 return connection
 
     def try_return_connection(self, connection: ClientConnection) -> None:
+        self._active_connections.discard(connection)
+
         if self.disposed:
             return
 
@@ -75,19 +101,50 @@ class ConnectionPool:
         except QueueFull:
             pass
 
+    def discard_connection(self, connection: ClientConnection) -> None:
+        """
+        Stops tracking a connection that was closed while in use.
+        """
+        self._active_connections.discard(connection)
+
     async def get_connection(self) -> ClientConnection:
         try:
-            return self._get_connection()
+            connection = self._get_connection()
         except QueueEmpty:
-            return await self.create_connection()
+            connection = await self.create_connection()
+        self._active_connections.add(connection)
+        return connection
+
+    async def acquire_connection(
+        self, timeout: Optional[float] = None
+    ) -> ClientConnection:
+        """
+        Gets a connection within the given timeout. The connection is counted
+        in flight as soon as this method is called, so that a burst of
+        requests balanced by in-flight count is spread across endpoints.
+        """
+        self._acquiring += 1
+        try:
+            return await asyncio.wait_for(self.get_connection(), timeout)
+        finally:
+            self._acquiring -= 1
 
     async def create_connection(self) -> ClientConnection:
         logger.debug(f"Creating connection to: {self.host}:{self.port}")
+        addresses = await self.dns_cache.resolve(self.host, self.port)
+        try:
+            sock = await connect_happy_eyeballs(
+                self.loop, addresses, self.happy_eyeballs_delay
+            )
+        except OSError:
+            # the cached addresses might be stale, resolve again next time
+            self.dns_cache.invalidate(self.host, self.port)
+            raise
         _, connection = await self.loop.create_connection(
             lambda: ClientConnection(self.loop, self),
-            self.host,
-            self.port,
+            sock=sock,
             ssl=self.ssl,
+            server_hostname=self.host if self.ssl else None,
         )
         assert isinstance(connection, ClientConnection)
         await connection.ready.wait()
@@ -113,20 +170,23 @@ class ConnectionPool:
 
 
 class ConnectionPools:
-    def __init__(self, loop: Optional[AbstractEventLoop] = None) -> None:
+    def __init__(
+        self,
+        loop: Optional[AbstractEventLoop] = None,
+        dns_cache: Optional[DNSCache] = None,
+    ) -> None:
         self.loop = loop or get_running_loop()
+        self.dns_cache = DEFAULT_DNS_CACHE if dns_cache is None else dns_cache
         self._pools: Dict[Tuple[bytes, bytes, int], ConnectionPool] = {}
 
     def get_pool(self, scheme, host, port, ssl):
-        assert scheme in (b"http", b"https"), "URL schema must be http or https"
-        if port is None or port == 0:
-            port = 80 if scheme == b"http" else 443
-
-        key = (scheme, host, port)
+        key = get_pool_key(scheme, host, port)
         try:
             return self._pools[key]
         except KeyError:
-            new_pool = ConnectionPool(self.loop, scheme, host, port, ssl)
+            new_pool = ConnectionPool(
+                self.loop, scheme, host, key[2], ssl, dns_cache=self.dns_cache
+            )
             self._pools[key] = new_pool
             return new_pool
 
@@ -1,7 +1,20 @@
 import asyncio
 import ssl
+import time
 from asyncio import AbstractEventLoop, TimeoutError
-from typing import Any, AnyStr, Callable, Dict, List, Optional, Tuple, Type, Union, cast
+from typing import (
+    Any,
+    AnyStr,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
 from urllib.parse import urlencode
 
 from shuttleasgi import URL, Content, InvalidURL, Request, Response, __version__
@@ -9,7 +22,9 @@ from shuttleasgi.common.types import HeadersType, ParamsType, URLType, normalize
 from shuttleasgi.middlewares import get_middlewares_chain
 from shuttleasgi.utils.aio import get_running_loop
 
-from .connection import ConnectionClosedError
+from .balancing import Upstream
+from .breaker import DEFAULT_FAILURE_STATUSES, CircuitBreaker
+from .connection import ConnectionClosedError, ConnectionException
 from .cookies import CookieJar, cookies_middleware
 from .exceptions import (
     CircularRedirectError,
@@ -19,7 +34,8 @@ from .exceptions import (
     RequestTimeout,
     UnsupportedRedirect,
 )
-from .pool import ClientConnection, ConnectionPools
+from .policies import get_remaining_time
+from .pool import ClientConnection, ConnectionPool, ConnectionPools
 
 
 class RedirectsCache:
@@ -54,6 +70,11 @@ class ClientRequestContext:
 class ClientSession:
     USER_AGENT = f"python-shuttleasgi/{__version__}".encode("utf-8")
 
+    # middlewares applied to all client sessions created afterwards, before
+    # their own middlewares; used by integrations like OpenTelemetry, through
+    # add_default_middleware and remove_default_middleware
+    default_middlewares: List[Callable[..., Any]] = []
+
     def __init__(
         self,
         loop: Optional[AbstractEventLoop] = None,
@@ -68,6 +89,7 @@ class ClientSession:
         redirects_cache_type: Union[Type[RedirectsCache], Any] = None,
         cookie_jar: Union[None, bool, CookieJar] = None,
         middlewares: Optional[List[Callable[..., Any]]] = None,
+        upstreams: Optional[Iterable[Upstream]] = None,
     ):
         if loop is None:
             loop = get_running_loop()
@@ -81,8 +103,7 @@ class ClientSession:
         if redirects_cache_type is None and follow_redirects:
             redirects_cache_type = RedirectsCache
 
-        if middlewares is None:
-            middlewares = []
+        middlewares = [*ClientSession.default_middlewares, *(middlewares or [])]
 
         if cookie_jar is None:
             cookie_jar = CookieJar()
@@ -112,6 +133,30 @@ class ClientSession:
         self._middlewares: List[Callable[..., Any]]
         self.middlewares = middlewares
         self.delay_before_retry = 0.5
+        self.upstreams: Dict[bytes, Upstream] = {
+            upstream.name.encode().lower(): upstream for upstream in upstreams or ()
+        }
+        self._upstreams_pools: Dict[bytes, List[ConnectionPool]] = {}
+
+    @staticmethod
+    def add_default_middleware(middleware: Callable[..., Any]) -> None:
+        """
+        Adds a middleware applied to all client sessions created afterwards.
+        Adding the same middleware more than once has no effect.
+        """
+        if middleware not in ClientSession.default_middlewares:
+            ClientSession.default_middlewares.append(middleware)
+
+    @staticmethod
+    def remove_default_middleware(middleware: Callable[..., Any]) -> None:
+        """
+        Removes a middleware added with add_default_middleware, if present.
+        Client sessions created before keep using it.
+        """
+        try:
+            ClientSession.default_middlewares.remove(middleware)
+        except ValueError:
+            pass
 
     @property
     def default_headers(self) -> Optional[List[Tuple[bytes, bytes]]]:
@@ -191,6 +236,7 @@ class ClientSession:
         await self.close()
 
     async def close(self):
+        self._upstreams_pools.clear()
         if self.owns_pools:
             self.pools.dispose()
 
@@ -280,15 +326,58 @@ class ClientSession:
             if redirect_url is not None:
                 request.url = redirect_url
 
+    def get_upstream(self, url: URL) -> Optional[Upstream]:
+        if self.upstreams:
+            return self.upstreams.get(url.host.lower())
+        return None
+
+    def get_endpoint_breaker(
+        self, url: URL, pool: ConnectionPool
+    ) -> Optional[CircuitBreaker]:
+        """
+        Returns the circuit breaker of the upstream endpoint of the given pool,
+        if the URL targets an upstream that keeps circuit breakers.
+        """
+        upstream = self.get_upstream(url)
+        if upstream is None:
+            return None
+        return upstream.get_breaker(pool)
+
+    def get_pool(self, url: URL) -> ConnectionPool:
+        if self.upstreams:
+            host = url.host.lower()
+            upstream = self.upstreams.get(host)
+            if upstream is not None:
+                try:
+                    pools = self._upstreams_pools[host]
+                except KeyError:
+                    pools = upstream.get_pools(self.pools, self.ssl)
+                    self._upstreams_pools[host] = pools
+                return upstream.select(pools)
+        return self.pools.get_pool(url.schema, url.host, url.port, self.ssl)
+
     async def get_connection(self, url: URL) -> ClientConnection:
-        pool = self.pools.get_pool(url.schema, url.host, url.port, self.ssl)
+        pool = self.get_pool(url)
+        timeout = get_remaining_time(self.connection_timeout)
 
         try:
-            return await asyncio.wait_for(
-                pool.get_connection(), self.connection_timeout
-            )
+            return await pool.acquire_connection(timeout)
         except TimeoutError:
-            raise ConnectionTimeout(url.base_url(), self.connection_timeout)
+            self._on_endpoint_failure(url, pool)
+            raise ConnectionTimeout(url.base_url(), timeout)
+        except (ConnectionException, OSError):
+            self._on_endpoint_failure(url, pool)
+            raise
+        except asyncio.CancelledError:
+            breaker = self.get_endpoint_breaker(url, pool)
+            if breaker is not None:
+                breaker.on_cancelled()
+            raise
+
+    def _on_endpoint_failure(self, url: URL, pool: ConnectionPool) -> None:
+        breaker = self.get_endpoint_breaker(url, pool)
+        if breaker is not None:
+            breaker.on_failure()
 
     def get_new_context(self, request: Request) -> ClientRequestContext:
         return ClientRequestContext(request, self.cookie_jar)
@@ -339,18 +428,47 @@ class ClientSession:
 
     async def _send_using_connection(self, request, attempt: int = 1) -> Response:
         connection = await self.get_connection(request.url)
-
+        breaker = None
+        upstream = self.get_upstream(request.url)
+        if upstream is not None and upstream.breakers is not None:
+            pool = connection.pool()
+            if pool is not None:
+                breaker = upstream.get_breaker(pool)
+
+        timeout = get_remaining_time(self.request_timeout)
+        start = time.perf_counter()
         try:
-            return await asyncio.wait_for(
-                connection.send(request), self.request_timeout
-            )
+            response = await asyncio.wait_for(connection.send(request), timeout)
         except ConnectionClosedError as connection_closed_error:
+            if breaker is not None:
+                breaker.on_failure()
             if connection_closed_error.can_retry and attempt < 4:
                 await asyncio.sleep(self.delay_before_retry)
                 return await self._send_using_connection(request, attempt + 1)
             raise
         except TimeoutError:
-            raise RequestTimeout(request.url, self.request_timeout)
+            if breaker is not None:
+                breaker.on_failure()
+            # the connection is in an undefined state, it cannot be reused
+            connection.close()
+            raise RequestTimeout(request.url, timeout)
+        except asyncio.CancelledError:
+            if breaker is not None:
+                breaker.on_cancelled()
+            # for example, when a hedged request loses the race
+            connection.close()
+            raise
+        except (ConnectionException, OSError):
+            if breaker is not None:
+                breaker.on_failure()
+            raise
+
+        if breaker is not None:
+            if response.status in DEFAULT_FAILURE_STATUSES:
+                breaker.on_failure()
+            else:
+                breaker.on_success(time.perf_counter() - start)
+        return response
 
     async def get(
         self,
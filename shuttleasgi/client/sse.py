@@ -0,0 +1,194 @@
+"""
+This module offers a decoder for Server-Sent Events streams received by the
+client, the counterpart of the server side `write_sse` function.
+"""
+
+import re
+from typing import Any, List, Optional
+
+from shuttleasgi.settings.json import json_settings
+
+_DONE_DATA = b"[DONE]"
+_BOM = b"\xef\xbb\xbf"
+_DEFAULT_EVENT = "message"
+_LINE_END_RX = re.compile(b"\r\n|\r|\n")
+
+
+class IncomingServerSentEvent:
+    """
+    Represents a single event received from a Server-Sent Events stream.
+
+    Attributes:
+        data: The event data, multiple `data` lines are joined with `\\n`.
+        event: The event type, `message` if not specified by the server.
+        id: The last event id received in the stream, or None.
+        retry: The reconnection time in milliseconds, or None.
+    """
+
+    __slots__ = ("data", "event", "id", "retry")
+
+    def __init__(
+        self,
+        data: str,
+        event: str = _DEFAULT_EVENT,
+        id: Optional[str] = None,
+        retry: Optional[int] = None,
+    ):
+        self.data = data
+        self.event = event
+        self.id = id
+        self.retry = retry
+
+    def json(self) -> Any:
+        return json_settings.loads(self.data)
+
+    def __eq__(self, other):
+        if not isinstance(other, IncomingServerSentEvent):
+            return NotImplemented
+        return (
+            self.data == other.data
+            and self.event == other.event
+            and self.id == other.id
+            and self.retry == other.retry
+        )
+
+    def __repr__(self):
+        return f"IncomingServerSentEvent({self.event!r}, {self.data!r})"
+
+
+class SSEDecoder:
+    """
+    Incremental decoder of Server-Sent Events. Chunks are fed as they are
+    received from the network, and events are returned as soon as they are
+    complete; lines and events split across chunks are handled, and bytes
+    already scanned are never scanned again. A leading UTF-8 BOM is ignored,
+    and invalid UTF-8 sequences are decoded as U+FFFD.
+
+    If `detect_done` is True, the `data: [DONE]` event used by OpenAI style
+    APIs to signal the end of a stream is not returned and sets `done`.
+    """
+
+    def __init__(self, detect_done: bool = True):
+        self.detect_done = detect_done
+        self.done = False
+        self._pending: Optional[bytes] = None
+        self._data: List[bytes] = []
+        self._event: Optional[str] = None
+        self._last_event_id: Optional[str] = None
+        self._retry: Optional[int] = None
+        self._skip_lf = False
+        self._started = False
+
+    def feed(self, chunk: bytes) -> List[IncomingServerSentEvent]:
+        events: List[IncomingServerSentEvent] = []
+
+        if self.done or not chunk:
+            return events
+
+        if not self._started:
+            if self._pending is not None:
+                # the first bytes of the stream, a possibly incomplete BOM
+                chunk = self._pending + chunk
+                self._pending = None
+            if len(chunk) < 3 and _BOM.startswith(chunk):
+                self._pending = chunk
+                return events
+            self._started = True
+            if chunk.startswith(_BOM):
+                chunk = chunk[3:]
+                if not chunk:
+                    return events
+
+        start = 0
+        if self._pending is not None:
+            # the pending bytes are known to contain no line terminator
+            position = len(self._pending)
+            buffer = self._pending + chunk
+            self._pending = None
+        else:
+            position = 0
+            buffer = chunk
+            if self._skip_lf and buffer[0] == 10:
+                # the previous chunk ended with \r, and this one starts with \n
+                position = start = 1
+
+        self._skip_lf = False
+        length = len(buffer)
+
+        for match in _LINE_END_RX.finditer(buffer, position):
+            self._process_line(buffer[start : match.start()], events)
+            start = match.end()
+
+            if start == length and match.group() == b"\r":
+                self._skip_lf = True
+
+            if self.done:
+                return events
+
+        if start < length:
+            self._pending = buffer[start:] if start else buffer
+        return events
+
+    def _process_line(self, line: bytes, events: List[IncomingServerSentEvent]):
+        if not line:
+            self._dispatch(events)
+            return
+
+        if line[0] == 58:  # ':' comment line
+            return
+
+        name, _, value = line.partition(b":")
+        if value[:1] == b" ":
+            value = value[1:]
+
+        if name == b"data":
+            self._data.append(value)
+        elif name == b"event":
+            self._event = value.decode("utf-8", "replace")
+        elif name == b"id":
+            if b"\0" not in value:
+                self._last_event_id = value.decode("utf-8", "replace")
+        elif name == b"retry":
+            if value.isdigit():
+                self._retry = int(value)
+
+    def _dispatch(self, events: List[IncomingServerSentEvent]):
+        event = self._event
+        self._event = None
+
+        if not self._data:
+            return
+
+        data = self._data[0] if len(self._data) == 1 else b"\n".join(self._data)
+        self._data = []
+
+        if self.detect_done and data == _DONE_DATA:
+            self.done = True
+            return
+
+        events.append(
+            IncomingServerSentEvent(
+                data.decode("utf-8", "replace"),
+                event or _DEFAULT_EVENT,
+                self._last_event_id,
+                self._retry,
+            )
+        )
+
+
+async def read_sse(response, detect_done: bool = True):
+    """
+    Asynchronously iterates the Server-Sent Events of a response obtained with
+    the `ClientSession`, decoding them while chunks are received.
+    """
+    if response.content is None:
+        return
+
+    decoder = SSEDecoder(detect_done)
+
+    async for chunk in response.content.stream():
+        for event in decoder.feed(chunk):
+            yield event
+
+        if decoder.done:
+            break
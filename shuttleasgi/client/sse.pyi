@@ -0,0 +1,29 @@
+from typing import Any, AsyncIterable, List, Optional
+
+from shuttleasgi.messages import Response
+
+class IncomingServerSentEvent:
+    data: str
+    event: str
+    id: Optional[str]
+    retry: Optional[int]
+
+    def __init__(
+        self,
+        data: str,
+        event: str = "message",
+        id: Optional[str] = None,
+        retry: Optional[int] = None,
+    ) -> None: ...
+    def json(self) -> Any: ...
+
+class SSEDecoder:
+    detect_done: bool
+    done: bool
+
+    def __init__(self, detect_done: bool = True) -> None: ...
+    def feed(self, chunk: bytes) -> List[IncomingServerSentEvent]: ...
+
+def read_sse(
+    response: Response, detect_done: bool = True
+) -> AsyncIterable[IncomingServerSentEvent]: ...
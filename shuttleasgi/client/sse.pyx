@@ -0,0 +1,247 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+This module offers a decoder for Server-Sent Events streams received by the
+client, the counterpart of the server side `write_sse` function.
+"""
+
+from cpython.bytes cimport PyBytes_AS_STRING, PyBytes_FromStringAndSize, PyBytes_GET_SIZE
+from libc.string cimport memchr, memcmp
+
+from shuttleasgi.settings.json import json_settings
+
+
+cdef bytes _DONE_DATA = b"[DONE]"
+cdef bytes _BOM = b"\xef\xbb\xbf"
+cdef bytes _NEW_LINE = b"\n"
+cdef str _DEFAULT_EVENT = "message"
+
+
+cdef class IncomingServerSentEvent:
+    """
+    Represents a single event received from a Server-Sent Events stream.
+
+    Attributes:
+        data: The event data, multiple `data` lines are joined with `\\n`.
+        event: The event type, `message` if not specified by the server.
+        id: The last event id received in the stream, or None.
+        retry: The reconnection time in milliseconds, or None.
+    """
+
+    cdef readonly str data
+    cdef readonly str event
+    cdef readonly str id
+    cdef readonly object retry
+
+    def __init__(
+        self,
+        str data,
+        str event = _DEFAULT_EVENT,
+        str id = None,
+        object retry = None,
+    ):
+        self.data = data
+        self.event = event
+        self.id = id
+        self.retry = retry
+
+    def json(self):
+        return json_settings.loads(self.data)
+
+    def __eq__(self, other):
+        if not isinstance(other, IncomingServerSentEvent):
+            return NotImplemented
+        return (
+            self.data == other.data
+            and self.event == other.event
+            and self.id == other.id
+            and self.retry == other.retry
+        )
+
+    def __repr__(self):
+        return f"IncomingServerSentEvent({self.event!r}, {self.data!r})"
+
+
+cdef class SSEDecoder:
+    """
+    Incremental decoder of Server-Sent Events. Chunks are fed as they are
+    received from the network, and events are returned as soon as they are
+    complete; lines and events split across chunks are handled, and bytes
+    already scanned are never scanned again. A leading UTF-8 BOM is ignored,
+    and invalid UTF-8 sequences are decoded as U+FFFD.
+
+    If `detect_done` is True, the `data: [DONE]` event used by OpenAI style
+    APIs to signal the end of a stream is not returned and sets `done`.
+    """
+
+    cdef bytes _pending
+    cdef list _data
+    cdef str _event
+    cdef str _last_event_id
+    cdef object _retry
+    cdef bint _skip_lf
+    cdef bint _started
+    cdef readonly bint detect_done
+    cdef readonly bint done
+
+    def __init__(self, bint detect_done=True):
+        self.detect_done = detect_done
+        self.done = False
+        self._pending = None
+        self._data = []
+        self._event = None
+        self._last_event_id = None
+        self._retry = None
+        self._skip_lf = False
+        self._started = False
+
+    cpdef list feed(self, bytes chunk):
+        cdef:
+            list events = []
+            bytes buffer
+            const char* buf
+            Py_ssize_t length
+            Py_ssize_t i
+            Py_ssize_t start = 0
+            char c
+
+        if self.done or not chunk:
+            return events
+
+        if not self._started:
+            if self._pending is not None:
+                # the first bytes of the stream, a possibly incomplete BOM
+                chunk = self._pending + chunk
+                self._pending = None
+            if PyBytes_GET_SIZE(chunk) < 3 and _BOM.startswith(chunk):
+                self._pending = chunk
+                return events
+            self._started = True
+            if chunk.startswith(_BOM):
+                chunk = chunk[3:]
+                if not chunk:
+                    return events
+
+        if self._pending is not None:
+            # the pending bytes are known to contain no line terminator
+            i = PyBytes_GET_SIZE(self._pending)
+            buffer = self._pending + chunk
+            self._pending = None
+        else:
+            i = 0
+            buffer = chunk
+            if self._skip_lf and buffer[0] == 10:
+                # the previous chunk ended with \r, and this one starts with \n
+                i = 1
+                start = 1
+
+        self._skip_lf = False
+        buf = PyBytes_AS_STRING(buffer)
+        length = PyBytes_GET_SIZE(buffer)
+
+        while i < length:
+            c = buf[i]
+            if c == 10 or c == 13:
+                self._process_line(buf + start, i - start, events)
+
+                if c == 13:
+                    if i + 1 < length:
+                        if buf[i + 1] == 10:
+                            i += 1
+                    else:
+                        self._skip_lf = True
+
+                start = i + 1
+
+                if self.done:
+                    return events
+            i += 1
+
+        if start < length:
+            self._pending = buffer[start:] if start else buffer
+        return events
+
+    cdef void _process_line(self, const char* line, Py_ssize_t length, list events):
+        cdef:
+            const char* colon
+            Py_ssize_t name_length
+            Py_ssize_t value_start
+            bytes value
+
+        if length == 0:
+            self._dispatch(events)
+            return
+
+        if line[0] == 58:  # ':' comment line
+            return
+
+        colon = <const char*>memchr(line, 58, length)
+        if colon == NULL:
+            name_length = length
+            value_start = length
+        else:
+            name_length = colon - line
+            value_start = name_length + 1
+            if value_start < length and line[value_start] == 32:
+                value_start += 1
+
+        value = PyBytes_FromStringAndSize(line + value_start, length - value_start)
+
+        if name_length == 4 and memcmp(line, b"data", 4) == 0:
+            self._data.append(value)
+        elif name_length == 5 and memcmp(line, b"event", 5) == 0:
+            self._event = value.decode("utf-8", "replace")
+        elif name_length == 2 and memcmp(line, b"id", 2) == 0:
+            if b"\0" not in value:
+                self._last_event_id = value.decode("utf-8", "replace")
+        elif name_length == 5 and memcmp(line, b"retry", 5) == 0:
+            if value.isdigit():
+                self._retry = int(value)
+
+    cdef void _dispatch(self, list events):
+        cdef bytes data
+        cdef str event = self._event
+
+        self._event = None
+
+        if not self._data:
+            return
+
+        if len(self._data) == 1:
+            data = self._data[0]
+        else:
+            data = _NEW_LINE.join(self._data)
+        self._data = []
+
+        if self.detect_done and data == _DONE_DATA:
+            self.done = True
+            return
+
+        events.append(
+            IncomingServerSentEvent(
+                data.decode("utf-8", "replace"),
+                event or _DEFAULT_EVENT,
+                self._last_event_id,
+                self._retry,
+            )
+        )
+
+
+async def read_sse(object response, bint detect_done=True):
+    """
+    Asynchronously iterates the Server-Sent Events of a response obtained with
+    the `ClientSession`, decoding them while chunks are received.
+    """
+    cdef SSEDecoder decoder
+    cdef IncomingServerSentEvent event
+
+    if response.content is None:
+        return
+
+    decoder = SSEDecoder(detect_done)
+
+    async for chunk in response.content.stream():
+        for event in decoder.feed(chunk):
+            yield event
+
+        if decoder.done:
+            break
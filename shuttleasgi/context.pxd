@@ -0,0 +1,14 @@
+# cython: language_level=3
+
+
+cdef class RequestState:
+    cdef public bytes request_id
+    cdef public double start_time
+    cdef public double processing_time
+    cdef dict _items
+
+    cpdef object get(self, str key, object default=*)
+    cpdef void set(self, str key, object value)
+
+
+cpdef RequestState get_request_state()
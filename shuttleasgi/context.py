@@ -1,13 +1,96 @@
-# shuttleasgi/context.py
+"""
+This module holds the state of the request being handled, in a context
+variable set once per request by the middleware of shuttle headers.
+"""
+
 from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+_request_context: "ContextVar[RequestState]" = ContextVar("request_context")
+
+
+class RequestState:
+    """
+    The state of a request: typed fields for the values set by the framework,
+    and items set by the application, stored in a dictionary created only when
+    the first item is set.
+    """
+
+    __slots__ = ("_request_id", "start_time", "processing_time", "_items")
+
+    def __init__(
+        self, request_id: Optional[bytes] = None, start_time: float = 0.0
+    ) -> None:
+        self.request_id = request_id
+        self.start_time = start_time
+        self.processing_time = 0.0
+        self._items: Optional[Dict[str, Any]] = None
+
+    @property
+    def request_id(self) -> Optional[bytes]:
+        return self._request_id
+
+    @request_id.setter
+    def request_id(self, value: Optional[bytes]) -> None:
+        # like the typed field of the compiled state
+        if value is not None and type(value) is not bytes:
+            raise TypeError(f"Expected bytes, got {type(value).__name__}")
+        self._request_id = value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == "request_id":
+            return self.request_id if self.request_id is not None else default
+        if key == "start_time":
+            return self.start_time
+        if key == "processing_time":
+            return self.processing_time
+        if self._items is None:
+            return default
+        return self._items.get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        if key == "request_id":
+            self.request_id = value
+        elif key == "start_time":
+            self.start_time = value
+        elif key == "processing_time":
+            self.processing_time = value
+        else:
+            if self._items is None:
+                self._items = {}
+            self._items[key] = value
+
+    def __repr__(self) -> str:
+        return (
+            f"<RequestState request_id={self.request_id!r} "
+            f"processing_time={self.processing_time}>"
+        )
+
+
+def get_request_state() -> Optional[RequestState]:
+    """
+    Returns the state of the request being handled, or None outside of
+    requests handled with shuttle headers. Read the state once and use its
+    fields, rather than reading the context variable for each value.
+    """
+    return _request_context.get(None)
 
-_request_context: ContextVar[dict] = ContextVar("request_context")
 
 class RequestContext:
     @staticmethod
-    def get(key: str, default=None):
-        return _request_context.get().get(key, default)
-    
+    def current() -> Optional[RequestState]:
+        return _request_context.get(None)
+
+    @staticmethod
+    def get(key: str, default: Any = None) -> Any:
+        state = _request_context.get(None)
+        if state is None:
+            return default
+        return state.get(key, default)
+
     @staticmethod
-    def set(key: str, value):
-        _request_context.get()[key] = value
\ No newline at end of file
+    def set(key: str, value: Any) -> None:
+        state = _request_context.get(None)
+        if state is None:
+            raise LookupError("There is no request context to set values in.")
+        state.set(key, value)
@@ -0,0 +1,25 @@
+from contextvars import ContextVar
+from typing import Any, Optional
+
+_request_context: ContextVar["RequestState"]
+
+class RequestState:
+    request_id: Optional[bytes]
+    start_time: float
+    processing_time: float
+
+    def __init__(
+        self, request_id: Optional[bytes] = None, start_time: float = 0.0
+    ) -> None: ...
+    def get(self, key: str, default: Any = None) -> Any: ...
+    def set(self, key: str, value: Any) -> None: ...
+
+def get_request_state() -> Optional[RequestState]: ...
+
+class RequestContext:
+    @staticmethod
+    def current() -> Optional[RequestState]: ...
+    @staticmethod
+    def get(key: str, default: Any = None) -> Any: ...
+    @staticmethod
+    def set(key: str, value: Any) -> None: ...
@@ -0,0 +1,83 @@
+# cython: language_level=3
+# cython: boundscheck=False, wraparound=False, nonecheck=False
+
+"""
+This module holds the state of the request being handled, in a context
+variable set once per request by the middleware of shuttle headers.
+"""
+
+cimport cython
+from contextvars import ContextVar
+
+_request_context = ContextVar("request_context")
+
+
+@cython.freelist(256)
+cdef class RequestState:
+    """
+    The state of a request: typed fields for the values set by the framework,
+    and items set by the application, stored in a dictionary created only when
+    the first item is set.
+    """
+
+    def __init__(self, bytes request_id=None, double start_time=0.0):
+        self.request_id = request_id
+        self.start_time = start_time
+
+    cpdef object get(self, str key, object default=None):
+        if key == "request_id":
+            return self.request_id if self.request_id is not None else default
+        if key == "start_time":
+            return self.start_time
+        if key == "processing_time":
+            return self.processing_time
+        if self._items is None:
+            return default
+        return self._items.get(key, default)
+
+    cpdef void set(self, str key, object value):
+        if key == "request_id":
+            self.request_id = value
+        elif key == "start_time":
+            self.start_time = value
+        elif key == "processing_time":
+            self.processing_time = value
+        else:
+            if self._items is None:
+                self._items = {}
+            self._items[key] = value
+
+    def __repr__(self):
+        return (
+            f"<RequestState request_id={self.request_id!r} "
+            f"processing_time={self.processing_time}>"
+        )
+
+
+cpdef RequestState get_request_state():
+    """
+    Returns the state of the request being handled, or None outside of
+    requests handled with shuttle headers. Read the state once and use its
+    fields, rather than reading the context variable for each value.
+    """
+    return _request_context.get(None)
+
+
+class RequestContext:
+    @staticmethod
+    def current():
+        return _request_context.get(None)
+
+    @staticmethod
+    def get(str key, default=None):
+        cdef RequestState state = _request_context.get(None)
+        if state is None:
+            return default
+        return state.get(key, default)
+
+    @staticmethod
+    def set(str key, value):
+        cdef RequestState state = _request_context.get(None)
+        if state is None:
+            raise LookupError("There is no request context to set values in.")
+        state.set(key, value)
@@ -0,0 +1,63 @@
+# cython: language_level=3
+
+
+cdef class Histogram:
+    cdef readonly list bounds
+    cdef readonly Py_ssize_t size
+    cdef readonly unsigned long long count
+    cdef readonly double sum
+    cdef readonly double max
+    cdef double* _bounds
+    cdef unsigned long long* _counts
+
+    cpdef void record(self, double value)
+    cpdef void reset(self)
+    cpdef double percentile(self, double percentile)
+
+
+cdef class StreamingMetrics:
+    cdef readonly Histogram time_to_first_byte
+    cdef readonly Histogram chunk_gap
+    cdef readonly Histogram duration
+    cdef readonly unsigned long long count
+    cdef readonly unsigned long long incomplete
+    cdef readonly unsigned long long bytes
+
+    cpdef void record(self, StreamRecorder recorder)
+
+
+cdef class StreamRecorder:
+    cdef readonly str route
+    cdef readonly StreamingMetrics metrics
+    cdef readonly double start
+    cdef readonly double time_to_first_byte
+    cdef readonly double max_chunk_gap
+    cdef readonly double duration
+    cdef readonly Py_ssize_t chunks
+    cdef readonly Py_ssize_t bytes
+    cdef readonly bint completed
+    cdef double _last
+
+    cpdef void on_chunk(self, Py_ssize_t size)
+    cpdef void on_end(self, bint completed)
+
+
+cdef class RouteMetrics:
+    cdef readonly str method
+    cdef readonly str route
+    cdef readonly Histogram duration
+    cdef readonly StreamingMetrics streaming
+    cdef unsigned long long _statuses[6]
+
+    cpdef void record(self, int status, double duration)
+    cpdef StreamingMetrics get_streaming_metrics(self)
+
+
+cdef class RequestMetrics:
+    cdef readonly list bounds
+    cdef readonly dict routes
+
+    cpdef RouteMetrics get_route_metrics(self, str method, object pattern)
+    cpdef RouteMetrics record(
+        self, str method, object pattern, int status, double duration
+    )
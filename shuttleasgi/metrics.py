@@ -0,0 +1,311 @@
+"""
+This module implements the core of request metrics: histograms with fixed
+buckets, whose updates consist of a binary search and the increment of
+preallocated counters, and the metrics of requests by method and route
+template. It is compiled with Cython; this is the pure Python version.
+"""
+
+from bisect import bisect_left
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def exponential_buckets(start: float, factor: float, count: int) -> List[float]:
+    """
+    Returns `count` upper bounds for histogram buckets, starting at `start`
+    and growing by `factor`.
+    """
+    if start <= 0 or factor <= 1 or count < 1:
+        raise ValueError("Invalid exponential buckets.")
+    return [start * factor**index for index in range(count)]
+
+
+# bounds from 100µs to about 74 seconds, each ~41% larger than the previous
+LATENCY_BUCKETS = exponential_buckets(0.0001, 2**0.5, 40)
+
+
+class Histogram:
+    """
+    A histogram with fixed buckets. The bucket of a value is the first whose
+    upper bound is greater than or equal to the value; values greater than the
+    last bound are counted in an overflow bucket.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS) -> None:
+        if list(bounds) != sorted(bounds) or not bounds:
+            raise ValueError("The bounds of a histogram must be sorted.")
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def reset(self) -> None:
+        counts = self.counts
+        for index in range(len(counts)):
+            counts[index] = 0
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def percentile(self, percentile: float) -> float:
+        """
+        Returns an estimate of the given percentile (0-100), as the upper bound
+        of the bucket containing it, or the maximum value for the overflow
+        bucket.
+        """
+        if not self.count:
+            return 0.0
+        rank = percentile / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if index == len(self.bounds):
+                    return self.max
+                return min(self.bounds[index], self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+# methods recorded under their own label; any other method, which a client can
+# choose freely, is recorded as OTHER_METHOD to keep the number of series bounded
+KNOWN_METHODS = frozenset(
+    ("GET", "HEAD", "POST", "PUT", "DELETE", "CONNECT", "OPTIONS", "TRACE", "PATCH")
+)
+
+OTHER_METHOD = "OTHER"
+
+
+class StreamingMetrics:
+    """
+    The metrics of the streamed responses of a route: the time between the
+    response head and the first body chunk, the gaps between body chunks and
+    the duration of the streams, the bytes sent, and the count of streams
+    interrupted before their end.
+    """
+
+    __slots__ = (
+        "time_to_first_byte",
+        "chunk_gap",
+        "duration",
+        "count",
+        "incomplete",
+        "bytes",
+    )
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.time_to_first_byte = Histogram(bounds)
+        self.chunk_gap = Histogram(bounds)
+        self.duration = Histogram(bounds)
+        self.count = 0
+        self.incomplete = 0
+        self.bytes = 0
+
+    def record(self, recorder: "StreamRecorder") -> None:
+        self.count += 1
+        self.bytes += recorder.bytes
+        if not recorder.completed:
+            self.incomplete += 1
+        if recorder.chunks:
+            self.time_to_first_byte.record(recorder.time_to_first_byte)
+        self.duration.record(recorder.duration)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "incomplete": self.incomplete,
+            "bytes": self.bytes,
+            "time_to_first_byte": self.time_to_first_byte.snapshot(),
+            "chunk_gap": self.chunk_gap.snapshot(),
+            "duration": self.duration.snapshot(),
+        }
+
+
+class StreamRecorder:
+    """
+    Measures the body of a streamed response while it is sent: the instance is
+    created when the response head is sent, `on_chunk` is called after each
+    body chunk is sent, and `on_end` once the stream ends, whether completed
+    or interrupted. If the metrics of the route are given, the measurements
+    are added to them.
+    """
+
+    __slots__ = (
+        "route",
+        "metrics",
+        "start",
+        "time_to_first_byte",
+        "max_chunk_gap",
+        "duration",
+        "chunks",
+        "bytes",
+        "completed",
+        "_last",
+    )
+
+    def __init__(self, route_metrics: Optional["RouteMetrics"] = None) -> None:
+        self.route: Optional[str] = None
+        self.metrics: Optional[StreamingMetrics] = None
+        if route_metrics is not None:
+            self.route = route_metrics.route
+            self.metrics = route_metrics.get_streaming_metrics()
+        self.start = self._last = perf_counter()
+        self.time_to_first_byte = 0.0
+        self.max_chunk_gap = 0.0
+        self.duration = 0.0
+        self.chunks = 0
+        self.bytes = 0
+        self.completed = False
+
+    def on_chunk(self, size: int) -> None:
+        now = perf_counter()
+        if self.chunks:
+            gap = now - self._last
+            if gap > self.max_chunk_gap:
+                self.max_chunk_gap = gap
+            if self.metrics is not None:
+                self.metrics.chunk_gap.record(gap)
+        else:
+            self.time_to_first_byte = now - self.start
+        self._last = now
+        self.chunks += 1
+        self.bytes += size
+
+    def on_end(self, completed: bool) -> None:
+        self.duration = perf_counter() - self.start
+        self.completed = completed
+        if self.metrics is not None:
+            self.metrics.record(self)
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "route": self.route,
+            "completed": self.completed,
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "time_to_first_byte": self.time_to_first_byte,
+            "max_chunk_gap": self.max_chunk_gap,
+            "duration": self.duration,
+        }
+
+
+class RouteMetrics:
+    """
+    The metrics of the requests handled by a route for a method: a latency
+    histogram and the count of responses by status class, and the metrics of
+    streamed responses, created when the first one is sent.
+    """
+
+    __slots__ = ("method", "route", "duration", "statuses", "streaming")
+
+    def __init__(
+        self, method: str, route: str, bounds: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        self.method = method
+        self.route = route
+        self.duration = Histogram(bounds)
+        # the counts by status class, from 1xx (index 1) to 5xx (index 5)
+        self.statuses = [0] * 6
+        self.streaming: Optional[StreamingMetrics] = None
+
+    def record(self, status: int, duration: float) -> None:
+        index = status // 100
+        self.statuses[index if 0 < index < 6 else 0] += 1
+        self.duration.record(duration)
+
+    def get_streaming_metrics(self) -> StreamingMetrics:
+        if self.streaming is None:
+            self.streaming = StreamingMetrics(self.duration.bounds)
+        return self.streaming
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {
+            "method": self.method,
+            "route": self.route,
+            "statuses": {
+                name: self.statuses[index + 1]
+                for index, name in enumerate(STATUS_CLASSES)
+                if self.statuses[index + 1]
+            },
+            "duration": self.duration.snapshot(),
+        }
+        if self.streaming is not None:
+            snapshot["streaming"] = self.streaming.snapshot()
+        return snapshot
+
+
+class RequestMetrics:
+    """
+    Collects the metrics of the requests handled by an application, by
+    method and route template. Methods not in KNOWN_METHODS are recorded
+    under OTHER_METHOD.
+    """
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.bounds = list(bounds)
+        self.routes: Dict[str, Dict[Optional[bytes], RouteMetrics]] = {}
+
+    def get_route_metrics(self, method: str, pattern: Optional[bytes]) -> RouteMetrics:
+        if method not in KNOWN_METHODS:
+            method = OTHER_METHOD
+        by_pattern = self.routes.get(method)
+        if by_pattern is None:
+            by_pattern = self.routes[method] = {}
+        metrics = by_pattern.get(pattern)
+        if metrics is None:
+            route = pattern.decode() if pattern is not None else UNMATCHED_ROUTE
+            metrics = by_pattern[pattern] = RouteMetrics(method, route, self.bounds)
+        return metrics
+
+    def record(
+        self, method: str, pattern: Optional[bytes], status: int, duration: float
+    ) -> RouteMetrics:
+        by_pattern = self.routes.get(method)
+        metrics = by_pattern.get(pattern) if by_pattern is not None else None
+        if metrics is None:
+            metrics = self.get_route_metrics(method, pattern)
+
+        # RouteMetrics.record and Histogram.record inlined, since this runs
+        # for every request
+        index = status // 100
+        metrics.statuses[index if 0 < index < 6 else 0] += 1
+        histogram = metrics.duration
+        histogram.counts[bisect_left(histogram.bounds, duration)] += 1
+        histogram.count += 1
+        histogram.sum += duration
+        if duration > histogram.max:
+            histogram.max = duration
+        return metrics
+
+    def __iter__(self):
+        for by_pattern in self.routes.values():
+            yield from by_pattern.values()
+
+    def reset(self) -> None:
+        self.routes.clear()
+
+    def get_snapshot(self) -> List[Dict[str, Any]]:
+        return [metrics.snapshot() for metrics in self]
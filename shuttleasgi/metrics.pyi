@@ -0,0 +1,74 @@
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple
+
+def exponential_buckets(start: float, factor: float, count: int) -> List[float]: ...
+
+LATENCY_BUCKETS: List[float]
+STATUS_CLASSES: Tuple[str, ...]
+UNMATCHED_ROUTE: str
+KNOWN_METHODS: FrozenSet[str]
+OTHER_METHOD: str
+
+class Histogram:
+    bounds: List[float]
+    counts: List[int]
+    count: int
+    sum: float
+    max: float
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS) -> None: ...
+    def record(self, value: float) -> None: ...
+    def reset(self) -> None: ...
+    def percentile(self, percentile: float) -> float: ...
+    def snapshot(self) -> Dict[str, Any]: ...
+
+class StreamingMetrics:
+    time_to_first_byte: Histogram
+    chunk_gap: Histogram
+    duration: Histogram
+    count: int
+    incomplete: int
+    bytes: int
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS) -> None: ...
+    def record(self, recorder: StreamRecorder) -> None: ...
+    def snapshot(self) -> Dict[str, Any]: ...
+
+class StreamRecorder:
+    route: Optional[str]
+    metrics: Optional[StreamingMetrics]
+    start: float
+    time_to_first_byte: float
+    max_chunk_gap: float
+    duration: float
+    chunks: int
+    bytes: int
+    completed: bool
+    def __init__(self, route_metrics: Optional[RouteMetrics] = None) -> None: ...
+    def on_chunk(self, size: int) -> None: ...
+    def on_end(self, completed: bool) -> None: ...
+    def get_info(self) -> Dict[str, Any]: ...
+
+class RouteMetrics:
+    method: str
+    route: str
+    duration: Histogram
+    statuses: List[int]
+    streaming: Optional[StreamingMetrics]
+    def __init__(
+        self, method: str, route: str, bounds: Sequence[float] = LATENCY_BUCKETS
+    ) -> None: ...
+    def record(self, status: int, duration: float) -> None: ...
+    def get_streaming_metrics(self) -> StreamingMetrics: ...
+    def snapshot(self) -> Dict[str, Any]: ...
+
+class RequestMetrics:
+    bounds: List[float]
+    routes: Dict[str, Dict[Optional[bytes], RouteMetrics]]
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS) -> None: ...
+    def get_route_metrics(
+        self, method: str, pattern: Optional[bytes]
+    ) -> RouteMetrics: ...
+    def record(
+        self, method: str, pattern: Optional[bytes], status: int, duration: float
+    ) -> RouteMetrics: ...
+    def __iter__(self) -> Iterator[RouteMetrics]: ...
+    def reset(self) -> None: ...
+    def get_snapshot(self) -> List[Dict[str, Any]]: ...
@@ -0,0 +1,297 @@
+# cython: language_level=3
+# cython: boundscheck=False, wraparound=False, cdivision=True
+
+from cpython.mem cimport PyMem_Free, PyMem_Malloc
+
+from time import perf_counter
+
+
+def exponential_buckets(double start, double factor, int count):
+    """
+    Returns `count` upper bounds for histogram buckets, starting at `start`
+    and growing by `factor`.
+    """
+    if start <= 0 or factor <= 1 or count < 1:
+        raise ValueError("Invalid exponential buckets.")
+    return [start * factor**index for index in range(count)]
+
+
+# bounds from 100µs to about 74 seconds, each ~41% larger than the previous
+LATENCY_BUCKETS = exponential_buckets(0.0001, 2**0.5, 40)
+
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+# methods recorded under their own label; any other method, which a client can
+# choose freely, is recorded as OTHER_METHOD to keep the number of series bounded
+KNOWN_METHODS = frozenset(
+    ("GET", "HEAD", "POST", "PUT", "DELETE", "CONNECT", "OPTIONS", "TRACE", "PATCH")
+)
+
+OTHER_METHOD = "OTHER"
+
+
+cdef class Histogram:
+    """
+    A histogram with fixed buckets. The bucket of a value is the first whose
+    upper bound is greater than or equal to the value; values greater than the
+    last bound are counted in an overflow bucket.
+    """
+
+    def __cinit__(self, bounds=LATENCY_BUCKETS):
+        bounds = list(bounds)
+        if not bounds or bounds != sorted(bounds):
+            raise ValueError("The bounds of a histogram must be sorted.")
+        self.bounds = bounds
+        self.size = len(bounds)
+        self._bounds = <double*>PyMem_Malloc(self.size * sizeof(double))
+        self._counts = <unsigned long long*>PyMem_Malloc(
+            (self.size + 1) * sizeof(unsigned long long)
+        )
+        if self._bounds == NULL or self._counts == NULL:
+            raise MemoryError()
+        for index in range(self.size):
+            self._bounds[index] = bounds[index]
+        self.reset()
+
+    def __dealloc__(self):
+        PyMem_Free(self._bounds)
+        PyMem_Free(self._counts)
+
+    @property
+    def counts(self):
+        return [self._counts[index] for index in range(self.size + 1)]
+
+    cpdef void record(self, double value):
+        cdef Py_ssize_t low = 0
+        cdef Py_ssize_t high = self.size
+        cdef Py_ssize_t middle
+
+        # the first bound greater than or equal to the value
+        while low < high:
+            middle = (low + high) >> 1
+            if self._bounds[middle] < value:
+                low = middle + 1
+            else:
+                high = middle
+        self._counts[low] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    cpdef void reset(self):
+        cdef Py_ssize_t index
+        for index in range(self.size + 1):
+            self._counts[index] = 0
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    cpdef double percentile(self, double percentile):
+        """
+        Returns an estimate of the given percentile (0-100), as the upper bound
+        of the bucket containing it, or the maximum value for the overflow
+        bucket.
+        """
+        cdef double rank
+        cdef unsigned long long seen = 0
+        cdef Py_ssize_t index
+
+        if not self.count:
+            return 0.0
+        rank = percentile / 100 * self.count
+        for index in range(self.size + 1):
+            seen += self._counts[index]
+            if seen >= rank and self._counts[index]:
+                if index == self.size:
+                    return self.max
+                return min(self._bounds[index], self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+cdef class StreamingMetrics:
+    """
+    The metrics of the streamed responses of a route: the time between the
+    response head and the first body chunk, the gaps between body chunks and
+    the duration of the streams, the bytes sent, and the count of streams
+    interrupted before their end.
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.time_to_first_byte = Histogram(bounds)
+        self.chunk_gap = Histogram(bounds)
+        self.duration = Histogram(bounds)
+
+    cpdef void record(self, StreamRecorder recorder):
+        self.count += 1
+        self.bytes += recorder.bytes
+        if not recorder.completed:
+            self.incomplete += 1
+        if recorder.chunks:
+            self.time_to_first_byte.record(recorder.time_to_first_byte)
+        self.duration.record(recorder.duration)
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "incomplete": self.incomplete,
+            "bytes": self.bytes,
+            "time_to_first_byte": self.time_to_first_byte.snapshot(),
+            "chunk_gap": self.chunk_gap.snapshot(),
+            "duration": self.duration.snapshot(),
+        }
+
+
+cdef class StreamRecorder:
+    """
+    Measures the body of a streamed response while it is sent: the instance is
+    created when the response head is sent, `on_chunk` is called after each
+    body chunk is sent, and `on_end` once the stream ends, whether completed
+    or interrupted. If the metrics of the route are given, the measurements
+    are added to them.
+    """
+
+    def __init__(self, RouteMetrics route_metrics=None):
+        if route_metrics is not None:
+            self.route = route_metrics.route
+            self.metrics = route_metrics.get_streaming_metrics()
+        self.start = perf_counter()
+        self._last = self.start
+
+    cpdef void on_chunk(self, Py_ssize_t size):
+        cdef double now = perf_counter()
+
+        if self.chunks:
+            if now - self._last > self.max_chunk_gap:
+                self.max_chunk_gap = now - self._last
+            if self.metrics is not None:
+                self.metrics.chunk_gap.record(now - self._last)
+        else:
+            self.time_to_first_byte = now - self.start
+        self._last = now
+        self.chunks += 1
+        self.bytes += size
+
+    cpdef void on_end(self, bint completed):
+        self.duration = perf_counter() - self.start
+        self.completed = completed
+        if self.metrics is not None:
+            self.metrics.record(self)
+
+    def get_info(self):
+        return {
+            "route": self.route,
+            "completed": self.completed,
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "time_to_first_byte": self.time_to_first_byte,
+            "max_chunk_gap": self.max_chunk_gap,
+            "duration": self.duration,
+        }
+
+
+cdef class RouteMetrics:
+    """
+    The metrics of the requests handled by a route for a method: a latency
+    histogram and the count of responses by status class, and the metrics of
+    streamed responses, created when the first one is sent.
+    """
+
+    def __init__(self, str method, str route, bounds=LATENCY_BUCKETS):
+        self.method = method
+        self.route = route
+        self.duration = Histogram(bounds)
+
+    @property
+    def statuses(self):
+        # the counts by status class, from 1xx (index 1) to 5xx (index 5)
+        return [self._statuses[index] for index in range(6)]
+
+    cpdef void record(self, int status, double duration):
+        cdef int index = status // 100
+        self._statuses[index if 0 < index < 6 else 0] += 1
+        self.duration.record(duration)
+
+    cpdef StreamingMetrics get_streaming_metrics(self):
+        if self.streaming is None:
+            self.streaming = StreamingMetrics(self.duration.bounds)
+        return self.streaming
+
+    def snapshot(self):
+        statuses = self.statuses
+        snapshot = {
+            "method": self.method,
+            "route": self.route,
+            "statuses": {
+                name: statuses[index + 1]
+                for index, name in enumerate(STATUS_CLASSES)
+                if statuses[index + 1]
+            },
+            "duration": self.duration.snapshot(),
+        }
+        if self.streaming is not None:
+            snapshot["streaming"] = self.streaming.snapshot()
+        return snapshot
+
+
+cdef class RequestMetrics:
+    """
+    Collects the metrics of the requests handled by an application, by
+    method and route template. Methods not in KNOWN_METHODS are recorded
+    under OTHER_METHOD.
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = list(bounds)
+        self.routes = {}
+
+    cpdef RouteMetrics get_route_metrics(self, str method, object pattern):
+        cdef dict by_pattern = self.routes.get(method)
+        cdef RouteMetrics metrics
+
+        if method not in KNOWN_METHODS:
+            method = OTHER_METHOD
+            by_pattern = self.routes.get(method)
+        if by_pattern is None:
+            by_pattern = self.routes[method] = {}
+        metrics = by_pattern.get(pattern)
+        if metrics is None:
+            route = pattern.decode() if pattern is not None else UNMATCHED_ROUTE
+            metrics = RouteMetrics(method, route, self.bounds)
+            by_pattern[pattern] = metrics
+        return metrics
+
+    cpdef RouteMetrics record(
+        self, str method, object pattern, int status, double duration
+    ):
+        cdef dict by_pattern = self.routes.get(method)
+        cdef RouteMetrics metrics = None
+
+        if by_pattern is not None:
+            metrics = by_pattern.get(pattern)
+        if metrics is None:
+            metrics = self.get_route_metrics(method, pattern)
+        metrics.record(status, duration)
+        return metrics
+
+    def __iter__(self):
+        for by_pattern in self.routes.values():
+            yield from by_pattern.values()
+
+    def reset(self):
+        self.routes.clear()
+
+    def get_snapshot(self):
+        return [metrics.snapshot() for metrics in self]
@@ -1,3 +1,4 @@
+from shuttleasgi.middlewares.pipeline import MiddlewareStep
 from shuttleasgi.normalization import copy_special_attributes
 
 
@@ -8,13 +9,34 @@ def middleware_partial(handler, next_handler):
     return middleware_wrapper
 
 
+def middleware_applies_to(middleware, route) -> bool:
+    """
+    Returns a value indicating whether a middleware must be applied to the
+    given route. Middlewares can define an `applies_to(route)` method, called
+    once when the application configures its middlewares, to be excluded from
+    the chains of the routes they would not affect.
+    """
+    applies_to = getattr(middleware, "applies_to", None)
+    if applies_to is None:
+        return True
+    return bool(applies_to(route))
+
+
+def get_route_middlewares(middlewares, route):
+    return [
+        middleware
+        for middleware in middlewares
+        if middleware and middleware_applies_to(middleware, route)
+    ]
+
+
 def get_middlewares_chain(middlewares, handler):
     fn = handler
     for middleware in reversed(middlewares):
         if not middleware:
             continue
-        wrapper_fn = middleware_partial(middleware, fn)
-        setattr(wrapper_fn, "root_fn", handler)
-        copy_special_attributes(fn, wrapper_fn)
-        fn = wrapper_fn
+        step = MiddlewareStep(middleware, fn)
+        setattr(step, "root_fn", handler)
+        copy_special_attributes(fn, step)
+        fn = step
     return fn
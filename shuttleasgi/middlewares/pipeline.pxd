@@ -0,0 +1,7 @@
+# cython: language_level=3
+
+
+cdef class MiddlewareStep:
+    cdef readonly object middleware
+    cdef readonly object next_handler
+    cdef dict __dict__
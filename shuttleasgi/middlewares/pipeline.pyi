@@ -0,0 +1,14 @@
+from typing import Any, Awaitable, Callable
+
+from shuttleasgi.messages import Request
+
+class MiddlewareStep:
+    middleware: Callable[[Request, Callable[..., Awaitable[Any]]], Awaitable[Any]]
+    next_handler: Callable[[Request], Awaitable[Any]]
+
+    def __init__(
+        self,
+        middleware: Callable[[Request, Callable[..., Awaitable[Any]]], Awaitable[Any]],
+        next_handler: Callable[[Request], Awaitable[Any]],
+    ) -> None: ...
+    def __call__(self, request: Request) -> Awaitable[Any]: ...
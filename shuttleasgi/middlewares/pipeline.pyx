@@ -0,0 +1,27 @@
+# cython: language_level=3
+
+"""
+This module executes chains of middlewares with the (request, handler)
+signature without a coroutine frame of their own for each layer: each
+middleware is called by a step object, created once per chain, that returns
+the coroutine of the middleware instead of awaiting it.
+"""
+
+
+cdef class MiddlewareStep:
+    """
+    Calls a middleware with the request and the next step of the chain, or the
+    request handler at its end. Steps are reused by all requests, and have the
+    special attributes of the request handler, like `allow_anonymous`, read by
+    middlewares.
+    """
+
+    def __init__(self, object middleware, object next_handler):
+        self.middleware = middleware
+        self.next_handler = next_handler
+
+    def __call__(self, request):
+        return self.middleware(request, self.next_handler)
+
+    def __repr__(self):
+        return f"<MiddlewareStep {self.middleware!r}>"
@@ -1,7 +1,11 @@
 from shuttleasgi.messages import Request
+from shuttleasgi.server.routing import Route
 from typing import Callable, Awaitable, Any
 
+def has_shuttle_headers(handler: Any) -> bool: ...
+
 class ShuttleHeadersDecoratorMiddleware:
+    def applies_to(self, route: Route) -> bool: ...
     async def __call__(self, request: Request, handler: Callable[..., Awaitable[Any]]) -> Any: ...
 
 def shuttle_headers() -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]: ...
\ No newline at end of file
@@ -11,6 +11,8 @@ def copy_special_attributes(source_method, wrapper) -> None:
         "root_fn",
         "binders",
         "return_type",
+        "priority",
+        "rate_limit",
     }:
         if hasattr(source_method, name):
             setattr(wrapper, name, getattr(source_method, name))
@@ -23,10 +23,22 @@ cdef bytes write_request_method(Request request)
 
 cpdef bytes write_request_without_body(Request request)
 
+cpdef bytearray write_request_head(Request request)
+
+cpdef list write_request_parts(Request request)
+
+cpdef list get_chunk_views(bytes data, Py_ssize_t chunk_size=*)
+
 cdef bint is_small_response(Response response)
 
 cdef bytes write_small_response(Response response)
 
+cpdef bytes write_response_head(Response response)
+
+cpdef tuple get_content_length_header(Py_ssize_t length)
+
+cpdef tuple get_content_type_header(bytes content_type)
+
 cdef void set_headers_for_content(Message message)
 
 cdef void set_headers_for_response_content(Response message)
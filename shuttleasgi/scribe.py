@@ -7,6 +7,9 @@ from .messages import Request, Response
 
 MAX_RESPONSE_CHUNK_SIZE = 61440  # 64kb
 
+# Response bodies up to this size are sent in a single ASGI message
+DEFAULT_RESPONSE_CHUNK_THRESHOLD = 1048576  # 1 MiB
+
 
 # Header writing utilities
 def write_header(header):
@@ -68,30 +71,70 @@ def should_use_chunked_encoding(content: Content):
     return content.length < 0
 
 
+CONTENT_LENGTH_ZERO = (b"content-length", b"0")
+TRANSFER_ENCODING_CHUNKED = (b"transfer-encoding", b"chunked")
+DEFAULT_CONTENT_TYPE = (b"content-type", b"application/octet-stream")
+
+CONTENT_LENGTH_HEADERS_SIZE = 16384
+_content_length_headers = [None] * CONTENT_LENGTH_HEADERS_SIZE
+
+CONTENT_TYPE_HEADERS_SIZE = 256
+_content_type_headers = {}
+
+
+def get_content_length_header(length: int):
+    if length >= CONTENT_LENGTH_HEADERS_SIZE or length < 0:
+        return (b"content-length", str(length).encode())
+
+    header = _content_length_headers[length]
+    if header is None:
+        header = (b"content-length", str(length).encode())
+        _content_length_headers[length] = header
+    return header
+
+
+def get_content_type_header(content_type: bytes):
+    if not content_type:
+        return DEFAULT_CONTENT_TYPE
+
+    header = _content_type_headers.get(content_type)
+    if header is None:
+        header = (b"content-type", content_type)
+        # values with a multipart boundary are unique, caching them would
+        # fill the cache with values that are never reused
+        if (
+            len(_content_type_headers) < CONTENT_TYPE_HEADERS_SIZE
+            and b"boundary=" not in content_type
+        ):
+            _content_type_headers[content_type] = header
+    return header
+
+
 def set_headers_for_response_content(message: Response):
     content = message.content
     if not content:
-        message._add_header(b"content-length", b"0")
+        message._raw_headers.append(CONTENT_LENGTH_ZERO)
         return
-    message._add_header(b"content-type", content.type or b"application/octet-stream")
+    message._raw_headers.append(get_content_type_header(content.type))
     if should_use_chunked_encoding(content):
-        message._add_header(b"transfer-encoding", b"chunked")
+        message._raw_headers.append(TRANSFER_ENCODING_CHUNKED)
     else:
-        message._add_header(b"content-length", str(content.length).encode())
+        message._raw_headers.append(get_content_length_header(content.length))
 
 
 def set_headers_for_content(message):
     content = message.content
     if not content:
-        message._add_header_if_missing(b"content-length", b"0")
+        if not message._has_header(b"content-length"):
+            message._raw_headers.append(CONTENT_LENGTH_ZERO)
         return
-    message._add_header_if_missing(
-        b"content-type", content.type or b"application/octet-stream"
-    )
+    if not message._has_header(b"content-type"):
+        message._raw_headers.append(get_content_type_header(content.type))
     if should_use_chunked_encoding(content):
-        message._add_header_if_missing(b"transfer-encoding", b"chunked")
-    else:
-        message._add_header_if_missing(b"content-length", str(content.length).encode())
+        if not message._has_header(b"transfer-encoding"):
+            message._raw_headers.append(TRANSFER_ENCODING_CHUNKED)
+    elif not message._has_header(b"content-length"):
+        message._raw_headers.append(get_content_length_header(content.length))
 
 
 def write_response_cookie(cookie: Cookie):
@@ -179,6 +222,15 @@ def write_small_response(response: Response):
     return bytes(data)
 
 
+def write_response_head(response: Response):
+    data = bytearray()
+    data.extend(STATUS_LINES[response.status])
+    set_headers_for_content(response)
+    extend_data_with_headers(response._raw_headers, data)
+    data.extend(b"\r\n")
+    return bytes(data)
+
+
 def py_write_small_response(response: Response):
     return write_small_response(response)
 
@@ -197,22 +249,39 @@ async def write_request_body_only(request: Request):
             async for chunk in content.get_parts():
                 yield chunk
         else:
-            data = content.body
-            if content.length > MAX_RESPONSE_CHUNK_SIZE:
-                for chunk in get_chunks(data):
-                    yield chunk
-            else:
-                yield data
+            for view in get_chunk_views(content.body):
+                yield view
     else:
         raise ValueError("Missing request content")
 
 
-async def write_request(request: Request):
+def write_request_head(request: Request):
+    data = bytearray()
     ensure_host_header(request)
     set_headers_for_content(request)
-    yield write_request_method(request) + b" " + write_request_uri(
-        request
-    ) + b" HTTP/1.1\r\n" + write_headers(request._raw_headers) + b"\r\n"
+    data.extend(write_request_method(request))
+    data.extend(b" ")
+    data.extend(write_request_uri(request))
+    data.extend(b" HTTP/1.1\r\n")
+    extend_data_with_headers(request._raw_headers, data)
+    data.extend(b"\r\n")
+    return data
+
+
+def write_request_parts(request: Request):
+    content = request.content
+    if content and (
+        should_use_chunked_encoding(content) or isinstance(content, StreamedContent)
+    ):
+        return None
+    parts = [write_request_head(request)]
+    if content:
+        parts.extend(get_chunk_views(content.body))
+    return parts
+
+
+async def write_request(request: Request):
+    yield write_request_head(request)
     content = request.content
     if content:
         if should_use_chunked_encoding(content):
@@ -222,12 +291,15 @@ async def write_request(request: Request):
             async for chunk in content.get_parts():
                 yield chunk
         else:
-            data = content.body
-            if content.length > MAX_RESPONSE_CHUNK_SIZE:
-                for chunk in get_chunks(data):
-                    yield chunk
-            else:
-                yield data
+            for chunk in get_chunk_views(content.body):
+                yield chunk
+
+
+def get_chunk_views(data: bytes, chunk_size: int = MAX_RESPONSE_CHUNK_SIZE):
+    if len(data) <= chunk_size:
+        return [data]
+    view = memoryview(data)
+    return [view[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
 
 
 def get_chunks(data: bytes):
@@ -261,7 +333,12 @@ async def write_response(response: Response):
         yield chunk
 
 
-async def send_asgi_response(response: Response, send):
+async def send_asgi_response(
+    response: Response,
+    send,
+    chunk_threshold: int = DEFAULT_RESPONSE_CHUNK_THRESHOLD,
+    recorder=None,
+):
     content = response.content
     set_headers_for_response_content(response)
     await send(
@@ -274,23 +351,11 @@ async def send_asgi_response(response: Response, send):
     if content:
         if content.length < 0 or isinstance(content, StreamedContent):
             closing_chunk = False
-            async for chunk in content.get_parts():
-                if not chunk:
-                    closing_chunk = True
-                await send(
-                    {
-                        "type": "http.response.body",
-                        "body": chunk,
-                        "more_body": bool(chunk),
-                    }
-                )
-            if not closing_chunk:
-                await send(
-                    {"type": "http.response.body", "body": b"", "more_body": False}
-                )
-        else:
-            if content.length > MAX_RESPONSE_CHUNK_SIZE:
-                for chunk in get_chunks(content.body):
+            completed = False
+            try:
+                async for chunk in content.get_parts():
+                    if not chunk:
+                        closing_chunk = True
                     await send(
                         {
                             "type": "http.response.body",
@@ -298,14 +363,35 @@ async def send_asgi_response(response: Response, send):
                             "more_body": bool(chunk),
                         }
                     )
-            else:
+                    if recorder is not None and chunk:
+                        recorder.on_chunk(len(chunk))
+                if not closing_chunk:
+                    await send(
+                        {"type": "http.response.body", "body": b"", "more_body": False}
+                    )
+                completed = True
+            finally:
+                if recorder is not None:
+                    recorder.on_end(completed)
+        elif content.length > chunk_threshold:
+            views = get_chunk_views(content.body, chunk_threshold)
+            last = len(views) - 1
+            for i, view in enumerate(views):
                 await send(
                     {
                         "type": "http.response.body",
-                        "body": content.body,
-                        "more_body": False,
+                        "body": view,
+                        "more_body": i < last,
                     }
                 )
+        else:
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": content.body,
+                    "more_body": False,
+                }
+            )
     else:
         await send({"type": "http.response.body", "body": b""})
 
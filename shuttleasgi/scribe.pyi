@@ -1,8 +1,9 @@
-from typing import AsyncIterable, Callable
+from typing import AsyncIterable, Callable, List, Optional, Tuple, Union
 
 from shuttleasgi.contents import Content, ServerSentEvent
 from shuttleasgi.cookies import Cookie
 from shuttleasgi.messages import Request, Response
+from shuttleasgi.metrics import StreamRecorder
 
 def get_status_line(status: int) -> bytes: ...
 def is_small_request(request: Request) -> bool: ...
@@ -10,9 +11,27 @@ def request_has_body(request: Request) -> bool: ...
 def write_small_request(request: Request) -> bytes: ...
 def write_request_without_body(request: Request) -> bytes: ...
 def write_chunks(content: Content) -> AsyncIterable[bytes]: ...
-async def send_asgi_response(response: Response, send: Callable): ...
-def write_request(request: Request) -> AsyncIterable[bytes]: ...
+def get_content_length_header(length: int) -> Tuple[bytes, bytes]: ...
+def get_content_type_header(content_type: bytes) -> Tuple[bytes, bytes]: ...
+DEFAULT_RESPONSE_CHUNK_THRESHOLD: int
+
+async def send_asgi_response(
+    response: Response,
+    send: Callable,
+    chunk_threshold: int = ...,
+    recorder: Optional[StreamRecorder] = ...,
+): ...
+def write_request_head(request: Request) -> bytearray: ...
+def write_request_parts(
+    request: Request,
+) -> Optional[List[Union[bytes, bytearray, memoryview]]]: ...
+def get_chunk_views(
+    data: bytes, chunk_size: int = ...
+) -> List[Union[bytes, memoryview]]: ...
+def write_request(request: Request) -> AsyncIterable[Union[bytes, memoryview]]: ...
 def write_response(response: Response) -> AsyncIterable[bytes]: ...
+def write_response_head(response: Response) -> bytes: ...
+def py_write_small_response(response: Response) -> bytes: ...
 def write_request_body_only(request: Request) -> AsyncIterable[bytes]: ...
 def write_response_cookie(cookie: Cookie) -> bytes: ...
 def write_sse(event: ServerSentEvent) -> bytes: ...
@@ -6,6 +6,7 @@ from cpython.bytes cimport PyBytes_FromStringAndSize, PyBytes_AS_STRING, PyBytes
 from .contents cimport Content, StreamedContent
 from .cookies cimport Cookie, write_cookie_for_response
 from .messages cimport Request, Response
+from .metrics cimport StreamRecorder
 from .url cimport URL
 
 
@@ -46,6 +47,9 @@ cdef bytes _get_status_line(int status_code):
         return b'HTTP/1.1 ' + str(status_code).encode() + b'\r\n'
 
 
+# Response bodies up to this size are sent in a single ASGI message
+DEFAULT_RESPONSE_CHUNK_THRESHOLD = 1048576  # 1 MiB
+
 STATUS_LINES = {
     status_code: _get_status_line(status_code) for status_code in range(100, 600)
 }
@@ -78,34 +82,88 @@ cdef inline bint should_use_chunked_encoding(Content content):
     return content.length < 0
 
 
+cdef tuple CONTENT_LENGTH_ZERO = (b'content-length', b'0')
+cdef tuple TRANSFER_ENCODING_CHUNKED = (b'transfer-encoding', b'chunked')
+cdef tuple DEFAULT_CONTENT_TYPE = (b'content-type', b'application/octet-stream')
+
+cdef Py_ssize_t CONTENT_LENGTH_HEADERS_SIZE = 16384
+cdef list _content_length_headers = [None] * CONTENT_LENGTH_HEADERS_SIZE
+
+cdef Py_ssize_t CONTENT_TYPE_HEADERS_SIZE = 256
+cdef dict _content_type_headers = {}
+
+
+cpdef tuple get_content_length_header(Py_ssize_t length):
+    """
+    Returns a content-length header tuple for the given length, reusing the
+    tuples of small lengths, which are created once and cached.
+    """
+    cdef object header
+
+    if length >= CONTENT_LENGTH_HEADERS_SIZE or length < 0:
+        return (b'content-length', str(length).encode())
+
+    header = _content_length_headers[length]
+    if header is None:
+        header = (b'content-length', str(length).encode())
+        _content_length_headers[length] = header
+    return <tuple>header
+
+
+cpdef tuple get_content_type_header(bytes content_type):
+    """
+    Returns a content-type header tuple for the given value, reusing the
+    tuples of the most common content types.
+    """
+    cdef object header
+
+    if not content_type:
+        return DEFAULT_CONTENT_TYPE
+
+    header = _content_type_headers.get(content_type)
+    if header is None:
+        header = (b'content-type', content_type)
+        # values with a multipart boundary are unique, caching them would
+        # fill the cache with values that are never reused
+        if (
+            len(_content_type_headers) < CONTENT_TYPE_HEADERS_SIZE
+            and b'boundary=' not in content_type
+        ):
+            _content_type_headers[content_type] = header
+    return <tuple>header
+
+
 cdef void set_headers_for_response_content(Response message):
     cdef Content content = message.content
 
     if not content:
-        message._add_header(b'content-length', b'0')
+        message._raw_headers.append(CONTENT_LENGTH_ZERO)
         return
 
-    message._add_header(b'content-type', content.type or b'application/octet-stream')
+    message._raw_headers.append(get_content_type_header(content.type))
 
     if should_use_chunked_encoding(content):
-        message._add_header(b'transfer-encoding', b'chunked')
+        message._raw_headers.append(TRANSFER_ENCODING_CHUNKED)
     else:
-        message._add_header(b'content-length', str(content.length).encode())
+        message._raw_headers.append(get_content_length_header(content.length))
 
 
 cdef void set_headers_for_content(Message message):
     cdef Content content = message.content
 
     if not content:
-        message._add_header_if_missing(b'content-length', b'0')
+        if not message._has_header(b'content-length'):
+            message._raw_headers.append(CONTENT_LENGTH_ZERO)
         return
 
-    message._add_header_if_missing(b'content-type', content.type or b'application/octet-stream')
+    if not message._has_header(b'content-type'):
+        message._raw_headers.append(get_content_type_header(content.type))
 
     if should_use_chunked_encoding(content):
-        message._add_header_if_missing(b'transfer-encoding', b'chunked')
-    else:
-        message._add_header_if_missing(b'content-length', str(content.length).encode())
+        if not message._has_header(b'transfer-encoding'):
+            message._raw_headers.append(TRANSFER_ENCODING_CHUNKED)
+    elif not message._has_header(b'content-length'):
+        message._raw_headers.append(get_content_length_header(content.length))
 
 
 cpdef bytes write_response_cookie(Cookie cookie):
@@ -193,6 +251,19 @@ cdef bytes write_small_response(Response response):
     return bytes(data)
 
 
+cpdef bytes write_response_head(Response response):
+    """
+    Writes the status line and the headers of a response, including the
+    headers describing the response content.
+    """
+    cdef bytearray data = bytearray()
+    data.extend(STATUS_LINES[response.status])
+    set_headers_for_content(response)
+    extend_data_with_headers(response._raw_headers, data)
+    data.extend(b'\r\n')
+    return bytes(data)
+
+
 cpdef bytes py_write_small_response(Response response):
     return write_small_response(response)
 
@@ -204,8 +275,8 @@ cpdef bytes py_write_small_request(Request request):
 async def write_request_body_only(Request request):
     # This method is used only for Expect: 100-continue scenario;
     # in such case the request headers are sent before the body
-    cdef bytes data
     cdef bytes chunk
+    cdef object view
     cdef Content content
 
     content = request.content
@@ -218,28 +289,55 @@ async def write_request_body_only(Request request):
             async for chunk in content.get_parts():
                 yield chunk
         else:
-            data = content.body
-
-            if content.length > MAX_RESPONSE_CHUNK_SIZE:
-                for chunk in get_chunks(data):
-                    yield chunk
-            else:
-                yield data
+            for view in get_chunk_views(content.body):
+                yield view
     else:
         raise ValueError('Missing request content')
 
 
-async def write_request(Request request):
-    cdef bytes data
-    cdef bytes chunk
-    cdef Content content
+cpdef bytearray write_request_head(Request request):
+    """
+    Writes the request line and the request headers, including the headers
+    describing the request content, into a single buffer.
+    """
+    cdef bytearray data = bytearray()
 
     ensure_host_header(request)
-
     set_headers_for_content(request)
 
-    yield write_request_method(request) + b' ' + write_request_uri(request) + b' HTTP/1.1\r\n' + \
-        write_headers(request._raw_headers) + b'\r\n'
+    data.extend(write_request_method(request))
+    data.extend(b' ')
+    data.extend(write_request_uri(request))
+    data.extend(b' HTTP/1.1\r\n')
+    extend_data_with_headers(request._raw_headers, data)
+    data.extend(b'\r\n')
+    return data
+
+
+cpdef list write_request_parts(Request request):
+    """
+    Returns the parts of a request whose body is fully available: the request
+    head followed by memoryview slices of the body, to be written with
+    `transport.writelines`. The body is never copied. Returns None if the
+    request content is streamed.
+    """
+    cdef Content content = request.content
+    cdef list parts
+
+    if content and (should_use_chunked_encoding(content) or isinstance(content, StreamedContent)):
+        return None
+
+    parts = [write_request_head(request)]
+    if content:
+        parts.extend(get_chunk_views(content.body))
+    return parts
+
+
+async def write_request(Request request):
+    cdef object chunk
+    cdef Content content
+
+    yield write_request_head(request)
 
     content = request.content
 
@@ -251,13 +349,23 @@ async def write_request(Request request):
             async for chunk in content.get_parts():
                 yield chunk
         else:
-            data = content.body
+            for chunk in get_chunk_views(content.body):
+                yield chunk
 
-            if content.length > MAX_RESPONSE_CHUNK_SIZE:
-                for chunk in get_chunks(data):
-                    yield chunk
-            else:
-                yield data
+
+cpdef list get_chunk_views(bytes data, Py_ssize_t chunk_size=MAX_RESPONSE_CHUNK_SIZE):
+    """
+    Returns memoryview slices of the given bytes, of chunk_size at most,
+    without copying them.
+    """
+    cdef Py_ssize_t i, data_len = len(data)
+    cdef object view
+
+    if data_len <= chunk_size:
+        return [data]
+
+    view = memoryview(data)
+    return [view[i:i + chunk_size] for i in range(0, data_len, chunk_size)]
 
 
 def get_chunks(bytes data):
@@ -312,8 +420,22 @@ async def write_response(Response response):
         yield chunk
 
 
-async def send_asgi_response(Response response, object send):
+async def send_asgi_response(
+    Response response,
+    object send,
+    Py_ssize_t chunk_threshold=DEFAULT_RESPONSE_CHUNK_THRESHOLD,
+    StreamRecorder recorder=None
+):
+    """
+    Sends a response using the given ASGI send callable. Bodies up to
+    chunk_threshold bytes are sent in a single message, larger bodies in
+    chunks of chunk_threshold bytes. If a recorder is given, the chunks of
+    streamed bodies are reported to it.
+    """
     cdef bytes chunk
+    cdef list views
+    cdef Py_ssize_t i, last
+    cdef bint completed = False
     cdef Content content = response.content
 
     set_headers_for_response_content(response)
@@ -330,39 +452,46 @@ async def send_asgi_response(Response response, object send):
             # there is no need to write the length of each chunk
             # (see write_chunks function)
             closing_chunk = False
-            async for chunk in content.get_parts():
-                if not chunk:
-                    closing_chunk = True
-                await send({
-                    'type': 'http.response.body',
-                    'body': chunk,
-                    'more_body': bool(chunk)
-                })
-
-            if not closing_chunk:
-                # This is needed, otherwise uvicorn complains with:
-                # ERROR:    ASGI callable returned without completing response.
-                await send({
-                    'type': 'http.response.body',
-                    'body': b"",
-                    'more_body': False
-                })
-        else:
-            if content.length > MAX_RESPONSE_CHUNK_SIZE:
-                # Note: get_chunks yields the closing bytes fragment therefore
-                # we do not need to check for the closing message!
-                for chunk in get_chunks(content.body):
+            try:
+                async for chunk in content.get_parts():
+                    if not chunk:
+                        closing_chunk = True
                     await send({
                         'type': 'http.response.body',
                         'body': chunk,
                         'more_body': bool(chunk)
                     })
-            else:
+                    if recorder is not None and chunk:
+                        recorder.on_chunk(len(chunk))
+
+                if not closing_chunk:
+                    # This is needed, otherwise uvicorn complains with:
+                    # ERROR:    ASGI callable returned without completing response.
+                    await send({
+                        'type': 'http.response.body',
+                        'body': b"",
+                        'more_body': False
+                    })
+                completed = True
+            finally:
+                if recorder is not None:
+                    recorder.on_end(completed)
+        elif content.length > chunk_threshold:
+            # NB: the body is sent in memoryview slices, without copying it
+            views = get_chunk_views(content.body, chunk_threshold)
+            last = len(views) - 1
+            for i in range(last + 1):
                 await send({
                     'type': 'http.response.body',
-                    'body': content.body,
-                    'more_body': False
+                    'body': views[i],
+                    'more_body': i < last
                 })
+        else:
+            await send({
+                'type': 'http.response.body',
+                'body': content.body,
+                'more_body': False
+            })
     else:
         await send({
             'type': 'http.response.body',
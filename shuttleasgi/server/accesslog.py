@@ -0,0 +1,334 @@
+"""
+This module implements access logging without work on the event loop beyond
+storing a record per request: `BaseApplication.handle` appends records of
+fixed fields to a bounded buffer, and a background thread writes them in
+batches as JSON lines, to a file, a stream like stdout, or a socket.
+
+    access_log = AccessLog(FileSink("access.log"))
+    access_log.install(app)
+
+When the buffer is full, for example because the destination is slower than
+the rate of requests, records are dropped and counted rather than blocking
+the event loop.
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import IO, TYPE_CHECKING, Any, Deque, Dict, List, Optional, Tuple, Union
+
+import orjson
+
+from shuttleasgi.contents import StreamedContent
+from shuttleasgi.context import get_request_state
+from shuttleasgi.messages import Request, Response
+from shuttleasgi.metrics import StreamRecorder
+
+if TYPE_CHECKING:
+    from shuttleasgi.server.application import Application
+
+# the fields of access log records, stored as lists in this order
+FIELDS = (
+    "time",
+    "method",
+    "route",
+    "path",
+    "status",
+    "bytes",
+    "duration",
+    "time_to_first_byte",
+    "stream_duration",
+    "request_id",
+)
+
+
+class AccessLogSink(ABC):
+    """
+    Base class for destinations of access logs. Methods are called from the
+    background thread of the access log.
+    """
+
+    @abstractmethod
+    def write(self, data: bytes) -> None:
+        """Writes a batch of JSON lines."""
+
+    def close(self) -> None:
+        """Releases the resources of the sink."""
+
+
+class StreamSink(AccessLogSink):
+    """
+    Writes access logs to a binary or text stream, by default stdout.
+    """
+
+    def __init__(self, stream: Optional[IO] = None) -> None:
+        self.stream = stream if stream is not None else sys.stdout
+
+    def write(self, data: bytes) -> None:
+        stream = getattr(self.stream, "buffer", self.stream)
+        stream.write(data)
+        stream.flush()
+
+
+class FileSink(AccessLogSink):
+    """
+    Appends access logs to a file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "ab")
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class SocketSink(AccessLogSink):
+    """
+    Sends access logs to a log collector through a stream socket: a TCP
+    socket for a (host, port) address, or a Unix socket for a path. The
+    connection is established lazily, and again after errors; batches that
+    cannot be sent are dropped.
+    """
+
+    def __init__(
+        self, address: Union[str, Tuple[str, int]], timeout: float = 5.0
+    ) -> None:
+        self.address = address
+        self.timeout = timeout
+        self._socket: Optional[socket.socket] = None
+
+    def _connect(self) -> socket.socket:
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.address)
+            return sock
+        return socket.create_connection(self.address, self.timeout)
+
+    def write(self, data: bytes) -> None:
+        if self._socket is None:
+            self._socket = self._connect()
+        try:
+            self._socket.sendall(data)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+def _format_record(record: List[Any]) -> Dict[str, Any]:
+    route = record[2]
+    request_id = record[9]
+    return {
+        "time": record[0],
+        "method": record[1],
+        "route": route.decode() if route is not None else None,
+        "path": record[3].decode("utf8", "replace"),
+        "status": record[4],
+        "bytes": record[5],
+        "duration": record[6],
+        "time_to_first_byte": record[7],
+        "stream_duration": record[8],
+        "request_id": request_id.decode() if request_id is not None else None,
+    }
+
+
+class AccessLog:
+    """
+    Collects a record for each request handled by an application, and writes
+    them to the given sink from a background thread.
+
+    Parameters
+    ----------
+    sink: AccessLogSink
+        The destination of the access logs, by default stdout.
+    capacity: int
+        The maximum number of records waiting to be written; records are
+        dropped when it is reached.
+    batch_size: int
+        The maximum number of records written at once.
+    flush_interval: float
+        The seconds between writes of the records collected meanwhile.
+    """
+
+    def __init__(
+        self,
+        sink: Optional[AccessLogSink] = None,
+        capacity: int = 65536,
+        batch_size: int = 1024,
+        flush_interval: float = 0.5,
+    ) -> None:
+        self.sink = sink or StreamSink()
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+        self._buffer: Deque[List[Any]] = deque()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = 0
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    def record(
+        self,
+        request: Request,
+        response: Response,
+        route: Optional[bytes],
+        duration: float,
+    ) -> None:
+        """
+        Records a handled request. Called by the application for every
+        request; streamed responses are recorded once their body is sent.
+        """
+        if len(self._buffer) >= self.capacity:
+            self.dropped += 1
+            return
+
+        state = get_request_state()
+        content = response.content
+        record = [
+            time.time(),
+            request.method,
+            route,
+            request._path,
+            response.status,
+            content.length if content is not None and content.length > 0 else 0,
+            duration,
+            0.0,
+            0.0,
+            state.request_id if state is not None else None,
+        ]
+        if isinstance(content, StreamedContent):
+            # completed when the body is sent
+            request.access_record = record  # type: ignore
+        else:
+            self._buffer.append(record)
+
+    def record_stream(self, request: Request, recorder: StreamRecorder) -> None:
+        record = getattr(request, "access_record", None)
+        if record is None:
+            return
+        request.access_record = None  # type: ignore
+        if len(self._buffer) >= self.capacity:
+            self.dropped += 1
+            return
+        record[5] = recorder.bytes
+        record[7] = recorder.time_to_first_byte
+        record[8] = recorder.duration
+        self._buffer.append(record)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            if self._pid == os.getpid():
+                return
+            # inherited across a fork, for example by a worker of a preloaded
+            # app: the thread doesn't exist in this process, and the pending
+            # records are written by the parent
+            self._thread = None
+            self._stopping = threading.Event()
+            self._buffer.clear()
+        self._stopping.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(
+            target=self._run, name="shuttleasgi-access-log", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the background thread, after writing the pending records. This
+        method blocks until the thread ends, use `stop_async` on the event
+        loop.
+        """
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        self.sink.close()
+
+    async def stop_async(self) -> None:
+        """
+        Stops the background thread like `stop`, waiting for it in an
+        executor, without blocking the event loop.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.stop)
+
+    def flush(self) -> int:
+        """
+        Writes the pending records, in batches. Returns the number of records
+        written.
+        """
+        buffer = self._buffer
+        count = 0
+        while buffer:
+            batch = []
+            while buffer and len(batch) < self.batch_size:
+                batch.append(buffer.popleft())
+            data = b"".join(
+                orjson.dumps(_format_record(record), option=orjson.OPT_APPEND_NEWLINE)
+                for record in batch
+            )
+            try:
+                self.sink.write(data)
+            except Exception:
+                # the batch is lost, like records dropped under pressure
+                self.errors += 1
+                self.dropped += len(batch)
+                continue
+            self.written += len(batch)
+            count += len(batch)
+        return count
+
+    def install(self, app: "Application") -> None:
+        """
+        Records the requests handled by the application while it runs.
+        """
+        app.access_log = self
+
+        async def start_access_log(application: "Application") -> None:
+            self.start()
+
+        async def stop_access_log(application: "Application") -> None:
+            await self.stop_async()
+
+        async def record_stream(
+            application: "Application", request: Request, recorder: StreamRecorder
+        ) -> None:
+            self.record_stream(request, recorder)
+
+        app.on_start += start_access_log
+        app.on_stop += stop_access_log
+        app.on_stream_complete += record_stream
+
+    def _run(self) -> None:
+        stopping = self._stopping
+        while not stopping.wait(self.flush_interval):
+            self.flush()
+        self.flush()
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from functools import wraps
@@ -31,11 +32,11 @@ from rodi import ContainerProtocol
 from shuttleasgi.baseapp import BaseApplication, handle_not_found
 from shuttleasgi.common import extend
 from shuttleasgi.common.files.asyncfs import FilesHandler
-from shuttleasgi.contents import ASGIContent
+from shuttleasgi.contents import ASGIContent, Content, StreamedContent
 from shuttleasgi.exceptions import NotFound
 from shuttleasgi.messages import Request, Response
-from shuttleasgi.middlewares import get_middlewares_chain
-from shuttleasgi.scribe import send_asgi_response
+from shuttleasgi.middlewares import get_middlewares_chain, get_route_middlewares
+from shuttleasgi.scribe import DEFAULT_RESPONSE_CHUNK_THRESHOLD, send_asgi_response
 from shuttleasgi.server.asgi import get_request_url_from_scope
 from shuttleasgi.server.authentication import (
     AuthenticateChallenge,
@@ -50,10 +51,18 @@ from shuttleasgi.server.authorization import (
 )
 from shuttleasgi.server.controllers import ControllersManager
 from shuttleasgi.server.cors import CORSPolicy, CORSStrategy, get_cors_middleware
+from shuttleasgi.server.drain import InFlightRequests
 from shuttleasgi.server.env import EnvironmentSettings
 from shuttleasgi.server.errors import ServerErrorDetailsHandler
 from shuttleasgi.server.files import DefaultFileOptions
 from shuttleasgi.server.files.dynamic import serve_files_dynamic
+from shuttleasgi.server.metrics import (
+    LATENCY_BUCKETS,
+    PROMETHEUS_CONTENT_TYPE,
+    RequestMetrics,
+    StreamRecorder,
+    write_prometheus,
+)
 from shuttleasgi.server.normalization import normalize_handler, normalize_middleware
 from shuttleasgi.server.process import use_shutdown_handler
 from shuttleasgi.server.responses import _ensure_bytes
@@ -199,6 +208,9 @@ class Application(BaseApplication):
         self._services: ContainerProtocol = services
         self.middlewares: List[Callable[..., Awaitable[Response]]] = []
         self._default_headers: Optional[Tuple[Tuple[str, str], ...]] = None
+        self._response_chunk_threshold = DEFAULT_RESPONSE_CHUNK_THRESHOLD
+        self.in_flight = InFlightRequests()
+        self.drain_timeout = 30.0
         self._middlewares_configured = False
         self._cors_strategy: Optional[CORSStrategy] = None
         self._authentication_strategy: Optional[AuthenticationStrategy] = None
@@ -206,8 +218,10 @@ class Application(BaseApplication):
         self.on_start = ApplicationEvent(self)
         self.after_start = ApplicationEvent(self)
         self.on_stop = ApplicationEvent(self)
+        self.on_stream_complete = ApplicationEvent(self)
         self.on_middlewares_configuration = ApplicationSyncEvent(self)
         self.started = False
+        self._prepared = False
         self.files_handler = FilesHandler()
         self.server_error_details_handler = ServerErrorDetailsHandler()
         self._session_middleware: Optional[SessionMiddleware] = None
@@ -247,6 +261,21 @@ class Application(BaseApplication):
     def default_headers(self, value: Optional[Tuple[Tuple[str, str], ...]]) -> None:
         self._default_headers = tuple(value) if value else None
 
+    @property
+    def response_chunk_threshold(self) -> int:
+        """
+        Gets the size in bytes up to which response bodies are sent in a single
+        ASGI message. Larger bodies are sent in chunks of this size, without
+        copying them.
+        """
+        return self._response_chunk_threshold
+
+    @response_chunk_threshold.setter
+    def response_chunk_threshold(self, value: int) -> None:
+        if value <= 0:
+            raise ValueError("The response chunk threshold must be greater than 0.")
+        self._response_chunk_threshold = value
+
     @property
     def cors(self) -> CORSStrategy:
         if not self._cors_strategy:
@@ -310,6 +339,43 @@ class Application(BaseApplication):
         async def handle_child_app_stop(_):
             await app.stop()
 
+    def use_metrics(
+        self,
+        path: Optional[str] = "/metrics",
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> RequestMetrics:
+        """
+        Enables the collection of request metrics by route template, method and
+        status class, including the time to first byte, the gaps between chunks
+        and the duration of streamed responses. If a path is given, a route
+        exposing the metrics in the Prometheus text format is added.
+        """
+        metrics = RequestMetrics(buckets)
+        self.metrics = metrics
+
+        if path:
+
+            async def get_metrics():
+                return Response(
+                    200,
+                    None,
+                    Content(PROMETHEUS_CONTENT_TYPE, write_prometheus(metrics).encode()),
+                )
+
+            self.router.add_get(path, get_metrics)
+        return metrics
+
+    def get_stream_recorder(self, response: Response) -> Optional[StreamRecorder]:
+        """
+        Returns a StreamRecorder to measure the body of a streamed response
+        while it is sent, if request metrics are enabled or if there are
+        handlers for `on_stream_complete`; otherwise returns None.
+        """
+        route_metrics = getattr(response, "route_metrics", None)
+        if route_metrics is None and not self.on_stream_complete:
+            return None
+        return StreamRecorder(route_metrics)
+
     def use_sessions(
         self,
         store: Union[str, SessionStore],
@@ -584,7 +650,9 @@ class Application(BaseApplication):
 
     def _apply_middlewares_in_routes(self):
         for route in self.router:
-            route.handler = get_middlewares_chain(self.middlewares, route.handler)
+            route.handler = get_middlewares_chain(
+                get_route_middlewares(self.middlewares, route), route.handler
+            )
 
     def _normalize_middlewares(self):
         self.middlewares = [
@@ -686,22 +754,46 @@ class Application(BaseApplication):
         """
         extend(self, mixin)
 
-    async def start(self):
-        if self.started:
+    def prepare(self) -> None:
+        """
+        Configures the routes, controllers, request handlers and middlewares of
+        the application, without firing its start events. This is used to
+        preload the application before forking worker processes, which fire
+        the start events when they start the application. In this case,
+        `on_start` callbacks run after the configuration, and must not add
+        routes or middlewares.
+        """
+        if self._prepared:
             return
-
-        self.started = True
         self.router.apply_routes()
+        self._configure()
+        self._prepared = True
 
-        if self.on_start:
-            await self.on_start.fire()
-
+    def _configure(self) -> None:
         validate_default_router()
         self._check_prefix()
         self.use_controllers()
         self.normalize_handlers()
         self.configure_middlewares()
 
+    async def start(self):
+        if self.started:
+            return
+
+        self.started = True
+        self.in_flight.draining = False
+
+        if self._prepared:
+            if self.on_start:
+                await self.on_start.fire()
+        else:
+            self.router.apply_routes()
+
+            if self.on_start:
+                await self.on_start.fire()
+
+            self._configure()
+
         if self.after_start:
             await self.after_start.fire()
 
@@ -709,6 +801,25 @@ class Application(BaseApplication):
         await self.on_stop.fire()
         self.started = False
 
+    @property
+    def draining(self) -> bool:
+        """
+        Gets a value indicating whether the application is draining, responding
+        to new requests with 503 Service Unavailable.
+        """
+        return self.in_flight.draining
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Stops accepting new requests and waits for the requests in flight and
+        open streams to complete, up to `timeout` seconds (by default
+        `drain_timeout`), then cancels those still running. Returns True if all
+        the requests completed in time.
+        """
+        return await self.in_flight.drain(
+            self.drain_timeout if timeout is None else timeout
+        )
+
     async def _handle_lifespan(self, receive, send) -> None:
         message = await receive()
         assert message["type"] == "lifespan.startup"
@@ -724,11 +835,26 @@ class Application(BaseApplication):
 
         message = await receive()
         assert message["type"] == "lifespan.shutdown"
+        await self.drain()
         await self.stop()
         await send({"type": "lifespan.shutdown.complete"})
 
     async def _handle_websocket(self, scope, receive, send) -> None:
         ws = WebSocket(scope, receive, send)
+
+        in_flight = self.in_flight
+        if in_flight.draining:
+            await ws.close()
+            return
+
+        task = asyncio.current_task()
+        in_flight.websockets.add(task)  # type: ignore
+        try:
+            await self._handle_websocket_route(ws, scope)
+        finally:
+            in_flight.websockets.discard(task)  # type: ignore
+
+    async def _handle_websocket_route(self, ws: WebSocket, scope) -> None:
         # TODO: support filters
         route = self.router.get_match_by_method_and_path(
             RouteMethod.GET_WS, scope["path"]
@@ -786,12 +912,37 @@ class Application(BaseApplication):
     async def _handle_http(self, scope, receive, send) -> None:
         assert scope["type"] == "http"
 
-        request = self.instantiate_request(scope, receive)
-        response = await self.handle(request)
-        await send_asgi_response(response, send)
+        in_flight = self.in_flight
+        if in_flight.draining:
+            await send_asgi_response(in_flight.get_draining_response(), send)
+            return
+
+        task = asyncio.current_task()
+        in_flight.requests.add(task)  # type: ignore
+        try:
+            request = self.instantiate_request(scope, receive)
+            response = await self.handle(request)
+
+            if isinstance(response.content, StreamedContent):
+                recorder = self.get_stream_recorder(response)
+                in_flight.streams += 1
+                try:
+                    await send_asgi_response(
+                        response, send, self._response_chunk_threshold, recorder
+                    )
+                finally:
+                    in_flight.streams -= 1
+                    if recorder is not None and self.on_stream_complete:
+                        await self.on_stream_complete.fire(request, recorder)
+            else:
+                await send_asgi_response(
+                    response, send, self._response_chunk_threshold
+                )
 
-        request.scope = None  # type: ignore
-        request.content.dispose()  # type: ignore
+            request.scope = None  # type: ignore
+            request.content.dispose()  # type: ignore
+        finally:
+            in_flight.requests.discard(task)  # type: ignore
 
     async def __call__(self, scope, receive, send):
         if scope["type"] == "http":
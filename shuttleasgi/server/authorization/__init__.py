@@ -81,6 +81,11 @@ def get_authorization_middleware(
 
         return await handler(request)
 
+    def applies_to(route) -> bool:
+        # handlers that allow anonymous access are not authorized
+        return getattr(route.handler, "allow_anonymous", False) is not True
+
+    authorization_middleware.applies_to = applies_to  # type: ignore
     return authorization_middleware
 
 
@@ -0,0 +1,320 @@
+"""
+This module implements admission control for request handlers: a middleware
+limiting the number of requests handled concurrently, with a limit that
+adapts to the observed latency, and rejecting requests early with 503
+Service Unavailable and Retry-After when waiting for a slot would exceed a
+budget, or when the event loop lags.
+
+    limiter = AdaptiveConcurrencyMiddleware(queue_budget=0.5)
+    limiter.install(app)
+
+    @priority("critical")
+    @app.router.get("/health")
+    async def health():
+        ...
+
+Requests of handlers with "low" priority are shed first, "critical" ones
+last. Handlers without priority have "normal" priority.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Optional
+
+from shuttleasgi.messages import Request, Response
+from shuttleasgi.server.metrics import Histogram
+
+if TYPE_CHECKING:
+    from shuttleasgi.server.application import Application
+
+PRIORITIES = ("critical", "normal", "low")
+
+DEFAULT_PRIORITY = "normal"
+
+# the share of the concurrency limit available to requests of each priority
+PRIORITY_SHARES = {"critical": 1.0, "normal": 0.9, "low": 0.5}
+
+
+def priority(value: str) -> Callable[..., Any]:
+    """
+    Configures the priority of a request handler for load shedding:
+    "critical", "normal" (default), or "low".
+    """
+    if value not in PRIORITIES:
+        raise ValueError(
+            f"Invalid priority: {value}. Valid priorities: " + ", ".join(PRIORITIES)
+        )
+
+    def decorator(f):
+        f.priority = value
+        return f
+
+    return decorator
+
+
+class LoopLagMonitor:
+    """
+    Measures the lag of the event loop, as the delay of a callback scheduled at
+    regular intervals, with an exponentially weighted moving average. If a
+    histogram is given, each measurement is recorded in it.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        smoothing: float = 0.2,
+        histogram: Optional[Histogram] = None,
+    ) -> None:
+        self.interval = interval
+        self.smoothing = smoothing
+        self.histogram = histogram
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._expected = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._handle is not None
+
+    def start(self) -> None:
+        if self._handle is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._schedule()
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self) -> None:
+        assert self._loop is not None
+        self._expected = self._loop.time() + self.interval
+        self._handle = self._loop.call_at(self._expected, self._on_tick)
+
+    def _on_tick(self) -> None:
+        assert self._loop is not None
+        lag = max(self._loop.time() - self._expected, 0.0)
+        self.lag += self.smoothing * (lag - self.lag)
+        if lag > self.max_lag:
+            self.max_lag = lag
+        if self.histogram is not None:
+            self.histogram.record(lag)
+        self._schedule()
+
+
+class GradientLimit:
+    """
+    A concurrency limit adapting to latency: the limit grows while the
+    short-term latency stays close to the long-term baseline, and shrinks
+    proportionally when the latency grows, signalling that requests queue.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 100,
+        min_limit: int = 10,
+        max_limit: int = 1000,
+        smoothing: float = 0.2,
+        baseline_smoothing: float = 0.01,
+        tolerance: float = 1.5,
+    ) -> None:
+        if not 0 < min_limit <= initial_limit <= max_limit:
+            raise ValueError(
+                "The limits must satisfy 0 < min_limit <= initial_limit <= max_limit."
+            )
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.smoothing = smoothing
+        self.baseline_smoothing = baseline_smoothing
+        self.tolerance = tolerance
+        self.estimated_limit = float(initial_limit)
+        self.limit = initial_limit
+        self.latency = 0.0
+        self.baseline = 0.0
+
+    def update(self, latency: float, in_flight: int) -> int:
+        """
+        Updates the limit with the latency of a completed request, and the
+        number of requests in flight when it started.
+        """
+        if self.baseline == 0.0:
+            self.latency = self.baseline = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+            self.baseline += self.baseline_smoothing * (self.latency - self.baseline)
+            # the baseline follows improvements immediately
+            if self.latency < self.baseline:
+                self.baseline = self.latency
+
+        # the limit doesn't grow when it is not used, to not grow unbounded
+        # while the application has spare capacity
+        if in_flight < self.estimated_limit / 2:
+            return self.limit
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.baseline / self.latency))
+        new_limit = self.estimated_limit * gradient + math.sqrt(self.estimated_limit)
+        self.estimated_limit += self.smoothing * (new_limit - self.estimated_limit)
+        self.estimated_limit = max(
+            self.min_limit, min(self.max_limit, self.estimated_limit)
+        )
+        self.limit = int(self.estimated_limit)
+        return self.limit
+
+    def decrease(self, factor: float = 0.9) -> int:
+        """
+        Decreases the limit multiplicatively, for example when the event loop
+        lags.
+        """
+        self.estimated_limit = max(self.min_limit, self.estimated_limit * factor)
+        self.limit = int(self.estimated_limit)
+        return self.limit
+
+
+class AdaptiveConcurrencyMiddleware:
+    """
+    Limits the number of requests handled concurrently with an adaptive limit,
+    queueing requests when the limit is reached and rejecting them when their
+    estimated wait exceeds `queue_budget` seconds, or when the event loop lag
+    exceeds `max_loop_lag` seconds.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[GradientLimit] = None,
+        queue_budget: float = 1.0,
+        max_loop_lag: float = 0.2,
+        retry_after: int = 1,
+        status: int = 503,
+        lag_monitor: Optional[LoopLagMonitor] = None,
+    ) -> None:
+        self.limit = limit or GradientLimit()
+        self.queue_budget = queue_budget
+        self.max_loop_lag = max_loop_lag
+        self.lag_monitor = lag_monitor or LoopLagMonitor()
+        self.status = status
+        self.in_flight = 0
+        self.rejected = 0
+        self._last_decrease = 0.0
+        self._retry_after = str(retry_after).encode()
+        self._queues: Dict[str, Deque[asyncio.Future]] = {
+            name: deque() for name in PRIORITIES
+        }
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "latency": self.limit.latency,
+            "loop_lag": self.lag_monitor.lag,
+        }
+
+    def get_rejection_response(self) -> Response:
+        self.rejected += 1
+        return Response(self.status, [(b"Retry-After", self._retry_after)], None)
+
+    def install(self, app: "Application") -> None:
+        """
+        Adds this middleware to the application, measuring the lag of the
+        event loop while the application runs.
+        """
+        app.middlewares.append(self)
+
+        async def start_lag_monitor(application: "Application") -> None:
+            self.lag_monitor.start()
+
+        async def stop_lag_monitor(application: "Application") -> None:
+            self.lag_monitor.stop()
+
+        app.on_start += start_lag_monitor
+        app.on_stop += stop_lag_monitor
+
+    def estimate_wait(self) -> float:
+        """
+        Returns the estimated time a new request would wait for a slot, by
+        Little's law.
+        """
+        return (self.queued + 1) * self.limit.latency / self.limit.limit
+
+    def _can_admit(self, priority_name: str) -> bool:
+        return self.in_flight < self.limit.limit * PRIORITY_SHARES[priority_name]
+
+    async def __call__(self, request: Request, handler):
+        lag_monitor = self.lag_monitor
+        if not lag_monitor.running:
+            lag_monitor.start()
+
+        priority_name = getattr(handler, "priority", DEFAULT_PRIORITY)
+
+        if lag_monitor.lag > self.max_loop_lag:
+            # the event loop cannot keep up: shed all but critical requests,
+            # and decrease the limit once per measurement of the lag
+            now = time.monotonic()
+            if now - self._last_decrease >= lag_monitor.interval:
+                self._last_decrease = now
+                self.limit.decrease()
+            if priority_name != "critical":
+                return self.get_rejection_response()
+
+        if self._can_admit(priority_name):
+            self.in_flight += 1
+        else:
+            if self.estimate_wait() > self.queue_budget:
+                return self.get_rejection_response()
+            # when the request is woken, its slot is already reserved
+            if not await self._wait(priority_name):
+                return self.get_rejection_response()
+
+        in_flight = self.in_flight
+        start = time.perf_counter()
+        try:
+            return await handler(request)
+        finally:
+            self.limit.update(time.perf_counter() - start, in_flight)
+            self._release_slot()
+
+    async def _wait(self, priority_name: str) -> bool:
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._queues[priority_name]
+        queue.append(waiter)
+        admitted = False
+        try:
+            await asyncio.wait_for(waiter, self.queue_budget)
+            admitted = True
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if not admitted:
+                if waiter.done() and not waiter.cancelled():
+                    # a slot was reserved for the request, but it gave up
+                    self._release_slot()
+                else:
+                    waiter.cancel()
+            try:
+                queue.remove(waiter)
+            except ValueError:
+                pass
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        # wakes the waiters in priority order while they can be admitted,
+        # reserving their slots before they run, so that requests arriving
+        # in the meantime cannot take them
+        for priority_name in PRIORITIES:
+            queue = self._queues[priority_name]
+            while queue and self._can_admit(priority_name):
+                waiter = queue.popleft()
+                if not waiter.done():
+                    self.in_flight += 1
+                    waiter.set_result(None)
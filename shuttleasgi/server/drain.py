@@ -0,0 +1,90 @@
+"""
+This module implements the tracking of the requests being handled by an
+application, and its drain mode: when draining, the application responds to
+new requests with 503 Service Unavailable and a Retry-After header, while
+the requests in flight, including streamed responses like server-sent
+events, are given time to complete.
+
+    @app.router.get("/health")
+    async def health():
+        info = app.in_flight.get_info()
+        return json(info, status=503 if info["draining"] else 200)
+"""
+
+import asyncio
+from typing import Any, Dict, Optional, Set
+
+from shuttleasgi.messages import Response
+
+
+class InFlightRequests:
+    """
+    Keeps track of the tasks handling HTTP requests and WebSockets, and of the
+    streamed responses being sent.
+    """
+
+    def __init__(self, retry_after: int = 5) -> None:
+        self.retry_after = retry_after
+        self.draining = False
+        self.requests: Set[asyncio.Task] = set()
+        self.websockets: Set[asyncio.Task] = set()
+        self.streams = 0
+
+    def __len__(self) -> int:
+        return len(self.requests) + len(self.websockets)
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "draining": self.draining,
+            "requests": len(self.requests),
+            "streams": self.streams,
+            "websockets": len(self.websockets),
+        }
+
+    def get_draining_response(self) -> Response:
+        """
+        Returns the response for requests received while draining.
+        """
+        return Response(
+            503,
+            [
+                (b"Retry-After", str(self.retry_after).encode()),
+                (b"Connection", b"close"),
+            ],
+            None,
+        )
+
+    def start_draining(self) -> None:
+        """
+        Stops accepting new requests, without waiting for those in flight.
+        """
+        self.draining = True
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Stops accepting new requests, and waits up to `timeout` seconds for the
+        requests in flight and for the WebSockets to complete. The tasks still
+        running after the timeout are cancelled. Returns True if all the
+        requests completed in time.
+        """
+        self.draining = True
+        current_task: Optional[asyncio.Task] = asyncio.current_task()
+
+        def pending():
+            return [
+                task
+                for task in (*self.requests, *self.websockets)
+                if task is not current_task and not task.done()
+            ]
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        remaining = pending()
+
+        while remaining and loop.time() < deadline:
+            await asyncio.sleep(min(0.05, max(deadline - loop.time(), 0)))
+            remaining = pending()
+
+        for task in remaining:
+            task.cancel()
+        return not remaining
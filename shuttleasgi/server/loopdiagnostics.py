@@ -0,0 +1,217 @@
+"""
+This module implements opt-in diagnostics of the event loop, to investigate
+latency spikes: it samples the lag of the event loop, records the callbacks
+blocking the event loop longer than a threshold, with the route of the
+request they were handling, and the pauses caused by the garbage collector.
+
+    diagnostics = LoopDiagnostics(slow_callback_threshold=0.05)
+    diagnostics.install(app, path="/_diagnostics")
+
+The durations of callbacks are measured by instrumenting asyncio.Handle,
+which is used by the event loops of the standard library; event loops
+implementing their own handles, like uvloop, only report the lag and the
+garbage collector pauses.
+"""
+
+import asyncio
+import gc
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Optional
+
+from shuttleasgi.normalization import copy_special_attributes
+from shuttleasgi.server.concurrency import LoopLagMonitor
+from shuttleasgi.server.metrics import Histogram, exponential_buckets
+from shuttleasgi.server.responses import json
+
+if TYPE_CHECKING:
+    from shuttleasgi.server.application import Application
+
+# the route template of the request handled by the current task
+current_route: ContextVar[Optional[str]] = ContextVar("current_route", default=None)
+
+# bounds from 1ms to about 33 seconds
+PAUSE_BUCKETS = exponential_buckets(0.001, 2**0.5, 31)
+
+_original_handle_run = asyncio.Handle._run
+
+
+def _describe_callback(handle: asyncio.Handle) -> str:
+    callback = handle._callback  # type: ignore
+    owner = getattr(callback, "__self__", None)
+    if isinstance(owner, asyncio.Task):
+        coroutine = owner.get_coro()
+        return getattr(coroutine, "__qualname__", repr(coroutine))
+    return getattr(callback, "__qualname__", repr(callback))
+
+
+class LoopDiagnostics:
+    """
+    Collects diagnostics about the event loop.
+
+    Parameters
+    ----------
+    slow_callback_threshold: float
+        Callbacks running longer than this number of seconds are recorded.
+    lag_interval: float
+        The seconds between measurements of the event loop lag.
+    max_records: int
+        The number of most recent slow callbacks kept.
+    """
+
+    def __init__(
+        self,
+        slow_callback_threshold: float = 0.1,
+        lag_interval: float = 0.5,
+        max_records: int = 100,
+    ) -> None:
+        self.slow_callback_threshold = slow_callback_threshold
+        self.lag = Histogram(PAUSE_BUCKETS)
+        self.slow_callbacks = Histogram(PAUSE_BUCKETS)
+        self.gc_pauses = Histogram(PAUSE_BUCKETS)
+        self.records: Deque[Dict[str, Any]] = deque(maxlen=max_records)
+        self.lag_monitor = LoopLagMonitor(lag_interval, histogram=self.lag)
+        self._gc_start = 0.0
+        self._enabled = False
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def enable(self) -> None:
+        """
+        Starts collecting diagnostics. Must be called with a running event
+        loop.
+        """
+        global _installed
+        if self._enabled:
+            return
+        if _installed is not None:
+            raise RuntimeError("Event loop diagnostics are already enabled.")
+        _installed = self
+        self._enabled = True
+        asyncio.Handle._run = _get_instrumented_run(self)  # type: ignore
+        gc.callbacks.append(self._on_gc)
+        self.lag_monitor.start()
+
+    def disable(self) -> None:
+        global _installed
+        if not self._enabled:
+            return
+        _installed = None
+        self._enabled = False
+        asyncio.Handle._run = _original_handle_run  # type: ignore
+        gc.callbacks.remove(self._on_gc)
+        self.lag_monitor.stop()
+
+    def install(self, app: "Application", path: Optional[str] = None) -> None:
+        """
+        Enables the diagnostics while the application runs, and sets the route
+        of the requests being handled for slow callbacks. If a path is given,
+        a route returning the snapshot of the diagnostics is added.
+        """
+
+        track_current_route(app)
+
+        async def enable_diagnostics(application: "Application") -> None:
+            self.enable()
+
+        async def disable_diagnostics(application: "Application") -> None:
+            self.disable()
+
+        app.after_start += enable_diagnostics
+        app.on_stop += disable_diagnostics
+
+        if path:
+
+            async def get_diagnostics():
+                return json(self.get_snapshot())
+
+            app.router.add_get(path, get_diagnostics)
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        return {
+            "loop_lag": self.lag.snapshot(),
+            "slow_callbacks": self.slow_callbacks.snapshot(),
+            "gc_pauses": self.gc_pauses.snapshot(),
+            "records": list(self.records),
+        }
+
+    def reset(self) -> None:
+        self.lag.reset()
+        self.slow_callbacks.reset()
+        self.gc_pauses.reset()
+        self.records.clear()
+
+    def on_slow_callback(self, handle: asyncio.Handle, duration: float) -> None:
+        self.slow_callbacks.record(duration)
+        self.records.append(
+            {
+                "time": time.time(),
+                "duration": duration,
+                "callback": _describe_callback(handle),
+                "route": handle._context.get(current_route),  # type: ignore
+            }
+        )
+
+    def _on_gc(self, phase: str, info: Dict[str, Any]) -> None:
+        if phase == "start":
+            self._gc_start = time.perf_counter()
+        elif self._gc_start:
+            self.gc_pauses.record(time.perf_counter() - self._gc_start)
+            self._gc_start = 0.0
+
+
+_installed: Optional[LoopDiagnostics] = None
+
+
+def _get_instrumented_run(diagnostics: LoopDiagnostics) -> Callable[..., None]:
+    threshold = diagnostics.slow_callback_threshold
+    perf_counter = time.perf_counter
+
+    def _run(self: asyncio.Handle) -> None:
+        start = perf_counter()
+        _original_handle_run(self)
+        duration = perf_counter() - start
+        if duration >= threshold:
+            diagnostics.on_slow_callback(self, duration)
+
+    return _run
+
+
+def track_current_route(app: "Application") -> None:
+    """
+    Sets `current_route` to the route template of the request handled by the
+    current task, wrapping the request handlers when the application starts.
+    Calling this function again for the same application has no effect.
+    """
+    if getattr(app, "_tracks_current_route", False):
+        return
+    app._tracks_current_route = True  # type: ignore
+
+    async def wrap_handlers(application: "Application") -> None:
+        for _, route in application.router.iter_with_methods():
+            route.handler = _with_current_route(route.handler, route.pattern.decode())
+
+    app.after_start += wrap_handlers
+
+
+def _with_current_route(handler, route: str):
+    # the route is not reset when the handler returns: slow callbacks are
+    # reported after running, and the rest of the task, like writing the
+    # response, is still part of the request
+    async def route_handler(request):
+        current_route.set(route)
+        return await handler(request)
+
+    copy_special_attributes(handler, route_handler)
+    return route_handler
+
+
+def get_installed() -> Optional[LoopDiagnostics]:
+    """
+    Returns the enabled LoopDiagnostics, if any.
+    """
+    return _installed
+
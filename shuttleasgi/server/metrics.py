@@ -0,0 +1,151 @@
+"""
+This module implements lightweight metrics: histograms with fixed buckets,
+whose updates consist of a binary search and the increment of preallocated
+counters, and the metrics of the requests handled by an application, per
+route template and method, recorded by `BaseApplication.handle`:
+
+    app.use_metrics("/metrics")
+
+Metrics are exposed in the Prometheus text format, and as snapshots.
+"""
+
+from typing import List, Tuple
+
+from shuttleasgi.metrics import (
+    KNOWN_METHODS,
+    LATENCY_BUCKETS,
+    OTHER_METHOD,
+    STATUS_CLASSES,
+    UNMATCHED_ROUTE,
+    Histogram,
+    RequestMetrics,
+    RouteMetrics,
+    StreamingMetrics,
+    StreamRecorder,
+    exponential_buckets,
+)
+
+__all__ = [
+    "KNOWN_METHODS",
+    "LATENCY_BUCKETS",
+    "OTHER_METHOD",
+    "PROMETHEUS_CONTENT_TYPE",
+    "STATUS_CLASSES",
+    "UNMATCHED_ROUTE",
+    "Histogram",
+    "RequestMetrics",
+    "RouteMetrics",
+    "StreamingMetrics",
+    "StreamRecorder",
+    "exponential_buckets",
+    "write_prometheus",
+]
+
+PROMETHEUS_CONTENT_TYPE = b"text/plain; version=0.0.4; charset=utf-8"
+
+
+def write_prometheus(metrics: RequestMetrics, prefix: str = "shuttleasgi") -> str:
+    """
+    Returns the given request metrics in the Prometheus text exposition
+    format.
+    """
+    lines = [
+        f"# HELP {prefix}_requests_total Requests handled, by status class.",
+        f"# TYPE {prefix}_requests_total counter",
+    ]
+    for route_metrics in metrics:
+        labels = _get_labels(route_metrics)
+        statuses = route_metrics.statuses
+        for index, name in enumerate(STATUS_CLASSES):
+            count = statuses[index + 1]
+            if count:
+                lines.append(
+                    f'{prefix}_requests_total{{{labels},status="{name}"}} {count}'
+                )
+
+    _write_histograms(
+        lines,
+        f"{prefix}_request_duration_seconds",
+        "Duration of request handling in seconds.",
+        [(route_metrics, route_metrics.duration) for route_metrics in metrics],
+    )
+
+    streamed = [
+        (route_metrics, route_metrics.streaming)
+        for route_metrics in metrics
+        if route_metrics.streaming is not None
+    ]
+    if streamed:
+        name = f"{prefix}_streams_total"
+        lines.append(f"# HELP {name} Streamed responses, by completion.")
+        lines.append(f"# TYPE {name} counter")
+        for route_metrics, streaming in streamed:
+            labels = _get_labels(route_metrics)
+            completed = streaming.count - streaming.incomplete
+            lines.append(f'{name}{{{labels},completed="true"}} {completed}')
+            lines.append(
+                f'{name}{{{labels},completed="false"}} {streaming.incomplete}'
+            )
+
+        name = f"{prefix}_stream_bytes_total"
+        lines.append(f"# HELP {name} Bytes sent in streamed responses.")
+        lines.append(f"# TYPE {name} counter")
+        for route_metrics, streaming in streamed:
+            lines.append(f"{name}{{{_get_labels(route_metrics)}}} {streaming.bytes}")
+
+        _write_histograms(
+            lines,
+            f"{prefix}_stream_time_to_first_byte_seconds",
+            "Time between the response head and the first body chunk in seconds.",
+            [
+                (route_metrics, streaming.time_to_first_byte)
+                for route_metrics, streaming in streamed
+            ],
+        )
+        _write_histograms(
+            lines,
+            f"{prefix}_stream_chunk_gap_seconds",
+            "Time between body chunks of streamed responses in seconds.",
+            [
+                (route_metrics, streaming.chunk_gap)
+                for route_metrics, streaming in streamed
+            ],
+        )
+        _write_histograms(
+            lines,
+            f"{prefix}_stream_duration_seconds",
+            "Duration of streamed response bodies in seconds.",
+            [
+                (route_metrics, streaming.duration)
+                for route_metrics, streaming in streamed
+            ],
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+def _write_histograms(
+    lines: List[str],
+    name: str,
+    description: str,
+    histograms: List[Tuple[RouteMetrics, Histogram]],
+) -> None:
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} histogram")
+    for route_metrics, histogram in histograms:
+        labels = _get_labels(route_metrics)
+        cumulative = 0
+        for bound, count in zip(histogram.bounds, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.9g}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _get_labels(metrics: RouteMetrics) -> str:
+    return f'method="{metrics.method}",route="{_escape_label(metrics.route)}"'
@@ -0,0 +1,647 @@
+"""
+This module implements a built-in HTTP/1.1 server for ShuttleASGI applications,
+based on asyncio.Protocol and httptools. Responses are written directly to the
+transport, without creating ASGI messages and without awaiting an ASGI `send`
+callable for each of them:
+
+    from shuttleasgi.server.native import run
+
+    run(app, host="0.0.0.0", port=8000)
+
+The native server handles HTTP/1.1 requests with keep-alive and pipelining,
+streamed request and response bodies, and applies transport flow control.
+Idle keep-alive connections are closed after `timeout_keep_alive` seconds,
+and requests whose head exceeds `max_header_size` bytes are refused.
+It does not handle WebSockets nor mounted applications: use an ASGI server
+for applications that need them.
+"""
+
+import asyncio
+import logging
+import socket
+import time
+from collections import deque
+from email.utils import formatdate
+from ssl import SSLContext
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote
+
+from shuttleasgi.contents import StreamedContent
+from shuttleasgi.messages import Response
+from shuttleasgi.metrics import StreamRecorder
+from shuttleasgi.scribe import (
+    get_chunk_views,
+    py_write_small_response,
+    write_response_head,
+)
+
+try:
+    import httptools
+except ImportError:  # pragma: no cover
+    httptools = None
+
+if TYPE_CHECKING:
+    from shuttleasgi.server.application import Application
+
+logger = logging.getLogger("shuttleasgi.server")
+
+# responses whose body is smaller than this are written with a single buffer
+SMALL_RESPONSE_SIZE = 61440
+
+# the reading of request bodies is paused when this many bytes are buffered
+MAX_BUFFERED_BODY_SIZE = 1048576
+
+# idle keep-alive connections are closed after this many seconds
+DEFAULT_KEEP_ALIVE_TIMEOUT = 5.0
+
+# requests whose URL and headers exceed this many bytes are refused
+DEFAULT_MAX_HEADER_SIZE = 65536
+
+CONTINUE_RESPONSE = b"HTTP/1.1 100 Continue\r\n\r\n"
+
+BAD_REQUEST_RESPONSE = (
+    b"HTTP/1.1 400 Bad Request\r\n"
+    b"content-type: text/plain; charset=utf-8\r\n"
+    b"content-length: 11\r\n"
+    b"connection: close\r\n\r\n"
+    b"Bad Request"
+)
+
+HEADERS_TOO_LARGE_RESPONSE = (
+    b"HTTP/1.1 431 Request Header Fields Too Large\r\n"
+    b"content-length: 0\r\n"
+    b"connection: close\r\n\r\n"
+)
+
+NOT_IMPLEMENTED_RESPONSE = (
+    b"HTTP/1.1 501 Not Implemented\r\n"
+    b"content-length: 0\r\n"
+    b"connection: close\r\n\r\n"
+)
+
+ASGI_VERSION = {"version": "3.0", "spec_version": "2.3"}
+
+_date_header: Tuple[bytes, bytes] = (b"date", b"")
+_date_time = 0
+
+
+def get_date_header() -> Tuple[bytes, bytes]:
+    """
+    Returns the Date header for responses, updated once per second.
+    """
+    global _date_header, _date_time
+    now = int(time.time())
+    if now != _date_time:
+        _date_time = now
+        _date_header = (b"date", formatdate(now, usegmt=True).encode())
+    return _date_header
+
+
+def _get_address(address: Any) -> Optional[Tuple[str, int]]:
+    if isinstance(address, tuple) and len(address) >= 2:
+        return (str(address[0]), int(address[1]))
+    return None
+
+
+class RequestCycle:
+    """
+    Holds the state of a request-response cycle: the information parsed from
+    the request head and the chunks of the request body, consumed by the
+    `receive` callable bound to the request content.
+    """
+
+    __slots__ = (
+        "protocol",
+        "scope",
+        "keep_alive",
+        "expect_continue",
+        "chunks",
+        "buffered",
+        "complete",
+        "body_sent",
+        "response_complete",
+        "disconnected",
+        "message_event",
+    )
+
+    def __init__(
+        self,
+        protocol: "HTTPServerProtocol",
+        scope: Dict[str, Any],
+        keep_alive: bool,
+        expect_continue: bool,
+    ) -> None:
+        self.protocol = protocol
+        self.scope = scope
+        self.keep_alive = keep_alive
+        self.expect_continue = expect_continue
+        self.chunks: List[bytes] = []
+        self.buffered = 0
+        self.complete = False
+        self.body_sent = False
+        self.response_complete = False
+        self.disconnected = False
+        self.message_event = asyncio.Event()
+
+    def feed(self, chunk: bytes) -> None:
+        if self.response_complete:
+            # the application did not read the whole body, discard the rest
+            return
+        self.chunks.append(chunk)
+        self.buffered += len(chunk)
+        self.message_event.set()
+        if self.buffered > MAX_BUFFERED_BODY_SIZE:
+            self.protocol.pause_reading()
+
+    async def receive(self) -> Dict[str, Any]:
+        if self.expect_continue and not self.complete:
+            self.expect_continue = False
+            self.protocol.write(CONTINUE_RESPONSE)
+
+        while (
+            not self.chunks
+            and not self.disconnected
+            and not self.response_complete
+            and (not self.complete or self.body_sent)
+        ):
+            self.message_event.clear()
+            await self.message_event.wait()
+
+        if self.disconnected or self.response_complete:
+            return {"type": "http.disconnect"}
+
+        chunks = self.chunks
+        if not chunks:
+            body = b""
+        elif len(chunks) == 1:
+            body = chunks[0]
+        else:
+            body = b"".join(chunks)
+        chunks.clear()
+        self.buffered = 0
+        self.protocol.resume_reading()
+
+        if self.complete:
+            self.body_sent = True
+        return {"type": "http.request", "body": body, "more_body": not self.complete}
+
+
+class HTTPServerProtocol(asyncio.Protocol):
+    """
+    Handles an HTTP/1.1 connection, parsing requests with httptools and
+    writing the responses of the application directly to the transport.
+    Pipelined requests are handled in order, one at a time. The connection is
+    closed when it stays idle for `timeout_keep_alive` seconds, and requests
+    whose URL and headers exceed `max_header_size` bytes are refused.
+    """
+
+    def __init__(
+        self,
+        app: "Application",
+        connections: Optional[Set["HTTPServerProtocol"]] = None,
+        scheme: str = "http",
+        timeout_keep_alive: float = DEFAULT_KEEP_ALIVE_TIMEOUT,
+        max_header_size: int = DEFAULT_MAX_HEADER_SIZE,
+    ) -> None:
+        self.app = app
+        self.loop = asyncio.get_running_loop()
+        self.connections = connections
+        self.scheme = scheme
+        self.timeout_keep_alive = timeout_keep_alive
+        self.max_header_size = max_header_size
+        self.transport: Optional[asyncio.Transport] = None
+        self.parser = httptools.HttpRequestParser(self)
+        self.server: Optional[Tuple[str, int]] = None
+        self.client: Optional[Tuple[str, int]] = None
+        self.cycles: Deque[RequestCycle] = deque()
+        self.current: Optional[RequestCycle] = None
+        self.task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.draining = False
+        self.reading_paused = False
+        self.writable = asyncio.Event()
+        self.writable.set()
+        self._url = b""
+        self._headers: List[Tuple[bytes, bytes]] = []
+        self._header_size = 0
+        self._in_message = False
+        self._keep_alive_handle: Optional[asyncio.TimerHandle] = None
+
+    # region asyncio.Protocol
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        self.server = _get_address(transport.get_extra_info("sockname"))
+        self.client = _get_address(transport.get_extra_info("peername"))
+        if self.connections is not None:
+            self.connections.add(self)
+        self._start_keep_alive_timer()
+
+    def connection_lost(self, exc) -> None:
+        self.closed = True
+        self._cancel_keep_alive_timer()
+        self.writable.set()
+        if self.connections is not None:
+            self.connections.discard(self)
+        for cycle in self.cycles:
+            cycle.disconnected = True
+            cycle.message_event.set()
+        if self.current is not None:
+            self.current.disconnected = True
+            self.current.message_event.set()
+
+    def data_received(self, data: bytes) -> None:
+        try:
+            self.parser.feed_data(data)
+        except httptools.HttpParserUpgrade:
+            self._write_error(NOT_IMPLEMENTED_RESPONSE)
+        except httptools.HttpParserError:
+            self._write_error(BAD_REQUEST_RESPONSE)
+
+    def pause_writing(self) -> None:
+        self.writable.clear()
+
+    def resume_writing(self) -> None:
+        self.writable.set()
+
+    # endregion
+
+    # region httptools callbacks
+
+    def on_message_begin(self) -> None:
+        self._cancel_keep_alive_timer()
+        self._in_message = True
+        self._url = b""
+        self._headers = []
+        self._header_size = 0
+
+    def on_url(self, url: bytes) -> None:
+        self._url += url
+        self._check_header_size(len(url))
+
+    def on_header(self, name: bytes, value: bytes) -> None:
+        self._check_header_size(len(name) + len(value))
+        self._headers.append((name.lower(), value))
+
+    def on_headers_complete(self) -> None:
+        parsed_url = httptools.parse_url(self._url)
+        raw_path = parsed_url.path
+        method = self.parser.get_method().decode("ascii")
+        headers = self._headers
+
+        scope = {
+            "type": "http",
+            "asgi": ASGI_VERSION,
+            "http_version": self.parser.get_http_version(),
+            "server": self.server,
+            "client": self.client,
+            "scheme": self.scheme,
+            "method": method,
+            "root_path": "",
+            "path": unquote(raw_path.decode("ascii")),
+            "raw_path": raw_path,
+            "query_string": parsed_url.query or b"",
+            "headers": headers,
+        }
+
+        expect_continue = False
+        for name, value in headers:
+            if name == b"expect" and value.lower() == b"100-continue":
+                expect_continue = True
+
+        cycle = RequestCycle(
+            self, scope, self.parser.should_keep_alive(), expect_continue
+        )
+        self.current = cycle
+        self.cycles.append(cycle)
+
+        if self.task is None:
+            self.task = self.loop.create_task(self._run())
+
+    def on_body(self, body: bytes) -> None:
+        if self.current is not None:
+            self.current.feed(body)
+
+    def on_message_complete(self) -> None:
+        self._in_message = False
+        if self.current is not None:
+            self.current.complete = True
+            self.current.message_event.set()
+            self.current = None
+
+    # endregion
+
+    def _check_header_size(self, size: int) -> None:
+        self._header_size += size
+        if self._header_size > self.max_header_size:
+            self._write_error(HEADERS_TOO_LARGE_RESPONSE)
+            # stops the parsing of the data received
+            raise httptools.HttpParserError("Request head too large")
+
+    def _start_keep_alive_timer(self) -> None:
+        if self.closed or self._in_message or self.cycles:
+            return
+        self._cancel_keep_alive_timer()
+        self._keep_alive_handle = self.loop.call_later(
+            self.timeout_keep_alive, self._on_keep_alive_timeout
+        )
+
+    def _cancel_keep_alive_timer(self) -> None:
+        if self._keep_alive_handle is not None:
+            self._keep_alive_handle.cancel()
+            self._keep_alive_handle = None
+
+    def _on_keep_alive_timeout(self) -> None:
+        self._keep_alive_handle = None
+        if self.task is None:
+            self.close()
+
+    def write(self, data: bytes) -> None:
+        if not self.closed:
+            self.transport.write(data)  # type: ignore
+
+    def pause_reading(self) -> None:
+        if not self.reading_paused and not self.closed:
+            self.reading_paused = True
+            self.transport.pause_reading()  # type: ignore
+
+    def resume_reading(self) -> None:
+        if self.reading_paused and not self.closed:
+            self.reading_paused = False
+            self.transport.resume_reading()  # type: ignore
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.transport.close()  # type: ignore
+
+    def shutdown(self) -> None:
+        """
+        Closes the connection if it is idle, otherwise after the response
+        being written.
+        """
+        self.draining = True
+        if self.task is None:
+            self.close()
+
+    def _write_error(self, response: bytes) -> None:
+        self.write(response)
+        self.close()
+
+    async def _drain(self) -> None:
+        if not self.writable.is_set():
+            await self.writable.wait()
+
+    async def _run(self) -> None:
+        try:
+            while self.cycles and not self.closed:
+                cycle = self.cycles.popleft()
+                await self.handle_cycle(cycle)
+
+                if not cycle.keep_alive or self.draining:
+                    self.close()
+                    return
+                # the reading is resumed for the next request, also when the
+                # application didn't read the whole body
+                self.resume_reading()
+        except Exception:  # pragma: no cover
+            logger.exception("Unhandled exception while writing a response")
+            self.close()
+        finally:
+            self.task = None
+        self._start_keep_alive_timer()
+
+    async def handle_cycle(self, cycle: RequestCycle) -> None:
+        app = self.app
+        in_flight = app.in_flight
+        if in_flight.draining:
+            self.draining = True
+            try:
+                await self.write_response(in_flight.get_draining_response(), cycle)
+            finally:
+                cycle.response_complete = True
+                cycle.message_event.set()
+            return
+
+        task = self.task
+        in_flight.requests.add(task)
+        request = app.instantiate_request(cycle.scope, cycle.receive)
+        try:
+            response = await app.handle(request)
+            if isinstance(response.content, StreamedContent):
+                recorder = app.get_stream_recorder(response)
+                in_flight.streams += 1
+                try:
+                    await self.write_response(response, cycle, recorder)
+                finally:
+                    in_flight.streams -= 1
+                    if recorder is not None and app.on_stream_complete:
+                        await app.on_stream_complete.fire(request, recorder)
+            else:
+                await self.write_response(response, cycle)
+        finally:
+            in_flight.requests.discard(task)
+            cycle.response_complete = True
+            cycle.message_event.set()
+            request.scope = None  # type: ignore
+            request.content.dispose()  # type: ignore
+
+    async def write_response(
+        self,
+        response: Response,
+        cycle: RequestCycle,
+        recorder: Optional[StreamRecorder] = None,
+    ) -> None:
+        if (not cycle.keep_alive or self.draining) and not response.has_header(
+            b"connection"
+        ):
+            response.add_header(b"connection", b"close")
+        if not response.has_header(b"date"):
+            response.add_header(*get_date_header())
+
+        content = response.content
+        status = response.status
+
+        if (
+            not content
+            or cycle.scope["method"] == "HEAD"
+            or status < 200
+            or status == 204
+            or status == 304
+        ):
+            if content:
+                self.write(write_response_head(response))
+            else:
+                self.write(py_write_small_response(response))
+            return
+
+        if content.length >= 0 and not isinstance(content, StreamedContent):
+            if content.length < SMALL_RESPONSE_SIZE:
+                self.write(py_write_small_response(response))
+            else:
+                parts = [write_response_head(response)]
+                parts.extend(get_chunk_views(content.body))
+                if not self.closed:
+                    self.transport.writelines(parts)  # type: ignore
+                await self._drain()
+            return
+
+        self.write(write_response_head(response))
+
+        # the chunked transfer encoding is written here rather than with
+        # write_chunks, to report the size of the body chunks to the recorder
+        chunked = content.length < 0
+        completed = False
+        try:
+            async for chunk in content.get_parts():
+                if self.closed:
+                    break
+                if chunk:
+                    if chunked:
+                        self.write(b"%x\r\n%b\r\n" % (len(chunk), chunk))
+                    else:
+                        self.write(chunk)
+                    await self._drain()
+                    if recorder is not None:
+                        recorder.on_chunk(len(chunk))
+            else:
+                if chunked:
+                    self.write(b"0\r\n\r\n")
+                completed = not self.closed
+        finally:
+            if recorder is not None:
+                recorder.on_end(completed)
+
+
+async def shutdown_connections(
+    connections: Set[HTTPServerProtocol], timeout: float
+) -> None:
+    """
+    Closes idle connections immediately, and the others once their current
+    response is written, or when the timeout expires, cancelling the handling
+    of their requests.
+    """
+    for connection in list(connections):
+        connection.shutdown()
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while connections and loop.time() < deadline:
+        await asyncio.sleep(0.05)
+
+    for connection in list(connections):
+        if connection.task is not None:
+            connection.task.cancel()
+        connection.close()
+
+
+def create_socket(
+    host: str, port: int, backlog: int = 2048, reuse_port: bool = False
+) -> socket.socket:
+    """
+    Creates a listening TCP socket, optionally with SO_REUSEPORT to share the
+    port between processes.
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    # the protocol must be explicit, for asyncio to set TCP_NODELAY on the
+    # accepted connections
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+async def serve(
+    app: "Application",
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    *,
+    sock: Optional[socket.socket] = None,
+    ssl: Optional[SSLContext] = None,
+    backlog: int = 2048,
+    reuse_port: bool = False,
+    started: Optional[asyncio.Event] = None,
+    shutdown_timeout: float = 30.0,
+    timeout_keep_alive: float = DEFAULT_KEEP_ALIVE_TIMEOUT,
+    max_header_size: int = DEFAULT_MAX_HEADER_SIZE,
+) -> None:
+    """
+    Starts the application and serves it until the task is cancelled, then
+    stops accepting connections, waits up to `shutdown_timeout` seconds for
+    the responses being written, closes the connections and stops the
+    application. Idle keep-alive connections are closed after
+    `timeout_keep_alive` seconds.
+    """
+    if httptools is None:
+        raise RuntimeError(
+            "Missing Python dependency to run the native HTTP server. "
+            "Install httptools."
+        )
+
+    if app.mount_registry.mounted_apps:
+        raise RuntimeError(
+            "The native HTTP server does not support mounted applications."
+        )
+
+    if not app.started:
+        await app.start()
+
+    loop = asyncio.get_running_loop()
+    connections: Set[HTTPServerProtocol] = set()
+    scheme = "https" if ssl else "http"
+
+    if sock is None:
+        sock = create_socket(host, port, backlog, reuse_port)
+
+    server = await loop.create_server(
+        lambda: HTTPServerProtocol(
+            app, connections, scheme, timeout_keep_alive, max_header_size
+        ),
+        sock=sock,
+        ssl=ssl,
+        backlog=backlog,
+    )
+
+    if started is not None:
+        started.set()
+
+    try:
+        await server.serve_forever()
+    finally:
+        server.close()
+        app.in_flight.start_draining()
+        await shutdown_connections(connections, shutdown_timeout)
+        await app.stop()
+
+
+def run(
+    app: "Application",
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    **kwargs: Any,
+) -> None:
+    """
+    Runs the application with the native HTTP server until the process
+    receives SIGINT or SIGTERM.
+    """
+    import signal
+
+    async def main() -> None:
+        task = asyncio.current_task()
+        assert task is not None
+        loop = asyncio.get_running_loop()
+        for signal_type in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signal_type, task.cancel)
+            except NotImplementedError:  # pragma: no cover
+                pass
+        try:
+            await serve(app, host, port, **kwargs)
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(main())
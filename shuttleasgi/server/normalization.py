@@ -816,6 +816,11 @@ def _get_middleware_async_binder(
         await method(*values)
         return await next_handler(request)
 
+    applies_to = getattr(method, "applies_to", None)
+    if applies_to is not None:
+        # the binder replaces the middleware, keep its route filter
+        handler.applies_to = applies_to  # type: ignore
+
     return handler
 
 
@@ -26,72 +26,148 @@ import logging
 import os
 from contextlib import contextmanager
 from functools import wraps
-from typing import Awaitable, Callable, Dict, Optional
+from typing import Awaitable, Callable, Dict, Optional, Tuple
 
 from opentelemetry import trace
 from opentelemetry.instrumentation.logging import LoggingInstrumentor
+from opentelemetry.propagate import inject
 from opentelemetry.sdk._logs import LoggerProvider, LoggingHandler
 from opentelemetry.sdk._logs.export import BatchLogRecordProcessor, LogExporter
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 from opentelemetry.trace import SpanKind
 
 from shuttleasgi import Application
+from shuttleasgi.client.session import ClientSession
+from shuttleasgi.contents import StreamedContent
 from shuttleasgi.messages import Request, Response
+from shuttleasgi.metrics import StreamRecorder
 from shuttleasgi.server.env import get_env
+from shuttleasgi.server.routing import Router
 
 ExceptionHandler = Callable[[Request, Exception], Awaitable[Response]]
 
+NOT_FOUND_ROUTE = "Not Found"
+
 
 class OTELMiddleware:
     """
     Middleware configuring OpenTelemetry for all web requests.
+
+    Spans are started with the name and attributes of the matched route,
+    prepared when the application starts, so that the sampler decides whether
+    a span is recorded before any other attribute is computed. Spans of
+    streamed responses end once their body is sent, when enabled with
+    `end_spans_on_stream_complete`.
     """
 
     def __init__(self, exc_handler: ExceptionHandler) -> None:
         self._exc_handler = exc_handler
         self._tracer = trace.get_tracer(__name__)
+        self._routes: Dict[Tuple[str, str], Tuple[str, Dict[str, str]]] = {}
+        self._ends_stream_spans = False
+
+    def apply_routes(self, router: Router) -> None:
+        """
+        Prepares the name and attributes of the spans of each route.
+        """
+        for method, route in router.iter_with_methods():
+            pattern = route.pattern.decode()
+            self._routes[(method, pattern)] = self._get_route_span(method, pattern)
+
+    def end_spans_on_stream_complete(self, app: Application) -> None:
+        """
+        Ends the spans of streamed responses when their body is sent, rather
+        than when the request handler returns.
+        """
+        if not self._ends_stream_spans:
+            self._ends_stream_spans = True
+            app.on_stream_complete += self._on_stream_complete
+
+    def _get_route_span(self, method: str, route: str) -> Tuple[str, Dict[str, str]]:
+        return f"{method} {route}", {"http.method": method, "http.route": route}
 
     async def __call__(self, request: Request, handler):
-        path = request.url.path.decode("utf8")
         method = request.method
-        with self._tracer.start_as_current_span(
-            f"{method} {path}", kind=SpanKind.SERVER
-        ) as span:
-            try:
-                response = await handler(request)
-            except Exception as exc:
-                # This approach is correct because it supports controlling the response
-                # using exceptions. Unhandled exceptions are handled by the Span.
-                response = await self._exc_handler(request, exc)
-
-            self.set_span_attributes(span, request, response, path)
-            return response
+        # the route is set by the router, patched by use_open_telemetry
+        route = getattr(request, "route", NOT_FOUND_ROUTE)
+        route_span = self._routes.get((method, route))
+        if route_span is None:
+            route_span = self._get_route_span(method, route)
+
+        name, attributes = route_span
+        span = self._tracer.start_span(
+            name, kind=SpanKind.SERVER, attributes=attributes
+        )
+        try:
+            with trace.use_span(span, end_on_exit=False):
+                try:
+                    response = await handler(request)
+                except Exception as exc:
+                    # This approach is correct because it supports controlling the
+                    # response using exceptions. Unhandled exceptions are handled
+                    # by the Span.
+                    response = await self._exc_handler(request, exc)
+        except BaseException:
+            span.end()
+            raise
+
+        if span.is_recording():
+            self.set_span_attributes(span, request, response)
+
+        if self._ends_stream_spans and isinstance(response.content, StreamedContent):
+            request.otel_span = span  # type: ignore
+        else:
+            span.end()
+        return response
 
     def set_span_attributes(
-        self, span: trace.Span, request: Request, response: Response, path: str
+        self, span: trace.Span, request: Request, response: Response
     ) -> None:
         """
-        Configure the attributes on the span for a given request-response cycle.
+        Configure the attributes on the span for a given request-response cycle,
+        in addition to the method and the route. Called only for recorded spans.
         """
-        # To reduce cardinality, update the span name to use the
-        # route that matched the request
-        route = request.route  # type: ignore
-        span.update_name(f"{request.method} {route}")
-
-        span.set_attribute("http.status_code", response.status)
-        span.set_attribute("http.method", request.method)
-        span.set_attribute("http.path", path)
-        span.set_attribute("http.url", request.url.value.decode())
-        span.set_attribute("http.route", route)
         span.set_attribute("http.status_code", response.status)
+        span.set_attribute("http.path", request.path)
         span.set_attribute("client.ip", request.original_client_ip)
 
         if response.status >= 400:
             span.set_status(trace.Status(trace.StatusCode.ERROR))
 
+    async def _on_stream_complete(
+        self, app: Application, request: Request, recorder: StreamRecorder
+    ) -> None:
+        span = getattr(request, "otel_span", None)
+        if span is None:
+            return
+        request.otel_span = None  # type: ignore
+        if span.is_recording():
+            span.set_attribute("http.response.body.size", recorder.bytes)
+            span.set_attribute("stream.chunks", recorder.chunks)
+            span.set_attribute("stream.time_to_first_byte", recorder.time_to_first_byte)
+            span.set_attribute("stream.completed", recorder.completed)
+            if not recorder.completed:
+                span.set_status(trace.Status(trace.StatusCode.ERROR))
+        span.end()
+
+
+async def propagation_middleware(request: Request, next_handler):
+    """
+    Client middleware adding the trace context of the current span to the
+    headers of outgoing requests, for distributed tracing.
+    """
+    carrier: Dict[str, str] = {}
+    inject(carrier)
+    for key, value in carrier.items():
+        request.set_header(key.encode(), value.encode())
+    return await next_handler(request)
 
-def _configure_logging(log_exporter: LogExporter, span_exporter: SpanExporter):
+
+def _configure_logging(
+    log_exporter: LogExporter, span_exporter: SpanExporter, sample_rate: float = 1.0
+):
     """
     - Set up a custom LoggerProvider and attach a BatchLogRecordProcessor with the
       provided log_exporter.
@@ -101,7 +177,9 @@ def _configure_logging(log_exporter: LogExporter, span_exporter: SpanExporter):
     - Instrument logging with LoggingInstrumentor().instrument(set_logging_format=True)
       to ensure logs are formatted and correlated with traces.
     - Set up the tracer provider and attaches a BatchSpanProcessor for the given
-      span_exporter.
+      span_exporter. If the sample rate is lower than 1, the tracer provider
+      samples that ratio of the traces started by this service, and follows the
+      sampling decision of the parent span for the others.
     """
     log_provider = LoggerProvider()
     log_provider.add_log_record_processor(BatchLogRecordProcessor(log_exporter))
@@ -112,7 +190,13 @@ def _configure_logging(log_exporter: LogExporter, span_exporter: SpanExporter):
 
     LoggingInstrumentor().instrument(set_logging_format=True)
 
-    trace.set_tracer_provider(TracerProvider())
+    if sample_rate < 1.0:
+        tracer_provider = TracerProvider(
+            sampler=ParentBased(TraceIdRatioBased(sample_rate))
+        )
+    else:
+        tracer_provider = TracerProvider()
+    trace.set_tracer_provider(tracer_provider)
     trace.get_tracer_provider().add_span_processor(
         BatchSpanProcessor(span_exporter)
     )  # type: ignore
@@ -146,11 +230,40 @@ def set_attributes(
     )
 
 
+def track_request_route(router: Router) -> None:
+    """
+    Patches the router to keep track of the route pattern that matched the request,
+    if any, in `request.route`.
+    https://www.neoteroi.dev/shuttleasgi/routing/#how-to-track-routes-that-matched-a-request
+    """
+    routes: Dict[bytes, str] = {}
+
+    def wrap_get_route_match(fn):
+        @wraps(fn)
+        def get_route_match(request):
+            match = fn(request)
+            if match is None:
+                request.route = NOT_FOUND_ROUTE
+                return match
+            # the decoded patterns are cached, to not decode them for each request
+            route = routes.get(match.pattern)
+            if route is None:
+                route = routes[match.pattern] = match.pattern.decode()
+            request.route = route
+            return match
+
+        return get_route_match
+
+    router.get_match = wrap_get_route_match(router.get_match)  # type: ignore
+
+
 def use_open_telemetry(
     app: Application,
     log_exporter: LogExporter,
     span_exporter: SpanExporter,
     middleware: Optional[OTELMiddleware] = None,
+    sample_rate: float = 1.0,
+    propagate_to_clients: bool = True,
 ):
     """
     Configures OpenTelemetry tracing and logging for a ShuttleASGI application.
@@ -166,6 +279,11 @@ def use_open_telemetry(
         span_exporter (SpanExporter): The OpenTelemetry span exporter to use.
         middleware (optional OTELMiddleware): Custom OTEL middleware instance.
             If not provided, the default OTELMiddleware is used.
+        sample_rate (float): The ratio of traces recorded, among the traces
+            started by this service. Defaults to 1.0, recording all traces.
+        propagate_to_clients (bool): Whether the trace context is added to the
+            requests sent with ClientSession, until the application stops.
+            Defaults to True.
 
     Returns:
         None
@@ -174,33 +292,32 @@ def use_open_telemetry(
         # set a default value
         set_attributes("shuttleasgi-app")
 
-    _configure_logging(log_exporter, span_exporter)
+    _configure_logging(log_exporter, span_exporter, sample_rate)
+
+    otel_middleware = middleware or OTELMiddleware(app.handle_request_handler_exception)
+    otel_middleware.end_spans_on_stream_complete(app)
+
+    if propagate_to_clients:
+        ClientSession.add_default_middleware(propagation_middleware)
 
     # Insert the middleware at the beginning of the middlewares list
     @app.on_middlewares_configuration
     def add_otel_middleware(app):
-        app.middlewares.insert(
-            0, middleware or OTELMiddleware(app.handle_request_handler_exception)
-        )
+        app.middlewares.insert(0, otel_middleware)
 
     @app.on_start
     async def on_start(app):
-        # Patch the router to keep track of the route pattern that matched the request,
-        # if any.
-        # https://www.neoteroi.dev/shuttleasgi/routing/#how-to-track-routes-that-matched-a-request
-        def wrap_get_route_match(fn):
-            @wraps(fn)
-            def get_route_match(request):
-                match = fn(request)
-                request.route = match.pattern.decode() if match else "Not Found"
-                return match
+        track_request_route(app.router)
 
-            return get_route_match
-
-        app.router.get_match = wrap_get_route_match(app.router.get_match)
+    @app.after_start
+    async def prepare_routes(app):
+        otel_middleware.apply_routes(app.router)
 
     @app.on_stop
     async def on_stop(app):
+        if propagate_to_clients:
+            ClientSession.remove_default_middleware(propagation_middleware)
+
         # Try calling shutdown() on app stop to flush all remaining spans.
         try:
             trace.get_tracer_provider().shutdown()
@@ -31,7 +31,9 @@ __all__ = ["use_open_telemetry_otlp"]
 
 
 def use_open_telemetry_otlp(
-    app: Application, middleware: Optional[OTELMiddleware] = None
+    app: Application,
+    middleware: Optional[OTELMiddleware] = None,
+    sample_rate: float = 1.0,
 ):
     """
     Configures OpenTelemetry for a ShuttleASGI application using OTLP exporters.
@@ -43,6 +45,8 @@ def use_open_telemetry_otlp(
         app: The ShuttleASGI Application instance.
         middleware (optional OTELMiddleware): Custom OTEL middleware instance.
             If not provided, the default OTELMiddleware is used.
+        sample_rate (float): The ratio of traces recorded, among the traces
+            started by this service. Defaults to 1.0, recording all traces.
 
     Raises:
         ValueError: If any required OTLP environment variables are missing.
@@ -58,4 +62,6 @@ def use_open_telemetry_otlp(
         raise ValueError(f"Missing env variables: {', '.join(missing_vars)}")
 
     # The following exporters use environment variables for configuration:
-    use_open_telemetry(app, OTLPLogExporter(), OTLPSpanExporter(), middleware)
+    use_open_telemetry(
+        app, OTLPLogExporter(), OTLPSpanExporter(), middleware, sample_rate
+    )
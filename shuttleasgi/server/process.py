@@ -33,7 +33,8 @@ def is_stopping() -> bool:
 def use_shutdown_handler(app: "Application"):
     """
     Configures an application start event handler that listens to SIGTERM and SIGINT
-    to know when the process is stopping.
+    to know when the process is stopping. When a signal is received, the
+    application starts draining, responding to new requests with 503.
     """
 
     @app.on_start
@@ -46,6 +47,7 @@ def use_shutdown_handler(app: "Application"):
             def terminate_now(signum, frame):
                 global _STOPPING
                 _STOPPING = True
+                app.in_flight.start_draining()
 
                 if callable(current_handler):
                     current_handler(signum, frame)  # type: ignore
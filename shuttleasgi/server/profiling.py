@@ -0,0 +1,201 @@
+"""
+This module implements an opt-in sampling profiler, to find the hot spots of
+an application running in production without restarting it. The profiler is
+signal-based and runs in-process: a timer interrupts the main thread every
+`interval` seconds of CPU time, and the stack of the running code is sampled
+with the route template of the request being handled.
+
+    profiler = SamplingProfiler(interval=0.01)
+    profiler.install(app, path="/_profile")
+
+A GET request to /_profile?seconds=30 profiles the application for 30 seconds
+and returns the samples as collapsed stacks, the input format of flamegraph
+tools, with the route as root frame.
+
+Signals are handled only in the main thread, therefore the profiler samples
+the code running in the main thread, like the event loop of the application.
+"""
+
+import asyncio
+import os
+import signal
+import sys
+from collections import Counter
+from types import CodeType, FrameType
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from shuttleasgi.contents import Content
+from shuttleasgi.exceptions import BadRequest, Conflict
+from shuttleasgi.messages import Response
+from shuttleasgi.server.loopdiagnostics import current_route, track_current_route
+
+if TYPE_CHECKING:
+    from shuttleasgi.server.application import Application
+
+# the root frame of samples taken outside of request handling
+NO_ROUTE = "<no route>"
+
+Stack = Tuple[CodeType, ...]
+
+
+def _get_short_filename(filename: str) -> str:
+    # the path relative to the longest matching entry of sys.path
+    prefixes = [path for path in sys.path if path and filename.startswith(path)]
+    if not prefixes:
+        return filename
+    return os.path.relpath(filename, max(prefixes, key=len))
+
+
+def _describe_code(code: CodeType) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({_get_short_filename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the main thread at a low frequency, counting the
+    samples by route and stack.
+
+    Parameters
+    ----------
+    interval: float
+        The seconds of CPU time between samples.
+    max_depth: int
+        The maximum number of frames sampled, from the innermost.
+    max_duration: float
+        The maximum seconds of a profile requested through the route added by
+        `install`.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.01,
+        max_depth: int = 64,
+        max_duration: float = 120.0,
+    ) -> None:
+        if not hasattr(signal, "setitimer"):
+            raise RuntimeError("The sampling profiler requires signal.setitimer.")
+        self.interval = interval
+        self.max_depth = max_depth
+        self.max_duration = max_duration
+        self.samples: Counter[Tuple[str, Stack]] = Counter()
+        self._previous_handler: Any = None
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self) -> None:
+        """
+        Starts sampling. Must be called from the main thread.
+        """
+        if self._running:
+            raise RuntimeError("The profiler is already running.")
+        self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self._running = True
+
+    def stop(self) -> None:
+        if not self._running:
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        self._previous_handler = None
+        self._running = False
+
+    def reset(self) -> None:
+        self.samples.clear()
+
+    async def profile(self, seconds: float) -> Dict[str, Dict[str, int]]:
+        """
+        Collects samples for the given seconds, and returns the collapsed
+        stacks sampled meanwhile, by route.
+        """
+        self.reset()
+        self.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.stop()
+        return self.get_collapsed_stacks()
+
+    def get_collapsed_stacks(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns the samples as collapsed stacks, from the outermost frame to
+        the innermost separated by semicolons, with their count, by route.
+        """
+        names: Dict[CodeType, str] = {}
+        by_route: Dict[str, Dict[str, int]] = {}
+
+        for (route, stack), count in self.samples.items():
+            frames = []
+            for code in stack:
+                name = names.get(code)
+                if name is None:
+                    name = names[code] = _describe_code(code)
+                frames.append(name)
+            collapsed = ";".join(frames)
+            stacks = by_route.setdefault(route, {})
+            stacks[collapsed] = stacks.get(collapsed, 0) + count
+        return by_route
+
+    def write_collapsed_stacks(self, route: Optional[str] = None) -> str:
+        """
+        Returns the samples in the collapsed stacks text format, with the
+        route as root frame, optionally only for the given route.
+        """
+        lines = []
+        for stacks_route, stacks in self.get_collapsed_stacks().items():
+            if route is not None and stacks_route != route:
+                continue
+            for stack, count in stacks.items():
+                lines.append(f"{stacks_route};{stack} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def install(self, app: "Application", path: Optional[str] = None) -> None:
+        """
+        Tags the samples with the route of the request being handled, and if a
+        path is given, adds a route collecting a profile on demand.
+        """
+        track_current_route(app)
+
+        async def stop_profiler(application: "Application") -> None:
+            self.stop()
+
+        app.on_stop += stop_profiler
+
+        if path:
+
+            async def get_profile(seconds: float = 30.0, route: str = ""):
+                if not 0 < seconds <= self.max_duration:
+                    raise BadRequest(
+                        f"The seconds must be between 0 and {self.max_duration}."
+                    )
+                if self._running:
+                    raise Conflict("A profile is already being collected.")
+                await self.profile(seconds)
+                return Response(
+                    200,
+                    None,
+                    Content(
+                        b"text/plain; charset=utf-8",
+                        self.write_collapsed_stacks(route or None).encode(),
+                    ),
+                )
+
+            app.router.add_get(path, get_profile)
+
+    def _on_signal(self, signum: int, frame: Optional[FrameType]) -> None:
+        stack = []
+        depth = self.max_depth
+        while frame is not None and depth:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+            depth -= 1
+        if not stack:
+            return
+        # the handler of the signal runs in the context of the running task
+        route = current_route.get() or NO_ROUTE
+        stack.reverse()
+        self.samples[(route, tuple(stack))] += 1
@@ -0,0 +1,385 @@
+"""
+This module implements rate limiting for request handlers, with token bucket
+and sliding window algorithms, keyed by header, identity or client IP:
+
+    app.middlewares.append(RateLimitMiddleware())
+
+    @rate_limit(100, 60, key=key_by_header("X-API-Key"))
+    @app.router.post("/v1/chat/completions")
+    async def chat_completions():
+        ...
+
+By default, the state of the limits is kept in memory, in a sharded store of
+buckets that are refilled lazily when accessed, and evicted once idle by a
+sweep amortized across requests. Limits shared by multiple processes are
+supported by implementing a RateLimitBackend for a shared store.
+"""
+
+import math
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from shuttleasgi.messages import Request, Response
+
+KeyFunction = Callable[[Request], Optional[Any]]
+
+
+def key_by_client_ip(request: Request) -> Optional[str]:
+    """
+    Returns the IP address of the client, honouring forwarded headers when
+    configured.
+    """
+    return request.original_client_ip or None
+
+
+def key_by_identity(request: Request) -> Optional[str]:
+    """
+    Returns the subject of the authenticated user, or None for anonymous
+    requests, which are not limited.
+    """
+    user = request.user
+    if user is None or not user.is_authenticated():
+        return None
+    return user.sub
+
+
+def key_by_header(name: Union[str, bytes]) -> KeyFunction:
+    """
+    Returns a key function reading the value of the given request header, for
+    example an API key. Requests without the header are not limited.
+    """
+    header_name = name.encode() if isinstance(name, str) else name
+
+    def key_function(request: Request) -> Optional[bytes]:
+        return request.get_first_header(header_name)
+
+    return key_function
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        self.tokens = tokens
+        self.updated = updated
+
+
+class WindowCounter:
+    __slots__ = ("window", "current", "previous")
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self.current = 0
+        self.previous = 0
+
+
+class RateLimitAlgorithm(ABC):
+    """
+    Base class for rate limiting algorithms, updating the buckets of a
+    RateLimitStore. `acquire` returns 0.0 if the request is allowed, otherwise
+    the seconds after which it would be allowed.
+    """
+
+    def __init__(self, limit: int, period: float) -> None:
+        self.limit = limit
+        self.period = period
+
+    @abstractmethod
+    def create_bucket(self, now: float) -> Any:
+        """Creates the state for a new key."""
+
+    @abstractmethod
+    def acquire(self, bucket: Any, now: float, cost: int) -> float:
+        """Consumes `cost` units from the bucket, if available."""
+
+    @abstractmethod
+    def is_idle(self, bucket: Any, now: float) -> bool:
+        """
+        Returns True if the bucket is in the same state as a new one, and can
+        therefore be evicted.
+        """
+
+
+class TokenBucketAlgorithm(RateLimitAlgorithm):
+    """
+    Allows `limit` requests per `period` on average, and bursts of up to
+    `burst` requests (by default `limit`).
+    """
+
+    def __init__(self, limit: int, period: float, burst: Optional[int] = None) -> None:
+        super().__init__(limit, period)
+        self.capacity = float(burst or limit)
+        self.rate = limit / period
+
+    def create_bucket(self, now: float) -> TokenBucket:
+        return TokenBucket(self.capacity, now)
+
+    def acquire(self, bucket: TokenBucket, now: float, cost: int) -> float:
+        tokens = bucket.tokens + (now - bucket.updated) * self.rate
+        if tokens > self.capacity:
+            tokens = self.capacity
+        bucket.updated = now
+
+        if tokens >= cost:
+            bucket.tokens = tokens - cost
+            return 0.0
+        bucket.tokens = tokens
+        return (cost - tokens) / self.rate
+
+    def is_idle(self, bucket: TokenBucket, now: float) -> bool:
+        return bucket.tokens + (now - bucket.updated) * self.rate >= self.capacity
+
+
+class SlidingWindowAlgorithm(RateLimitAlgorithm):
+    """
+    Allows `limit` requests in any window of `period` seconds, approximating
+    the count of the sliding window with the counts of the current and of the
+    previous fixed windows.
+    """
+
+    def create_bucket(self, now: float) -> WindowCounter:
+        return WindowCounter(int(now // self.period))
+
+    def acquire(self, bucket: WindowCounter, now: float, cost: int) -> float:
+        period = self.period
+        window = int(now // period)
+
+        if window != bucket.window:
+            bucket.previous = bucket.current if window == bucket.window + 1 else 0
+            bucket.current = 0
+            bucket.window = window
+
+        elapsed = now - window * period
+        weight = 1.0 - elapsed / period
+        count = bucket.previous * weight + bucket.current
+
+        if count + cost <= self.limit:
+            bucket.current += cost
+            return 0.0
+
+        # the time after which the weighted count of the previous window
+        # decreased enough, or the end of the current window
+        available = self.limit - bucket.current - cost
+        if available >= 0 and bucket.previous:
+            return max((1.0 - available / bucket.previous) * period - elapsed, 0.001)
+        return period - elapsed
+
+    def is_idle(self, bucket: WindowCounter, now: float) -> bool:
+        return int(now // self.period) > bucket.window + 1
+
+
+ALGORITHMS = {
+    "token-bucket": TokenBucketAlgorithm,
+    "sliding-window": SlidingWindowAlgorithm,
+}
+
+
+class RateLimitStore:
+    """
+    Keeps in memory the buckets of a rate limit, in shards of dictionaries.
+    Idle buckets are evicted sweeping a shard every `sweep_interval` requests.
+    """
+
+    def __init__(
+        self,
+        algorithm: RateLimitAlgorithm,
+        shards: int = 16,
+        sweep_interval: int = 1024,
+    ) -> None:
+        if shards < 1 or shards & (shards - 1):
+            raise ValueError("The number of shards must be a power of 2.")
+        self.algorithm = algorithm
+        self.shards: List[Dict[Any, Any]] = [{} for _ in range(shards)]
+        self.sweep_interval = sweep_interval
+        self._mask = shards - 1
+        self._operations = 0
+        self._next_shard = 0
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def try_acquire(self, key: Any, now: float, cost: int = 1) -> float:
+        """
+        Consumes `cost` units for the given key. Returns 0.0 if allowed,
+        otherwise the seconds after which the request would be allowed.
+        """
+        shard = self.shards[hash(key) & self._mask]
+        bucket = shard.get(key)
+        if bucket is None:
+            bucket = shard[key] = self.algorithm.create_bucket(now)
+
+        retry_after = self.algorithm.acquire(bucket, now, cost)
+
+        self._operations += 1
+        if self._operations >= self.sweep_interval:
+            self._operations = 0
+            self.sweep(now)
+        return retry_after
+
+    def sweep(self, now: float) -> int:
+        """
+        Evicts the idle buckets of the next shard, returning their count.
+        """
+        shard = self.shards[self._next_shard]
+        self._next_shard = (self._next_shard + 1) & self._mask
+        is_idle = self.algorithm.is_idle
+        idle_keys = [key for key, bucket in shard.items() if is_idle(bucket, now)]
+        for key in idle_keys:
+            del shard[key]
+        return len(idle_keys)
+
+
+class RateLimit:
+    """
+    Describes a rate limit of `limit` requests per `period` seconds, for the
+    requests sharing the same key.
+
+    Parameters
+    ----------
+    limit: int
+        The number of requests allowed per period.
+    period: float
+        The period in seconds.
+    key: KeyFunction
+        The function returning the key of a request, by default the client IP.
+        Requests whose key is None are not limited.
+    algorithm: str
+        "token-bucket" (default) or "sliding-window".
+    burst: Optional[int]
+        The maximum burst for the token bucket algorithm, by default `limit`.
+    name: Optional[str]
+        The name of the rate limit, used to namespace keys in shared stores.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        period: float,
+        key: KeyFunction = key_by_client_ip,
+        algorithm: str = "token-bucket",
+        burst: Optional[int] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        if limit < 1 or period <= 0:
+            raise ValueError("The limit and the period must be positive.")
+        if algorithm not in ALGORITHMS:
+            raise ValueError(
+                f"Invalid rate limit algorithm: {algorithm}. "
+                "Valid algorithms: " + ", ".join(ALGORITHMS)
+            )
+        self.limit = limit
+        self.period = period
+        self.key = key
+        self.algorithm_name = algorithm
+        if algorithm == "token-bucket":
+            self.algorithm: RateLimitAlgorithm = TokenBucketAlgorithm(
+                limit, period, burst
+            )
+        else:
+            self.algorithm = ALGORITHMS[algorithm](limit, period)
+        self.name = name or f"{algorithm}:{limit}/{period}"
+        self.store = RateLimitStore(self.algorithm)
+
+
+def rate_limit(
+    limit: int,
+    period: float,
+    key: KeyFunction = key_by_client_ip,
+    algorithm: str = "token-bucket",
+    burst: Optional[int] = None,
+    name: Optional[str] = None,
+) -> Callable[..., Any]:
+    """
+    Configures a rate limit for a request handler, applied by
+    RateLimitMiddleware.
+    """
+    value = RateLimit(limit, period, key, algorithm, burst, name)
+
+    def decorator(f):
+        f.rate_limit = value
+        return f
+
+    return decorator
+
+
+class RateLimitBackend(ABC):
+    """
+    Base class for stores keeping the state of rate limits outside of the
+    process, to share limits between processes.
+    """
+
+    @abstractmethod
+    async def acquire(self, rate_limit: RateLimit, key: Any, cost: int = 1) -> float:
+        """
+        Consumes `cost` units for the given key. Returns 0.0 if allowed,
+        otherwise the seconds after which the request would be allowed.
+        """
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    A RateLimitBackend keeping the state in memory, standing in for shared
+    stores in tests and development.
+    """
+
+    def __init__(self) -> None:
+        self.stores: Dict[str, RateLimitStore] = {}
+
+    async def acquire(self, rate_limit: RateLimit, key: Any, cost: int = 1) -> float:
+        store = self.stores.get(rate_limit.name)
+        if store is None:
+            store = self.stores[rate_limit.name] = RateLimitStore(rate_limit.algorithm)
+        return store.try_acquire(key, time.time(), cost)
+
+
+class RateLimitMiddleware:
+    """
+    Applies the rate limits configured on request handlers with `rate_limit`,
+    and optionally a default rate limit to all other requests, responding with
+    429 Too Many Requests and Retry-After to requests over the limit.
+
+    Without backend, the state of the limits is kept in memory, per process.
+    """
+
+    def __init__(
+        self,
+        default: Optional[RateLimit] = None,
+        backend: Optional[RateLimitBackend] = None,
+        status: int = 429,
+    ) -> None:
+        self.default = default
+        self.backend = backend
+        self.status = status
+
+    def get_rejection_response(self, retry_after: float) -> Response:
+        return Response(
+            self.status,
+            [(b"Retry-After", str(math.ceil(retry_after)).encode())],
+            None,
+        )
+
+    def applies_to(self, route) -> bool:
+        # without default limit, handlers without rate limit skip the middleware
+        return (
+            self.default is not None
+            or getattr(route.handler, "rate_limit", None) is not None
+        )
+
+    async def __call__(self, request: Request, handler):
+        limit = getattr(handler, "rate_limit", None) or self.default
+        if limit is None:
+            return await handler(request)
+
+        key = limit.key(request)
+        if key is None:
+            return await handler(request)
+
+        if self.backend is None:
+            retry_after = limit.store.try_acquire(key, time.monotonic())
+        else:
+            retry_after = await self.backend.acquire(limit, key)
+
+        if retry_after:
+            return self.get_rejection_response(retry_after)
+        return await handler(request)
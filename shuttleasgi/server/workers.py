@@ -0,0 +1,438 @@
+"""
+This module implements a multi-process runner for the native HTTP server.
+The supervisor process forks a number of workers, each serving the
+application on its own listening socket bound with SO_REUSEPORT, so that the
+kernel balances connections across them:
+
+    from shuttleasgi.server.workers import run_workers
+
+    run_workers(app, host="0.0.0.0", port=8000, workers=4)
+
+The supervisor restarts workers that exit unexpectedly or that stop sending
+heartbeats, for example because their event loop is blocked. On SIGTERM or
+SIGINT, it asks the workers to stop: each worker stops accepting connections
+and waits for the responses being written before exiting.
+
+With `preload=True`, the routes, request handlers and middlewares of the
+application are configured once in the supervisor process before forking,
+so that workers don't repeat the setup. The application start and stop
+events still run in each worker, paired in the same process and event loop.
+In this case, `on_start` callbacks run after the configuration and must not
+add routes or middlewares.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from ssl import SSLContext
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from .native import create_socket, serve
+
+if TYPE_CHECKING:
+    from shuttleasgi.server.application import Application
+
+logger = logging.getLogger("shuttleasgi.server")
+
+# workers exiting sooner than this after their start are restarted with a
+# delay, to not fork in a loop when the application fails to start
+MIN_WORKER_UPTIME = 5.0
+
+MAX_RESTART_DELAY = 10.0
+
+
+class Worker:
+    """
+    Describes a worker process, as tracked by the supervisor.
+    """
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.pid: Optional[int] = None
+        self.started_at = 0.0
+        self.last_heartbeat = 0.0
+        self.restarts = 0
+        self.restart_delay = 0.0
+        self.restart_at = 0.0
+        self.last_exit_code: Optional[int] = None
+        self.heartbeat_fd: Optional[int] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.pid is not None
+
+    def get_info(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "index": self.index,
+            "pid": self.pid,
+            "alive": self.alive,
+            "uptime": now - self.started_at if self.alive else 0.0,
+            "seconds_since_heartbeat": (
+                now - self.last_heartbeat if self.alive else None
+            ),
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+        }
+
+
+class Supervisor:
+    """
+    Forks and supervises the worker processes serving an application with the
+    native HTTP server.
+
+    Parameters
+    ----------
+    app: Application
+        The application to serve.
+    host: str
+        The host to bind.
+    port: int
+        The port to bind. If 0, a free port is selected and shared by the
+        workers; it is available in the `port` property.
+    workers: Optional[int]
+        The number of worker processes, by default the number of CPUs.
+    backlog: int
+        The listen backlog of the sockets.
+    ssl: Optional[SSLContext]
+        The SSL context for HTTPS.
+    preload: bool
+        Whether the application is configured in the supervisor before
+        forking; its start events run in each worker.
+    shutdown_timeout: float
+        The seconds workers wait for the responses being written when
+        stopping.
+    heartbeat_interval: float
+        The seconds between heartbeats sent by the workers.
+    heartbeat_timeout: float
+        Workers not sending heartbeats for this number of seconds are killed
+        and restarted.
+    health_file: Optional[str]
+        If specified, the path of a JSON file rewritten with the information
+        about the workers at each heartbeat interval, for health probes.
+    """
+
+    def __init__(
+        self,
+        app: "Application",
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        workers: Optional[int] = None,
+        *,
+        backlog: int = 2048,
+        ssl: Optional[SSLContext] = None,
+        preload: bool = False,
+        shutdown_timeout: float = 30.0,
+        heartbeat_interval: float = 1.0,
+        heartbeat_timeout: float = 30.0,
+        health_file: Optional[str] = None,
+    ) -> None:
+        if not hasattr(os, "fork"):  # pragma: no cover
+            raise RuntimeError("Running multiple workers requires os.fork.")
+        if workers is not None and workers < 1:
+            raise ValueError("The number of workers must be greater than 0.")
+        if heartbeat_timeout <= heartbeat_interval:
+            raise ValueError(
+                "The heartbeat timeout must be greater than the heartbeat interval."
+            )
+        self.app = app
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.ssl = ssl
+        self.preload = preload
+        self.shutdown_timeout = shutdown_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.health_file = health_file
+        self.reuse_port = hasattr(socket, "SO_REUSEPORT")
+        self.workers = [Worker(index) for index in range(workers or os.cpu_count() or 1)]
+        self._socket: Optional[socket.socket] = None
+        self._stopping = False
+
+    def get_workers_info(self) -> List[Dict[str, Any]]:
+        """
+        Returns information about the health of the workers.
+        """
+        return [worker.get_info() for worker in self.workers]
+
+    def stop(self) -> None:
+        """
+        Requests the supervisor to stop the workers and return from `run`.
+        """
+        self._stopping = True
+
+    def run(self) -> None:
+        """
+        Forks the workers and supervises them until SIGTERM or SIGINT is
+        received, or `stop` is called.
+        """
+        self._socket = self._bind()
+        self.port = self._socket.getsockname()[1]
+
+        if self.preload and not self.app.started:
+            self.app.prepare()
+
+        previous_handlers = {
+            signal_type: signal.signal(signal_type, self._on_stop_signal)
+            for signal_type in (signal.SIGINT, signal.SIGTERM)
+        }
+        logger.info(
+            "Serving on %s:%s with %s workers", self.host, self.port, len(self.workers)
+        )
+        try:
+            self._supervise()
+        finally:
+            self._stop_workers()
+            for signal_type, handler in previous_handlers.items():
+                signal.signal(signal_type, handler)
+            self._socket.close()
+
+    def _bind(self) -> socket.socket:
+        if not self.reuse_port:  # pragma: no cover
+            # the workers share the accept queue of the same socket
+            return create_socket(self.host, self.port, self.backlog)
+
+        # the socket of the supervisor reserves the port and is not listening,
+        # therefore it does not receive connections
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.host, self.port))
+        return sock
+
+    def _on_stop_signal(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _supervise(self) -> None:
+        while not self._stopping:
+            now = time.monotonic()
+            for worker in self.workers:
+                if not worker.alive and now >= worker.restart_at:
+                    self._spawn(worker)
+
+            self._read_heartbeats(self.heartbeat_interval)
+            self._reap()
+            self._check_heartbeats()
+            self._write_health_file()
+
+    def _spawn(self, worker: Worker) -> None:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+
+        if pid == 0:  # pragma: no cover - runs in the worker process
+            os.close(read_fd)
+            exit_code = 0
+            try:
+                self._run_worker(worker, write_fd)
+            except BaseException:
+                logger.exception("Worker %s failed", worker.index)
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        if worker.last_exit_code is not None:
+            worker.restarts += 1
+        worker.pid = pid
+        worker.heartbeat_fd = read_fd
+        worker.started_at = worker.last_heartbeat = time.monotonic()
+        logger.info("Started worker %s (pid %s)", worker.index, pid)
+
+    def _read_heartbeats(self, timeout: float) -> None:
+        fds = {
+            worker.heartbeat_fd: worker
+            for worker in self.workers
+            if worker.heartbeat_fd is not None
+        }
+        if not fds:
+            time.sleep(timeout)
+            return
+        try:
+            readable, _, _ = select.select(list(fds), [], [], timeout)
+        except InterruptedError:  # pragma: no cover
+            return
+
+        now = time.monotonic()
+        for fd in readable:
+            worker = fds[fd]
+            try:
+                data = os.read(fd, 1024)
+            except BlockingIOError:  # pragma: no cover
+                continue
+            if data:
+                worker.last_heartbeat = now
+            else:
+                # the worker exited, it is reaped by `_reap`
+                os.close(fd)
+                worker.heartbeat_fd = None
+
+    def _reap(self) -> None:
+        for worker in self.workers:
+            if worker.pid is None:
+                continue
+            try:
+                pid, status = os.waitpid(worker.pid, os.WNOHANG)
+            except ChildProcessError:  # pragma: no cover
+                pid, status = worker.pid, 0
+            if pid == 0:
+                continue
+            self._on_worker_exit(worker, os.waitstatus_to_exitcode(status))
+
+    def _on_worker_exit(self, worker: Worker, exit_code: int) -> None:
+        if worker.heartbeat_fd is not None:
+            os.close(worker.heartbeat_fd)
+            worker.heartbeat_fd = None
+
+        now = time.monotonic()
+        uptime = now - worker.started_at
+        worker.pid = None
+        worker.last_exit_code = exit_code
+
+        if self._stopping:
+            return
+
+        logger.warning(
+            "Worker %s exited with code %s after %.1f seconds, restarting it",
+            worker.index,
+            exit_code,
+            uptime,
+        )
+        if uptime < MIN_WORKER_UPTIME:
+            worker.restart_delay = min(
+                max(worker.restart_delay * 2, 0.1), MAX_RESTART_DELAY
+            )
+        else:
+            worker.restart_delay = 0.0
+        worker.restart_at = now + worker.restart_delay
+
+    def _check_heartbeats(self) -> None:
+        now = time.monotonic()
+        for worker in self.workers:
+            if (
+                worker.pid is not None
+                and now - worker.last_heartbeat > self.heartbeat_timeout
+            ):
+                logger.error(
+                    "Worker %s (pid %s) did not send heartbeats for %.1f seconds, "
+                    "killing it",
+                    worker.index,
+                    worker.pid,
+                    now - worker.last_heartbeat,
+                )
+                self._kill(worker, signal.SIGKILL)
+                # the worker is restarted once reaped
+                worker.last_heartbeat = now
+
+    def _write_health_file(self) -> None:
+        if not self.health_file:
+            return
+        temp_path = self.health_file + ".tmp"
+        with open(temp_path, "w") as health_file:
+            json.dump({"pid": os.getpid(), "workers": self.get_workers_info()}, health_file)
+        os.replace(temp_path, self.health_file)
+
+    def _kill(self, worker: Worker, signal_type: int) -> None:
+        if worker.pid is None:
+            return
+        try:
+            os.kill(worker.pid, signal_type)
+        except ProcessLookupError:  # pragma: no cover
+            pass
+
+    def _stop_workers(self) -> None:
+        self._stopping = True
+        for worker in self.workers:
+            self._kill(worker, signal.SIGTERM)
+
+        # the workers wait for the responses being written up to the shutdown
+        # timeout, and are killed if they don't exit in a reasonable time after
+        deadline = time.monotonic() + self.shutdown_timeout + 5.0
+        while any(worker.alive for worker in self.workers):
+            if time.monotonic() > deadline:
+                for worker in self.workers:
+                    self._kill(worker, signal.SIGKILL)
+                deadline = float("inf")
+            self._read_heartbeats(0.05)
+            self._reap()
+        self._write_health_file()
+
+    def _run_worker(self, worker: Worker, heartbeat_fd: int) -> None:
+        # runs in the forked process
+        for signal_type in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signal_type, signal.SIG_DFL)
+        for other in self.workers:
+            if other.heartbeat_fd is not None:
+                os.close(other.heartbeat_fd)
+
+        assert self._socket is not None
+        if self.reuse_port:
+            sock = create_socket(self.host, self.port, self.backlog, reuse_port=True)
+        else:  # pragma: no cover
+            sock = self._socket
+
+        async def main() -> None:
+            task = asyncio.current_task()
+            assert task is not None
+            loop = asyncio.get_running_loop()
+            for signal_type in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(signal_type, task.cancel)
+            heartbeat = loop.create_task(
+                _send_heartbeats(heartbeat_fd, self.heartbeat_interval, task)
+            )
+            try:
+                await serve(
+                    self.app,
+                    sock=sock,
+                    ssl=self.ssl,
+                    backlog=self.backlog,
+                    shutdown_timeout=self.shutdown_timeout,
+                )
+            except asyncio.CancelledError:
+                pass
+            finally:
+                heartbeat.cancel()
+
+        asyncio.run(main())
+        # os._exit doesn't flush the standard streams
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+
+async def _send_heartbeats(fd: int, interval: float, task: asyncio.Task) -> None:
+    os.set_blocking(fd, False)
+    try:
+        while True:
+            try:
+                os.write(fd, b"\x00")
+            except BlockingIOError:  # pragma: no cover
+                pass
+            except BrokenPipeError:
+                # the supervisor exited: stop the worker
+                task.cancel()
+                return
+            await asyncio.sleep(interval)
+    finally:
+        os.close(fd)
+
+
+def run_workers(
+    app: "Application",
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: Optional[int] = None,
+    **kwargs: Any,
+) -> None:
+    """
+    Runs the application with multiple worker processes until the process
+    receives SIGINT or SIGTERM. See `Supervisor` for the supported options.
+    """
+    Supervisor(app, host, port, workers, **kwargs).run()
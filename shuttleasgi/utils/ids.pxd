@@ -0,0 +1,19 @@
+# cython: language_level=3
+
+from libc.stdint cimport uint64_t
+
+
+cdef class IdGenerator:
+    cdef readonly Py_ssize_t batch_size
+    cdef bytes _random
+    cdef Py_ssize_t _offset
+    cdef uint64_t _last_ms
+    cdef uint64_t _counter
+    cdef unsigned long _generation
+
+    cdef uint64_t _random_bits(self, int size) except? 0
+    cdef int _fill(self, unsigned char* out) except -1
+    cpdef bytes uuid7(self)
+    cpdef bytes new_id(self, bytes prefix=*)
+
+cpdef bytes generate_id(bytes prefix=*)
@@ -0,0 +1,118 @@
+"""
+This module generates unique ids, like the ids of requests and responses, as
+UUIDv7 values: a millisecond timestamp, a counter keeping the ids generated in
+the same millisecond ordered, and random bits read in batches from
+os.urandom.
+
+    generate_id(b"req_")  # b"req_0192...", 32 hexadecimal digits
+    generate_id_str("chatcmpl-")
+"""
+
+import os
+import time
+
+# the counter starts at a random value below 2**41 in each millisecond, and
+# has 42 bits: ids can be generated at least 2**41 times per millisecond
+_COUNTER_SEED_MASK = 0x1FFFFFFFFFF
+_COUNTER_MAX = 0x3FFFFFFFFFF
+
+# incremented in child processes, so that they don't repeat the random bits
+# and counters of their parent
+_generation = 0
+
+
+def _after_fork() -> None:
+    global _generation
+    _generation += 1
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class IdGenerator:
+    """
+    Generates monotonic UUIDv7 values, reading random bytes from os.urandom
+    `batch_size` bytes at a time.
+    """
+
+    def __init__(self, batch_size: int = 4096) -> None:
+        if batch_size < 16:
+            raise ValueError("The batch size must be at least 16 bytes.")
+        self.batch_size = batch_size
+        self._random = b""
+        self._offset = batch_size
+        self._last_ms = 0
+        self._counter = 0
+        self._generation = _generation
+
+    def _random_bits(self, size: int) -> int:
+        if self._offset + size > self.batch_size:
+            self._random = os.urandom(self.batch_size)
+            self._offset = 0
+        offset = self._offset
+        self._offset += size
+        return int.from_bytes(self._random[offset : offset + size], "big")
+
+    def _get_value(self) -> int:
+        if self._generation != _generation:
+            self._generation = _generation
+            self._offset = self.batch_size
+            self._last_ms = 0
+
+        ms = time.time_ns() // 1000000
+
+        if ms > self._last_ms:
+            self._last_ms = ms
+            self._counter = self._random_bits(6) & _COUNTER_SEED_MASK
+        else:
+            # the same millisecond, or the clock went back: the ids stay
+            # ordered, and the timestamp advances when the counter overflows
+            self._counter += 1
+            if self._counter > _COUNTER_MAX:
+                self._last_ms += 1
+                self._counter = self._random_bits(6) & _COUNTER_SEED_MASK
+
+        counter = self._counter
+        return (
+            (self._last_ms & 0xFFFFFFFFFFFF) << 80
+            # version 7, and the 12 high bits of the counter
+            | (0x7000 | (counter >> 30)) << 64
+            # variant 0b10, the 30 low bits of the counter and 32 random bits
+            | (0x80000000 | (counter & 0x3FFFFFFF)) << 32
+            | self._random_bits(4)
+        )
+
+    def uuid7(self) -> bytes:
+        """Returns the 16 bytes of a new UUIDv7."""
+        return self._get_value().to_bytes(16, "big")
+
+    def new_id(self, prefix: bytes = b"") -> bytes:
+        """
+        Returns the given prefix followed by a new UUIDv7 in 32 hexadecimal
+        digits.
+        """
+        return prefix + b"%032x" % self._get_value()
+
+    def new_str_id(self, prefix: str = "") -> str:
+        return f"{prefix}{self._get_value():032x}"
+
+
+default_generator = IdGenerator()
+
+
+def generate_id(prefix: bytes = b"") -> bytes:
+    """
+    Returns the given prefix followed by a new UUIDv7 in 32 hexadecimal
+    digits.
+    """
+    return default_generator.new_id(prefix)
+
+
+def generate_id_str(prefix: str = "") -> str:
+    return default_generator.new_str_id(prefix)
+
+
+def uuid7() -> bytes:
+    """Returns the 16 bytes of a new UUIDv7."""
+    return default_generator.uuid7()
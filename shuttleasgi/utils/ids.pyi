@@ -0,0 +1,13 @@
+class IdGenerator:
+    batch_size: int
+
+    def __init__(self, batch_size: int = 4096) -> None: ...
+    def uuid7(self) -> bytes: ...
+    def new_id(self, prefix: bytes = b"") -> bytes: ...
+    def new_str_id(self, prefix: str = "") -> str: ...
+
+default_generator: IdGenerator
+
+def generate_id(prefix: bytes = b"") -> bytes: ...
+def generate_id_str(prefix: str = "") -> str: ...
+def uuid7() -> bytes: ...
@@ -0,0 +1,190 @@
+# cython: language_level=3
+# cython: boundscheck=False, wraparound=False, cdivision=True
+
+"""
+This module generates unique ids, like the ids of requests and responses, as
+UUIDv7 values: a millisecond timestamp, a counter keeping the ids generated in
+the same millisecond ordered, and random bits read in batches from
+os.urandom.
+
+    generate_id(b"req_")  # b"req_0192...", 32 hexadecimal digits
+    generate_id_str("chatcmpl-")
+"""
+
+import os
+
+from cpython.bytes cimport PyBytes_AS_STRING, PyBytes_FromStringAndSize
+from libc.stdint cimport uint64_t
+from libc.string cimport memcpy
+
+cdef extern from *:
+    """
+    #ifdef _WIN32
+    #include <windows.h>
+    static unsigned long long shuttle_ids_time_ms(void) {
+        FILETIME ft;
+        ULARGE_INTEGER value;
+        GetSystemTimePreciseAsFileTime(&ft);
+        value.LowPart = ft.dwLowDateTime;
+        value.HighPart = ft.dwHighDateTime;
+        /* 100 ns intervals since 1601-01-01 */
+        return (value.QuadPart - 116444736000000000ULL) / 10000ULL;
+    }
+    #else
+    #include <time.h>
+    static unsigned long long shuttle_ids_time_ms(void) {
+        struct timespec ts;
+        clock_gettime(CLOCK_REALTIME, &ts);
+        return (unsigned long long)ts.tv_sec * 1000ULL
+            + (unsigned long long)ts.tv_nsec / 1000000ULL;
+    }
+    #endif
+    """
+    unsigned long long _time_ms "shuttle_ids_time_ms"() nogil
+
+cdef const char* _HEX = b"0123456789abcdef"
+
+# the counter starts at a random value below 2**41 in each millisecond, and
+# has 42 bits: ids can be generated at least 2**41 times per millisecond
+cdef uint64_t _COUNTER_SEED_MASK = 0x1FFFFFFFFFF
+cdef uint64_t _COUNTER_MAX = 0x3FFFFFFFFFF
+
+# incremented in child processes, so that they don't repeat the random bits
+# and counters of their parent
+cdef unsigned long _generation = 0
+
+
+def _after_fork():
+    global _generation
+    _generation += 1
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+cdef class IdGenerator:
+    """
+    Generates monotonic UUIDv7 values, reading random bytes from os.urandom
+    `batch_size` bytes at a time.
+    """
+
+    def __init__(self, Py_ssize_t batch_size=4096):
+        if batch_size < 16:
+            raise ValueError("The batch size must be at least 16 bytes.")
+        self.batch_size = batch_size
+        self._random = b""
+        self._offset = batch_size
+        self._last_ms = 0
+        self._counter = 0
+        self._generation = _generation
+
+    cdef uint64_t _random_bits(self, int size) except? 0:
+        cdef uint64_t value = 0
+        cdef const unsigned char* data
+        cdef int i
+
+        if self._offset + size > self.batch_size:
+            self._random = os.urandom(self.batch_size)
+            self._offset = 0
+        data = <const unsigned char*>PyBytes_AS_STRING(self._random) + self._offset
+        for i in range(size):
+            value = (value << 8) | data[i]
+        self._offset += size
+        return value
+
+    cdef int _fill(self, unsigned char* out) except -1:
+        cdef uint64_t ms, counter, rand
+
+        if self._generation != _generation:
+            self._generation = _generation
+            self._offset = self.batch_size
+            self._last_ms = 0
+
+        ms = _time_ms()
+
+        if ms > self._last_ms:
+            self._last_ms = ms
+            self._counter = self._random_bits(6) & _COUNTER_SEED_MASK
+        else:
+            # the same millisecond, or the clock went back: the ids stay
+            # ordered, and the timestamp advances when the counter overflows
+            self._counter += 1
+            if self._counter > _COUNTER_MAX:
+                self._last_ms += 1
+                self._counter = self._random_bits(6) & _COUNTER_SEED_MASK
+
+        ms = self._last_ms
+        counter = self._counter
+        rand = self._random_bits(4)
+
+        out[0] = (ms >> 40) & 0xFF
+        out[1] = (ms >> 32) & 0xFF
+        out[2] = (ms >> 24) & 0xFF
+        out[3] = (ms >> 16) & 0xFF
+        out[4] = (ms >> 8) & 0xFF
+        out[5] = ms & 0xFF
+        # version 7, and the 12 high bits of the counter
+        out[6] = 0x70 | ((counter >> 38) & 0x0F)
+        out[7] = (counter >> 30) & 0xFF
+        # variant 0b10, the 30 low bits of the counter and 32 random bits
+        out[8] = 0x80 | ((counter >> 24) & 0x3F)
+        out[9] = (counter >> 16) & 0xFF
+        out[10] = (counter >> 8) & 0xFF
+        out[11] = counter & 0xFF
+        out[12] = (rand >> 24) & 0xFF
+        out[13] = (rand >> 16) & 0xFF
+        out[14] = (rand >> 8) & 0xFF
+        out[15] = rand & 0xFF
+        return 0
+
+    cpdef bytes uuid7(self):
+        """Returns the 16 bytes of a new UUIDv7."""
+        cdef bytes result = PyBytes_FromStringAndSize(NULL, 16)
+        self._fill(<unsigned char*>PyBytes_AS_STRING(result))
+        return result
+
+    cpdef bytes new_id(self, bytes prefix=b""):
+        """
+        Returns the given prefix followed by a new UUIDv7 in 32 hexadecimal
+        digits.
+        """
+        cdef unsigned char raw[16]
+        cdef Py_ssize_t size = len(prefix)
+        cdef bytes result = PyBytes_FromStringAndSize(NULL, size + 32)
+        cdef char* out = PyBytes_AS_STRING(result)
+        cdef int i
+
+        self._fill(raw)
+        if size:
+            memcpy(out, PyBytes_AS_STRING(prefix), size)
+        out += size
+        for i in range(16):
+            out[i * 2] = _HEX[raw[i] >> 4]
+            out[i * 2 + 1] = _HEX[raw[i] & 0x0F]
+        return result
+
+    def new_str_id(self, str prefix=""):
+        return self.new_id(prefix.encode()).decode("ascii")
+
+
+default_generator = IdGenerator()
+
+cdef IdGenerator _default_generator = default_generator
+
+
+cpdef bytes generate_id(bytes prefix=b""):
+    """
+    Returns the given prefix followed by a new UUIDv7 in 32 hexadecimal
+    digits.
+    """
+    return _default_generator.new_id(prefix)
+
+
+def generate_id_str(str prefix=""):
+    return _default_generator.new_id(prefix.encode()).decode("ascii")
+
+
+def uuid7():
+    """Returns the 16 bytes of a new UUIDv7."""
+    return _default_generator.uuid7()
@@ -32,6 +32,9 @@ class FakePool:
         await asyncio.sleep(self.sleep_for)
         return self.connection
 
+    async def acquire_connection(self, timeout=None):
+        return await asyncio.wait_for(self.get_connection(), timeout)
+
 
 class FakePools:
     def __init__(self, fake_responses):
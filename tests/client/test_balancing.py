@@ -0,0 +1,266 @@
+import asyncio
+import random
+
+import pytest
+
+from shuttleasgi import URL, InvalidURL, Response
+from shuttleasgi.client import ClientSession, Upstream, UpstreamSaturatedError
+from shuttleasgi.client.balancing import (
+    LeastOutstandingStrategy,
+    LoadBalancingStrategy,
+    PowerOfTwoChoicesStrategy,
+    RoundRobinStrategy,
+)
+from shuttleasgi.client.breaker import CircuitBreakers
+from shuttleasgi.client.exceptions import CircuitOpenError
+from shuttleasgi.client.pool import ConnectionPool, ConnectionPools
+
+from . import FakeConnection
+
+
+class FakeEndpointPool:
+    def __init__(self, host, in_flight=0):
+        self.host = host
+        self.in_flight = in_flight
+        self.requests = []
+
+    async def get_connection(self):
+        pool = self
+
+        class Connection(FakeConnection):
+            async def send(self, request):
+                pool.requests.append(request)
+                return await super().send(request)
+
+        return Connection([Response(200)])
+
+    async def acquire_connection(self, timeout=None):
+        return await asyncio.wait_for(self.get_connection(), timeout)
+
+
+class FakeEndpointPools:
+    def __init__(self):
+        self.pools = {}
+
+    def get_pool(self, scheme, host, port, ssl):
+        key = (scheme, host, port)
+        if key not in self.pools:
+            self.pools[key] = FakeEndpointPool(host)
+        return self.pools[key]
+
+    def dispose(self):
+        pass
+
+
+def test_round_robin_strategy():
+    pools = [FakeEndpointPool(b"a"), FakeEndpointPool(b"b"), FakeEndpointPool(b"c")]
+    strategy = RoundRobinStrategy()
+
+    assert [strategy.select(pools).host for _ in range(6)] == [
+        b"a",
+        b"b",
+        b"c",
+        b"a",
+        b"b",
+        b"c",
+    ]
+
+
+def test_least_outstanding_strategy():
+    pools = [
+        FakeEndpointPool(b"a", 3),
+        FakeEndpointPool(b"b", 1),
+        FakeEndpointPool(b"c", 2),
+    ]
+    strategy = LeastOutstandingStrategy()
+
+    assert all(strategy.select(pools).host == b"b" for _ in range(5))
+
+
+def test_least_outstanding_strategy_rotates_ties():
+    pools = [FakeEndpointPool(b"a"), FakeEndpointPool(b"b")]
+    strategy = LeastOutstandingStrategy()
+
+    assert {strategy.select(pools).host for _ in range(4)} == {b"a", b"b"}
+
+
+def test_power_of_two_choices_strategy_avoids_hot_endpoints():
+    pools = [
+        FakeEndpointPool(b"hot", 100),
+        FakeEndpointPool(b"b", 0),
+        FakeEndpointPool(b"c", 0),
+    ]
+    strategy = PowerOfTwoChoicesStrategy(random.Random(0))
+
+    selected = [strategy.select(pools).host for _ in range(100)]
+
+    assert b"hot" not in selected
+    assert {b"b", b"c"} == set(selected)
+
+
+def test_power_of_two_choices_strategy_single_endpoint():
+    pools = [FakeEndpointPool(b"a")]
+    assert PowerOfTwoChoicesStrategy().select(pools) is pools[0]
+
+
+def test_upstream_invalid_strategy():
+    with pytest.raises(ValueError):
+        Upstream("models", ["http://10.0.0.1"], strategy="random")
+
+
+@pytest.mark.parametrize("endpoints", [[], ["/relative"], ["ws://10.0.0.1"]])
+def test_upstream_invalid_endpoints(endpoints):
+    with pytest.raises((ValueError, InvalidURL)):
+        Upstream("models", endpoints)
+
+
+def test_upstream_max_in_flight():
+    upstream = Upstream("models", ["http://a", "http://b"], max_in_flight=2)
+    pools = [FakeEndpointPool(b"a", 2), FakeEndpointPool(b"b", 1)]
+
+    assert upstream.select(pools).host == b"b"
+
+    pools[1].in_flight = 2
+    with pytest.raises(UpstreamSaturatedError):
+        upstream.select(pools)
+
+
+async def test_connection_pool_in_flight():
+    pools = ConnectionPools()
+    pool = pools.get_pool(b"http", b"example.org", 80, None)
+    assert isinstance(pool, ConnectionPool)
+
+    class Connection:
+        open = True
+
+    connection = Connection()
+    pool._idle_connections.put_nowait(connection)
+
+    assert await pool.get_connection() is connection
+    assert pool.in_flight == 1
+
+    pool.try_return_connection(connection)
+    assert pool.in_flight == 0
+
+    await pool.get_connection()
+    pool.discard_connection(connection)
+    assert pool.in_flight == 0
+    pools.dispose()
+
+
+async def test_connection_pool_in_flight_counts_connections_being_created():
+    pools = ConnectionPools()
+    pool = pools.get_pool(b"http", b"example.org", 80, None)
+    created = asyncio.Event()
+
+    class Connection:
+        open = True
+
+        def close(self):
+            self.open = False
+
+    async def create_connection():
+        await created.wait()
+        return Connection()
+
+    pool.create_connection = create_connection
+
+    acquisitions = [asyncio.ensure_future(pool.acquire_connection()) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert pool.in_flight == 3
+
+    created.set()
+    await asyncio.gather(*acquisitions)
+    assert pool.in_flight == 3
+
+    for acquisition in acquisitions:
+        pool.try_return_connection(acquisition.result())
+    assert pool.in_flight == 0
+    pools.dispose()
+
+
+def test_load_balancing_strategy_is_abstract():
+    with pytest.raises(TypeError):
+        LoadBalancingStrategy()
+
+
+async def test_client_session_balances_upstream_requests():
+    pools = FakeEndpointPools()
+    upstream = Upstream("models", ["http://10.0.0.1:8000", "http://10.0.0.2:8000"])
+
+    async with ClientSession(pools=pools, upstreams=[upstream]) as client:
+        for _ in range(4):
+            response = await client.get("http://models/v1/models")
+            assert response.status == 200
+
+        # requests to other hosts are not balanced
+        await client.get("http://example.org/")
+
+    hosts = {key[1]: len(pool.requests) for key, pool in pools.pools.items()}
+    assert hosts == {b"10.0.0.1": 2, b"10.0.0.2": 2, b"example.org": 1}
+
+    request = pools.pools[(b"http", b"10.0.0.1", 8000)].requests[0]
+    assert request.url == URL(b"http://models/v1/models")
+
+
+class FakeBreakerEndpointPool:
+    def __init__(self, host, status):
+        self.scheme = b"http"
+        self.host = host
+        self.port = 8000
+        self.in_flight = 0
+        self.status = status
+        self.requests = []
+
+    async def acquire_connection(self, timeout=None):
+        pool = self
+
+        class Connection(FakeConnection):
+            def pool(self):
+                return pool
+
+            async def send(self, request):
+                pool.requests.append(request)
+                return await super().send(request)
+
+        return Connection([Response(self.status)])
+
+
+def test_upstream_skips_endpoints_with_open_circuit():
+    breakers = CircuitBreakers(consecutive_failures=1)
+    upstream = Upstream("models", ["http://a", "http://b"], breakers=breakers)
+    pools = [
+        FakeBreakerEndpointPool("a", 200),
+        FakeBreakerEndpointPool("b", 200),
+    ]
+
+    upstream.get_breaker(pools[0]).on_failure()
+    assert all(upstream.select(pools) is pools[1] for _ in range(4))
+
+    upstream.get_breaker(pools[1]).on_failure()
+    with pytest.raises(CircuitOpenError):
+        upstream.select(pools)
+
+
+async def test_client_session_keeps_circuit_breakers_per_endpoint():
+    breakers = CircuitBreakers(consecutive_failures=2)
+    upstream = Upstream(
+        "models",
+        ["http://10.0.0.1:8000", "http://10.0.0.2:8000"],
+        breakers=breakers,
+    )
+    pools = FakeEndpointPools()
+    pools.pools = {
+        (b"http", b"10.0.0.1", 8000): FakeBreakerEndpointPool("10.0.0.1", 503),
+        (b"http", b"10.0.0.2", 8000): FakeBreakerEndpointPool("10.0.0.2", 200),
+    }
+
+    async with ClientSession(pools=pools, upstreams=[upstream]) as client:
+        statuses = [
+            (await client.get("http://models/v1/models")).status for _ in range(8)
+        ]
+
+    assert statuses == [503, 200, 503, 200, 200, 200, 200, 200]
+    info = breakers.get_info()
+    assert info["http://10.0.0.1:8000"]["state"] == "open"
+    assert info["http://10.0.0.2:8000"]["state"] == "closed"
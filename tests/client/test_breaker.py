@@ -0,0 +1,158 @@
+import time
+
+import pytest
+
+from shuttleasgi import Request, Response
+from shuttleasgi.client import ClientSession
+from shuttleasgi.client.breaker import (
+    CircuitBreaker,
+    CircuitBreakerMiddleware,
+    CircuitBreakers,
+    CircuitState,
+)
+from shuttleasgi.client.connection import ConnectionClosedError
+from shuttleasgi.client.exceptions import CircuitOpenError
+
+from . import FakePools
+
+
+def _expire_open_state(breaker: CircuitBreaker) -> None:
+    breaker._opened_at = time.monotonic() - breaker._current_open_duration
+
+
+def test_circuit_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(consecutive_failures=3)
+
+    for _ in range(2):
+        breaker.on_failure()
+    assert breaker.state is CircuitState.CLOSED
+
+    breaker.on_failure()
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.allow() is False
+    assert 0 < breaker.retry_after <= breaker.open_duration
+
+
+def test_circuit_breaker_opens_on_failure_rate():
+    breaker = CircuitBreaker(
+        failure_rate_threshold=0.5, minimum_calls=10, consecutive_failures=100
+    )
+
+    for _ in range(4):
+        breaker.on_success(0.01)
+        breaker.on_failure()
+    assert breaker.state is CircuitState.CLOSED
+
+    breaker.on_success(0.01)
+    breaker.on_failure()
+    assert breaker.state is CircuitState.OPEN
+
+
+def test_circuit_breaker_failure_rate_uses_sliding_window():
+    breaker = CircuitBreaker(window_size=4, minimum_calls=100, consecutive_failures=100)
+
+    breaker.on_failure()
+    breaker.on_failure()
+    for _ in range(4):
+        breaker.on_success(0.01)
+
+    assert breaker.failure_rate == 0
+
+
+def test_circuit_breaker_slow_calls_are_failures():
+    breaker = CircuitBreaker(consecutive_failures=2, slow_call_duration=0.5)
+
+    breaker.on_success(1)
+    breaker.on_success(1)
+
+    assert breaker.state is CircuitState.OPEN
+
+
+def test_circuit_breaker_half_open_probe_success_closes():
+    breaker = CircuitBreaker(consecutive_failures=1)
+    breaker.on_failure()
+    _expire_open_state(breaker)
+
+    assert breaker.state is CircuitState.HALF_OPEN
+    assert breaker.allow() is True
+    assert breaker.allow() is False  # a single probe at a time
+
+    breaker.on_success(0.01)
+
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.allow() is True
+
+
+def test_circuit_breaker_half_open_probe_failure_reopens_with_backoff():
+    breaker = CircuitBreaker(consecutive_failures=1, open_duration=1)
+    breaker.on_failure()
+    _expire_open_state(breaker)
+
+    assert breaker.allow() is True
+    breaker.on_failure()
+
+    assert breaker.state is CircuitState.OPEN
+    assert breaker._current_open_duration == 2
+
+
+def test_circuit_breaker_cancelled_probe_is_released():
+    breaker = CircuitBreaker(consecutive_failures=1)
+    breaker.on_failure()
+    _expire_open_state(breaker)
+
+    assert breaker.allow() is True
+    breaker.on_cancelled()
+    assert breaker.allow() is True
+
+
+def test_circuit_breakers_are_keyed_like_pools():
+    breakers = CircuitBreakers(consecutive_failures=1)
+
+    breaker = breakers.get(b"https", b"example.org", None)
+
+    assert breakers.get(b"https", b"example.org", 443) is breaker
+    assert breakers.get(b"http", b"example.org", 443) is not breaker
+
+    breaker.on_failure()
+    info = breakers.get_info()
+    assert info["https://example.org:443"]["state"] == "open"
+    assert info["http://example.org:443"]["state"] == "closed"
+
+
+async def test_circuit_breaker_middleware_fails_fast():
+    calls = 0
+
+    async def next_handler(request):
+        nonlocal calls
+        calls += 1
+        raise ConnectionClosedError(False)
+
+    middleware = CircuitBreakerMiddleware(CircuitBreakers(consecutive_failures=2))
+
+    for _ in range(2):
+        with pytest.raises(ConnectionClosedError):
+            await middleware(Request("GET", b"https://example.org/", []), next_handler)
+
+    with pytest.raises(CircuitOpenError) as error:
+        await middleware(Request("GET", b"https://example.org/a", []), next_handler)
+
+    assert calls == 2
+    assert error.value.retry_after > 0
+
+
+async def test_circuit_breaker_middleware_with_client_session():
+    breakers = CircuitBreakers(consecutive_failures=2)
+
+    async with ClientSession(
+        base_url=b"http://localhost:8080",
+        pools=FakePools([Response(503)]),
+        middlewares=[CircuitBreakerMiddleware(breakers)],
+    ) as client:
+        for _ in range(2):
+            response = await client.get(b"/")
+            assert response.status == 503
+
+        with pytest.raises(CircuitOpenError):
+            await client.get(b"/")
+
+    assert breakers.get_info()["http://localhost:8080"]["state"] == "open"
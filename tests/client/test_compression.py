@@ -0,0 +1,191 @@
+import asyncio
+import gzip
+import zlib
+
+import pytest
+
+from shuttleasgi import Request, Response
+from shuttleasgi.client.compression import (
+    AVAILABLE_DECOMPRESSORS,
+    DecompressionMiddleware,
+)
+from shuttleasgi.client.connection import IncomingContent
+from shuttleasgi.client.exceptions import DecompressedContentTooLarge
+
+PAYLOAD = (
+    b'{"object": "list", "data": ['
+    + b",".join([b'{"embedding": [0.1, 0.2]}'] * 2000)
+    + b"]}"
+)
+
+
+def _raw_deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _get_response(body: bytes, encoding: bytes, chunk_size: int = 1000):
+    content = IncomingContent(b"application/json")
+    response = Response(
+        200,
+        [
+            (b"content-type", b"application/json"),
+            (b"content-encoding", encoding),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        content,
+    )
+
+    async def receive():
+        for i in range(0, len(body), chunk_size):
+            await asyncio.sleep(0)
+            content.extend_body(body[i : i + chunk_size])
+        content.complete.set()
+        content.extend_body(b"")
+
+    return response, receive
+
+
+async def _handle(middleware, response):
+    request = Request("GET", b"https://example.org/", [])
+
+    async def next_handler(request):
+        return response
+
+    return request, await middleware(request, next_handler)
+
+
+def test_available_decompressors_include_gzip_and_deflate():
+    assert b"gzip" in AVAILABLE_DECOMPRESSORS
+    assert b"deflate" in AVAILABLE_DECOMPRESSORS
+
+
+def test_decompression_middleware_unsupported_encoding():
+    with pytest.raises(ValueError):
+        DecompressionMiddleware(encodings=["lzma"])
+
+
+async def test_decompression_middleware_sets_accept_encoding():
+    middleware = DecompressionMiddleware(encodings=["gzip", "deflate"])
+    request, _ = await _handle(middleware, Response(204))
+
+    assert request.get_first_header(b"accept-encoding") == b"gzip, deflate"
+
+
+async def test_decompression_middleware_keeps_explicit_accept_encoding():
+    middleware = DecompressionMiddleware()
+    request = Request("GET", b"https://example.org/", [(b"accept-encoding", b"br")])
+
+    async def next_handler(request):
+        return Response(204)
+
+    await middleware(request, next_handler)
+
+    assert request.get_headers(b"accept-encoding") == [b"br"]
+
+
+@pytest.mark.parametrize(
+    "encoding,compress",
+    [
+        (b"gzip", gzip.compress),
+        (b"deflate", zlib.compress),
+        (b"deflate", _raw_deflate),
+        (b"GZIP", gzip.compress),
+    ],
+)
+async def test_decompression_middleware_streams_decoded_content(encoding, compress):
+    response, receive = _get_response(compress(PAYLOAD), encoding)
+    _, response = await _handle(DecompressionMiddleware(), response)
+    task = asyncio.ensure_future(receive())
+
+    data = b"".join([chunk async for chunk in response.content.stream()])
+    await task
+
+    assert data == PAYLOAD
+    assert response.get_first_header(b"content-encoding") is None
+    assert response.get_first_header(b"content-length") is None
+
+
+async def test_decompression_middleware_read_decoded_content():
+    response, receive = _get_response(gzip.compress(PAYLOAD), b"gzip")
+    _, response = await _handle(DecompressionMiddleware(), response)
+    await receive()
+
+    assert await response.read() == PAYLOAD
+    assert await response.read() == PAYLOAD
+    assert await response.json() == await response.json()
+
+
+async def test_decompression_middleware_in_thread():
+    response, receive = _get_response(gzip.compress(PAYLOAD), b"gzip")
+    middleware = DecompressionMiddleware(thread_threshold=100)
+    _, response = await _handle(middleware, response)
+    await receive()
+
+    assert await response.read() == PAYLOAD
+
+
+async def test_decompression_middleware_ignores_unknown_encoding():
+    response, receive = _get_response(b"raw", b"identity")
+    _, response = await _handle(DecompressionMiddleware(), response)
+    await receive()
+
+    assert await response.read() == b"raw"
+    assert response.get_first_header(b"content-encoding") == b"identity"
+
+
+async def test_decompression_middleware_blocks_decompression_bombs():
+    bomb = gzip.compress(b"\0" * 10_000_000)
+    response, receive = _get_response(bomb, b"gzip")
+    _, response = await _handle(DecompressionMiddleware(max_size=1_000_000), response)
+    task = asyncio.ensure_future(receive())
+
+    with pytest.raises(DecompressedContentTooLarge):
+        async for _ in response.content.stream():
+            pass
+    await task
+
+
+@pytest.mark.parametrize("encoding", [b"br", b"zstd"])
+def test_decompressors_bound_the_output_of_bombs(encoding):
+    if encoding not in AVAILABLE_DECOMPRESSORS:
+        pytest.skip(f"{encoding.decode()} is not available")
+    if encoding == b"br":
+        import brotli
+
+        bomb = brotli.compress(b"\0" * 20_000_000)
+    else:
+        try:
+            from compression import zstd
+
+            bomb = zstd.compress(b"\0" * 20_000_000)
+        except ImportError:
+            import zstandard
+
+            bomb = zstandard.ZstdCompressor().compress(b"\0" * 20_000_000)
+
+    decompressor = AVAILABLE_DECOMPRESSORS[encoding]()
+    value = decompressor.decompress(bomb, 1_000_001)
+
+    assert 1_000_001 <= len(value) < 2_000_000
+
+
+@pytest.mark.parametrize("encoding", ["br", "zstd"])
+async def test_decompression_middleware_optional_encodings(encoding):
+    if encoding == "br":
+        compress = pytest.importorskip("brotli").compress
+    else:
+        if b"zstd" not in AVAILABLE_DECOMPRESSORS:
+            pytest.skip("zstd is not available")
+        try:
+            from compression.zstd import compress
+        except ImportError:
+            compress = pytest.importorskip("zstandard").ZstdCompressor().compress
+
+    response, receive = _get_response(compress(PAYLOAD), encoding.encode(), 100)
+    _, response = await _handle(
+        DecompressionMiddleware(encodings=[encoding], max_size=len(PAYLOAD)), response
+    )
+    await receive()
+
+    assert await response.read() == PAYLOAD
@@ -4,7 +4,7 @@ from typing import AsyncIterable, List
 
 import pytest
 
-from shuttleasgi import JSONContent, Request, StreamedContent
+from shuttleasgi import Content, JSONContent, Request, StreamedContent
 from shuttleasgi.client.connection import (
     ClientConnection,
     ConnectionClosedError,
@@ -61,6 +61,9 @@ class FakeTransport:
     def write(self, message: bytes) -> None:
         self.messages.append(message)
 
+    def writelines(self, messages) -> None:
+        self.messages.extend(messages)
+
     def close(self) -> None:
         pass
 
@@ -292,6 +295,30 @@ async def test_on_writing_paused_awaits(connection):
     ]
 
 
+async def test_connection_writes_large_body_without_copying_it(connection):
+    body = b"x" * 200_000
+    request = Request("POST", b"https://localhost:3000/foo", []).with_content(
+        Content(b"application/octet-stream", body)
+    )
+    fake_transport = FakeTransport()
+    connection.open = True
+    connection.transport = fake_transport
+
+    try:
+        await asyncio.wait_for(connection.send(request), 0.01)
+    except TimeoutError:
+        pass
+
+    head, *parts = fake_transport.messages
+    assert bytes(head) == (
+        b"POST /foo HTTP/1.1\r\nhost: localhost\r\n"
+        b"content-type: application/octet-stream\r\ncontent-length: 200000\r\n\r\n"
+    )
+    assert len(parts) == 4
+    assert all(isinstance(part, memoryview) and part.obj is body for part in parts)
+    assert b"".join(parts) == body
+
+
 def test_connection_throws_for_invalid_content_length(connection):
     connection.headers = get_example_headers()
     connection.headers.append((b"Content-Length", b"NOT_A_NUMBER"))
@@ -0,0 +1,205 @@
+import asyncio
+import socket
+
+import pytest
+
+from shuttleasgi.client.dns import (
+    DNSCache,
+    Resolver,
+    StaticResolver,
+    connect_happy_eyeballs,
+    interleave_addresses,
+)
+from shuttleasgi.client.pool import ConnectionPool, ConnectionPools
+from shuttleasgi.utils.aio import get_running_loop
+
+
+@pytest.fixture
+async def local_server():
+    server = await asyncio.start_server(lambda reader, writer: None, "127.0.0.1", 0)
+    yield server.sockets[0].getsockname()[1]
+    server.close()
+    await server.wait_closed()
+
+
+def _get_closed_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+async def test_dns_cache_uses_resolver_once_within_ttl():
+    resolver = StaticResolver({"example.local": ["10.0.0.1", "10.0.0.2"]})
+    cache = DNSCache(resolver)
+
+    for _ in range(3):
+        addresses = await cache.resolve("example.local", 80)
+
+    assert resolver.calls == 1
+    assert addresses == [
+        (socket.AF_INET, ("10.0.0.1", 80)),
+        (socket.AF_INET, ("10.0.0.2", 80)),
+    ]
+
+
+async def test_dns_cache_respects_ttl():
+    resolver = StaticResolver({"example.local": ["10.0.0.1"]}, ttl=0)
+    cache = DNSCache(resolver)
+
+    await cache.resolve("example.local", 80)
+    await cache.resolve("example.local", 80)
+
+    assert resolver.calls == 2
+    assert len(cache) == 0
+
+
+async def test_dns_cache_invalidate():
+    resolver = StaticResolver({"example.local": ["10.0.0.1"]})
+    cache = DNSCache(resolver)
+
+    await cache.resolve("example.local", 80)
+    cache.invalidate("example.local", 80)
+    await cache.resolve("example.local", 80)
+
+    assert resolver.calls == 2
+
+
+async def test_dns_cache_coalesces_concurrent_resolutions():
+    class SlowResolver(Resolver):
+        calls = 0
+
+        async def resolve(self, host, port):
+            SlowResolver.calls += 1
+            await asyncio.sleep(0.01)
+            return [(socket.AF_INET, ("10.0.0.1", port))], 60
+
+    cache = DNSCache(SlowResolver())
+
+    results = await asyncio.gather(*[cache.resolve("example.local", 80)] * 5)
+
+    assert SlowResolver.calls == 1
+    assert all(result == results[0] for result in results)
+
+
+async def test_dns_cache_resolution_survives_cancelled_caller():
+    class SlowResolver(Resolver):
+        calls = 0
+
+        async def resolve(self, host, port):
+            SlowResolver.calls += 1
+            await asyncio.sleep(0.02)
+            return [(socket.AF_INET, ("10.0.0.1", port))], 60
+
+    cache = DNSCache(SlowResolver())
+
+    first = asyncio.create_task(cache.resolve("example.local", 80))
+    await asyncio.sleep(0)
+    others = [asyncio.create_task(cache.resolve("example.local", 80)) for _ in range(3)]
+    await asyncio.sleep(0)
+    first.cancel()
+
+    results = await asyncio.gather(*others)
+
+    assert first.cancelled()
+    assert SlowResolver.calls == 1
+    assert results == [[(socket.AF_INET, ("10.0.0.1", 80))]] * 3
+
+
+def test_dns_cache_shared_by_event_loops():
+    class SlowResolver(Resolver):
+        async def resolve(self, host, port):
+            await asyncio.sleep(0.01)
+            return [(socket.AF_INET, ("10.0.0.1", port))], 0
+
+    cache = DNSCache(SlowResolver())
+
+    async def resolve_many():
+        return await asyncio.gather(*[cache.resolve("example.local", 80)] * 3)
+
+    for _ in range(2):
+        loop = asyncio.new_event_loop()
+        try:
+            assert len(loop.run_until_complete(resolve_many())) == 3
+        finally:
+            loop.close()
+    assert not cache._pending
+
+
+async def test_dns_cache_does_not_resolve_ip_addresses():
+    resolver = StaticResolver({})
+    cache = DNSCache(resolver)
+
+    assert await cache.resolve("127.0.0.1", 80) == [
+        (socket.AF_INET, ("127.0.0.1", 80))
+    ]
+    assert await cache.resolve("[::1]", 80) == [
+        (socket.AF_INET6, ("::1", 80, 0, 0))
+    ]
+    assert resolver.calls == 0
+
+
+async def test_dns_cache_unknown_host():
+    cache = DNSCache(StaticResolver({}))
+
+    with pytest.raises(socket.gaierror):
+        await cache.resolve("example.local", 80)
+
+
+def test_interleave_addresses():
+    v4 = [(socket.AF_INET, (f"10.0.0.{i}", 80)) for i in range(3)]
+    v6 = [(socket.AF_INET6, (f"::{i}", 80, 0, 0)) for i in range(2)]
+
+    assert interleave_addresses(v6 + v4) == [v6[0], v4[0], v6[1], v4[1], v4[2]]
+    assert interleave_addresses([]) == []
+
+
+async def test_connect_happy_eyeballs_skips_failing_addresses(local_server):
+    addresses = [
+        (socket.AF_INET, ("127.0.0.1", _get_closed_port())),
+        (socket.AF_INET, ("127.0.0.1", local_server)),
+    ]
+
+    sock = await connect_happy_eyeballs(get_running_loop(), addresses, delay=5)
+
+    assert sock.getpeername() == ("127.0.0.1", local_server)
+    sock.close()
+
+
+async def test_connect_happy_eyeballs_raises_if_all_attempts_fail():
+    addresses = [(socket.AF_INET, ("127.0.0.1", _get_closed_port()))] * 2
+
+    with pytest.raises(OSError):
+        await connect_happy_eyeballs(get_running_loop(), addresses)
+
+
+async def test_connection_pool_uses_dns_cache(local_server):
+    resolver = StaticResolver({"example.local": ["127.0.0.1"]})
+    pools = ConnectionPools(get_running_loop(), dns_cache=DNSCache(resolver))
+    pool = pools.get_pool(b"http", b"example.local", local_server, None)
+
+    connections = [await pool.create_connection() for _ in range(2)]
+
+    assert resolver.calls == 1
+    assert all(connection.open for connection in connections)
+    for connection in connections:
+        connection.close()
+    pools.dispose()
+
+
+async def test_connection_pool_invalidates_dns_cache_on_failure():
+    resolver = StaticResolver({"example.local": ["127.0.0.1"]})
+    cache = DNSCache(resolver)
+    pool = ConnectionPool(
+        get_running_loop(),
+        b"http",
+        b"example.local",
+        _get_closed_port(),
+        dns_cache=cache,
+    )
+
+    with pytest.raises(OSError):
+        await pool.create_connection()
+
+    assert len(cache) == 0
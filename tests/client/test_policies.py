@@ -0,0 +1,324 @@
+import asyncio
+
+import pytest
+
+from shuttleasgi import Request, Response, StreamedContent, TextContent
+from shuttleasgi.client import ClientSession, RequestTimeout
+from shuttleasgi.client.connection import ConnectionClosedError, IncomingContent
+from shuttleasgi.client.policies import (
+    HedgingPolicy,
+    LatencyTracker,
+    RetryBudget,
+    RetryPolicy,
+    TimeoutPolicy,
+    deadline_scope,
+    get_deadline,
+    get_remaining_time,
+)
+
+from . import FakePools
+
+
+def _request(method="GET"):
+    return Request(method, b"https://example.org/", None)
+
+
+def _streamed_request():
+    async def data():
+        yield b"Hello, World!"
+
+    return Request("PUT", b"https://example.org/", None).with_content(
+        StreamedContent(b"text/plain", data)
+    )
+
+
+class FakeBodyConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _response_with_pending_body(status):
+    connection = FakeBodyConnection()
+    response = Response(status)
+    response.content = IncomingContent(b"text/plain", connection)
+    return response, connection
+
+
+def test_deadline_scope_cannot_extend_outer_deadline():
+    assert get_deadline() is None
+
+    with deadline_scope(1) as outer:
+        with deadline_scope(10) as inner:
+            assert inner is outer
+            assert get_remaining_time(5) <= 1
+        with deadline_scope(0.5) as inner:
+            assert inner is not outer
+            assert get_deadline() is inner
+
+    assert get_deadline() is None
+    assert get_remaining_time(5) == 5
+
+
+async def test_timeout_policy_raises_request_timeout():
+    async def next_handler(request):
+        await asyncio.sleep(1)
+
+    with pytest.raises(RequestTimeout):
+        await TimeoutPolicy(0.01)(_request(), next_handler)
+
+
+async def test_timeout_policy_propagates_deadline():
+    seen = []
+
+    async def next_handler(request):
+        seen.append((get_deadline(), request.get_first_header(b"x-deadline-ms")))
+        return Response(200)
+
+    response = await TimeoutPolicy(2, header=b"x-deadline-ms")(_request(), next_handler)
+
+    assert response.status == 200
+    deadline, header = seen[0]
+    assert 0 < deadline.remaining() <= 2
+    assert 0 < int(header) <= 2000
+
+
+async def test_retry_policy_retries_failed_idempotent_requests():
+    outcomes = [ConnectionClosedError(False), Response(503), Response(200)]
+
+    async def next_handler(request):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    policy = RetryPolicy(attempts=3, base_delay=0.001)
+    response = await policy(_request(), next_handler)
+
+    assert response.status == 200
+    assert outcomes == []
+
+
+async def test_retry_policy_returns_last_response_when_attempts_are_exhausted():
+    calls = 0
+
+    async def next_handler(request):
+        nonlocal calls
+        calls += 1
+        return Response(503)
+
+    policy = RetryPolicy(attempts=2, base_delay=0.001)
+    response = await policy(_request(), next_handler)
+
+    assert response.status == 503
+    assert calls == 2
+
+
+async def test_retry_policy_does_not_retry_non_idempotent_methods():
+    calls = 0
+
+    async def next_handler(request):
+        nonlocal calls
+        calls += 1
+        raise ConnectionClosedError(False)
+
+    with pytest.raises(ConnectionClosedError):
+        await RetryPolicy(base_delay=0.001)(_request("POST"), next_handler)
+
+    assert calls == 1
+
+
+async def test_retry_policy_discards_retried_responses():
+    failed, connection = _response_with_pending_body(503)
+    outcomes = [failed, Response(200)]
+
+    async def next_handler(request):
+        return outcomes.pop(0)
+
+    response = await RetryPolicy(base_delay=0.001)(_request(), next_handler)
+
+    assert response.status == 200
+    assert connection.closed is True
+
+
+async def test_retry_policy_does_not_retry_streamed_bodies():
+    calls = 0
+
+    async def next_handler(request):
+        nonlocal calls
+        calls += 1
+        return Response(503)
+
+    response = await RetryPolicy(base_delay=0.001)(_streamed_request(), next_handler)
+
+    assert response.status == 503
+    assert calls == 1
+
+
+async def test_retry_policy_respects_deadline():
+    calls = 0
+
+    async def next_handler(request):
+        nonlocal calls
+        calls += 1
+        return Response(503)
+
+    policy = RetryPolicy(attempts=5, base_delay=10, max_delay=10)
+    policy.get_delay = lambda attempt: 10  # type: ignore
+
+    with deadline_scope(1):
+        response = await policy(_request(), next_handler)
+
+    assert response.status == 503
+    assert calls == 1
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, min_retries_per_second=0)
+
+    assert budget.try_withdraw() is False
+
+    budget.deposit()
+    assert budget.try_withdraw() is False
+
+    budget.deposit()
+    assert budget.try_withdraw() is True
+    assert budget.try_withdraw() is False
+
+
+def test_retry_budget_reserve():
+    budget = RetryBudget(ratio=0, min_retries_per_second=2)
+
+    assert budget.try_withdraw() is True
+    assert budget.try_withdraw() is True
+    assert budget.try_withdraw() is False
+
+
+def test_latency_tracker():
+    tracker = LatencyTracker(percentile=0.9, window=100, refresh_every=10)
+
+    for i in range(100):
+        tracker.observe(i / 1000)
+
+    assert tracker.count == 100
+    assert tracker.value == pytest.approx(0.09)
+
+
+async def test_hedging_policy_returns_fastest_response_and_cancels_loser():
+    delays = [1, 0]
+    cancelled = []
+
+    async def next_handler(request):
+        delay = delays.pop(0)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return Response(200 if delay == 0 else 500)
+
+    policy = HedgingPolicy(delay=0.01)
+    response = await policy(_request(), next_handler)
+    await asyncio.sleep(0)
+
+    assert response.status == 200
+    assert cancelled == [1]
+
+
+async def test_hedging_policy_does_not_hedge_fast_responses():
+    calls = 0
+
+    async def next_handler(request):
+        nonlocal calls
+        calls += 1
+        return Response(200)
+
+    policy = HedgingPolicy(delay=0.5)
+    for _ in range(3):
+        await policy(_request(), next_handler)
+
+    assert calls == 3
+    assert policy.latencies.count == 3
+
+
+async def test_hedging_policy_raises_if_all_attempts_fail():
+    async def next_handler(request):
+        raise ConnectionClosedError(False)
+
+    with pytest.raises(ConnectionClosedError):
+        await HedgingPolicy(delay=0.01)(_request(), next_handler)
+
+
+async def test_hedging_policy_discards_losing_responses_of_the_same_batch():
+    event = asyncio.Event()
+    responses = [_response_with_pending_body(200), _response_with_pending_body(200)]
+    connections = {response: connection for response, connection in responses}
+
+    async def next_handler(request):
+        response, _ = responses.pop(0)
+        if responses:
+            # the first attempt completes together with the hedged one
+            await event.wait()
+        else:
+            event.set()
+        return response
+
+    response = await HedgingPolicy(delay=0.005)(_request(), next_handler)
+
+    assert connections.pop(response).closed is False
+    assert [connection.closed for connection in connections.values()] == [True]
+
+
+async def test_hedging_policy_observes_failed_attempts():
+    async def next_handler(request):
+        raise ConnectionClosedError(False)
+
+    policy = HedgingPolicy(delay=0.01)
+    with pytest.raises(ConnectionClosedError):
+        await policy(_request(), next_handler)
+
+    assert policy.latencies.count == 2
+
+
+async def test_hedging_policy_does_not_hedge_streamed_bodies():
+    calls = 0
+
+    async def next_handler(request):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return Response(200)
+
+    response = await HedgingPolicy(delay=0.001)(_streamed_request(), next_handler)
+
+    assert response.status == 200
+    assert calls == 1
+
+
+async def test_hedging_policy_uses_observed_percentile():
+    policy = HedgingPolicy(initial_delay=1, min_samples=5)
+
+    assert policy.get_delay() == 1
+
+    for _ in range(5):
+        policy.latencies.observe(0.05)
+
+    assert policy.get_delay() == 0.05
+
+
+async def test_client_session_with_policies():
+    fake_pools = FakePools(
+        [Response(503), Response(200, None, TextContent("Hello, World!"))]
+    )
+
+    async with ClientSession(
+        base_url=b"http://localhost:8080",
+        pools=fake_pools,
+        middlewares=[TimeoutPolicy(1), RetryPolicy(base_delay=0.001)],
+    ) as client:
+        response = await client.get(b"/")
+
+        assert response.status == 200
+        assert await response.text() == "Hello, World!"
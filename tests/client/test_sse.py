@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from shuttleasgi import Response
+from shuttleasgi.client.connection import IncomingContent
+from shuttleasgi.client.sse import IncomingServerSentEvent, SSEDecoder, read_sse
+from shuttleasgi.contents import DONEServerSentEvent, ServerSentEvent
+from shuttleasgi.scribe import write_sse
+
+
+def _feed_all(decoder, chunks):
+    events = []
+    for chunk in chunks:
+        events.extend(decoder.feed(chunk))
+    return events
+
+
+def test_sse_decoder_single_event():
+    decoder = SSEDecoder()
+
+    events = decoder.feed(b'data: {"id": 1}\n\n')
+
+    assert events == [IncomingServerSentEvent('{"id": 1}')]
+    assert events[0].json() == {"id": 1}
+    assert events[0].event == "message"
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 64])
+def test_sse_decoder_events_split_across_chunks(size):
+    data = (
+        b"event: delta\r\nid: 1\r\ndata: hello\r\n\r\n"
+        b"data: first\rdata: second\r\r"
+        b": comment\n"
+        b"retry: 3000\ndata:no-space\n\n"
+    )
+    decoder = SSEDecoder()
+
+    events = _feed_all(decoder, [data[i : i + size] for i in range(0, len(data), size)])
+
+    assert events == [
+        IncomingServerSentEvent("hello", "delta", "1"),
+        IncomingServerSentEvent("first\nsecond", "message", "1"),
+        IncomingServerSentEvent("no-space", "message", "1", 3000),
+    ]
+
+
+def test_sse_decoder_ignores_events_without_data():
+    decoder = SSEDecoder()
+
+    assert decoder.feed(b"event: ping\n\n: keep-alive\n\n") == []
+    assert decoder.feed(b"data: x\n\n") == [IncomingServerSentEvent("x")]
+
+
+def test_sse_decoder_discards_incomplete_event():
+    decoder = SSEDecoder()
+
+    assert decoder.feed(b"data: incomplete\n") == []
+
+
+@pytest.mark.parametrize(
+    "chunks",
+    [
+        [b"\xef\xbb\xbfdata: hi\n\n"],
+        [b"\xef", b"\xbb", b"\xbfdata: hi\n\n"],
+        [b"\xef\xbb\xbf", b"data: hi\n\n"],
+    ],
+)
+def test_sse_decoder_strips_leading_bom(chunks):
+    decoder = SSEDecoder()
+
+    assert _feed_all(decoder, chunks) == [IncomingServerSentEvent("hi")]
+    # only the first BOM of the stream is stripped
+    assert decoder.feed(b"\xef\xbb\xbfdata: x\n\n") == []
+
+
+def test_sse_decoder_replaces_invalid_utf8():
+    decoder = SSEDecoder()
+
+    events = decoder.feed(b"event: a\xff\nid: b\xfe\ndata: c\xff\n\n")
+
+    assert events == [IncomingServerSentEvent("c\ufffd", "a\ufffd", "b\ufffd")]
+
+
+@pytest.mark.parametrize("detect_done", [True, False])
+def test_sse_decoder_done_detection(detect_done):
+    decoder = SSEDecoder(detect_done)
+
+    events = decoder.feed(b"data: 1\n\ndata: [DONE]\n\ndata: 2\n\n")
+
+    if detect_done:
+        assert decoder.done is True
+        assert events == [IncomingServerSentEvent("1")]
+        assert decoder.feed(b"data: 3\n\n") == []
+    else:
+        assert decoder.done is False
+        assert [event.data for event in events] == ["1", "[DONE]", "2"]
+
+
+def test_sse_decoder_mirrors_write_sse():
+    items = [{"id": i, "choices": [{"delta": {"content": "ab\ncd"}}]} for i in range(3)]
+    data = b"".join(write_sse(ServerSentEvent(item)) for item in items)
+    data += write_sse(DONEServerSentEvent())
+    decoder = SSEDecoder()
+
+    events = _feed_all(decoder, [data[i : i + 10] for i in range(0, len(data), 10)])
+
+    assert [event.json() for event in events] == items
+    assert decoder.done is True
+
+
+async def test_read_sse_from_incoming_content():
+    content = IncomingContent(b"text/event-stream")
+    response = Response(200, [(b"content-type", b"text/event-stream")], content)
+
+    async def produce():
+        for chunk in (b"data: a\n", b"\ndata: b\n\nda", b"ta: [DONE]\n\n"):
+            await asyncio.sleep(0)
+            content.extend_body(chunk)
+        content.complete.set()
+        content.extend_body(b"")
+
+    task = asyncio.ensure_future(produce())
+    events = [event.data async for event in read_sse(response)]
+    await task
+
+    assert events == ["a", "b"]
+
+
+async def test_read_sse_without_content():
+    events = [event async for event in read_sse(Response(204))]
+
+    assert events == []
@@ -1,6 +1,7 @@
 import pytest
 
 from shuttleasgi.client import ClientSession, ConnectionTimeout, RequestTimeout
+from shuttleasgi.client.policies import deadline_scope
 
 from . import FakePools
 
@@ -33,3 +34,19 @@ async def test_request_timeout():
     ) as client:
         with pytest.raises(RequestTimeout):
             await client.get(b"/")
+
+
+async def test_request_timeout_reports_the_deadline():
+    fake_pools = FakePools([])
+    fake_pools.pool.connection.sleep_for = 5
+
+    async with ClientSession(
+        base_url=b"http://localhost:8080",
+        pools=fake_pools,
+        request_timeout=60,
+    ) as client:
+        with deadline_scope(0.01):
+            with pytest.raises(RequestTimeout) as error:
+                await client.get(b"/")
+
+    assert error.value.timeout <= 0.01
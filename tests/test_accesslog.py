@@ -0,0 +1,159 @@
+import asyncio
+import io
+import json
+import threading
+from typing import AsyncIterable
+
+from shuttleasgi.middlewares.shuttle_headers import (
+    ShuttleHeadersDecoratorMiddleware,
+    shuttle_headers,
+)
+from shuttleasgi.server.accesslog import AccessLog, AccessLogSink, StreamSink
+from shuttleasgi.server.responses import text
+from shuttleasgi.server.sse import ServerSentEvent
+from shuttleasgi.testing.helpers import get_example_scope
+from shuttleasgi.testing.messages import MockReceive, MockSend
+
+
+class FailingSink(AccessLogSink):
+    def write(self, data: bytes) -> None:
+        raise OSError("Unavailable")
+
+
+class BlockingSink(AccessLogSink):
+    def __init__(self) -> None:
+        self.release = threading.Event()
+        self.released = False
+
+    def write(self, data: bytes) -> None:
+        self.released = self.release.wait(5)
+
+
+async def _get(app, path):
+    mock_send = MockSend()
+    await app(get_example_scope("GET", path, []), MockReceive(), mock_send)
+    return mock_send
+
+
+async def test_access_log_writes_json_lines(app):
+    stream = io.BytesIO()
+    access_log = AccessLog(StreamSink(stream), flush_interval=60)
+    access_log.install(app)
+    app.middlewares.append(ShuttleHeadersDecoratorMiddleware())
+
+    @app.router.get("/cats/:cat_id")
+    @shuttle_headers()
+    async def get_cat(cat_id: int):
+        return text("Cat")
+
+    @app.router.get("/events")
+    async def events() -> AsyncIterable[ServerSentEvent]:
+        for i in range(2):
+            await asyncio.sleep(0)
+            yield ServerSentEvent({"index": i})
+
+    await app.start()
+    mock_send = await _get(app, "/cats/1")
+    await _get(app, "/events")
+    await _get(app, "/not-found")
+    await app.stop()
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(record["route"], record["status"]) for record in records] == [
+        ("/cats/:cat_id", 200),
+        ("/events", 200),
+        (None, 404),
+    ]
+    cat = records[0]
+    assert cat["method"] == "GET"
+    assert cat["path"] == "/cats/1"
+    assert cat["bytes"] == 3
+    assert cat["duration"] > 0
+    headers = dict(mock_send.messages[0]["headers"])
+    assert cat["request_id"] == headers[b"x-request-id"].decode()
+
+    events = records[1]
+    assert events["bytes"] == sum(
+        len(f'data: {{"index":{i}}}\n\n') for i in range(2)
+    )
+    assert events["stream_duration"] >= events["time_to_first_byte"] > 0
+    assert access_log.get_info() == {
+        "pending": 0,
+        "written": 3,
+        "dropped": 0,
+        "errors": 0,
+    }
+
+
+async def test_access_log_drops_records_when_full(app):
+    access_log = AccessLog(StreamSink(io.BytesIO()), capacity=2)
+    app.access_log = access_log
+
+    @app.router.get("/")
+    async def home():
+        return text("Hello")
+
+    await app.start()
+    for _ in range(5):
+        await _get(app, "/")
+
+    assert len(access_log) == 2
+    assert access_log.dropped == 3
+    assert access_log.flush() == 2
+
+
+async def test_access_log_counts_sink_errors(app):
+    access_log = AccessLog(FailingSink(), batch_size=2)
+    app.access_log = access_log
+
+    @app.router.get("/")
+    async def home():
+        return text("Hello")
+
+    await app.start()
+    for _ in range(3):
+        await _get(app, "/")
+
+    assert access_log.flush() == 0
+    assert access_log.errors == 2
+    assert access_log.dropped == 3
+
+
+async def test_access_log_stop_does_not_block_the_event_loop(app):
+    sink = BlockingSink()
+    access_log = AccessLog(sink, flush_interval=60)
+    access_log.install(app)
+
+    @app.router.get("/")
+    async def home():
+        return text("Hello")
+
+    await app.start()
+    await _get(app, "/")
+
+    stopping = asyncio.ensure_future(app.stop())
+    await asyncio.sleep(0.05)
+    # runs only if the final flush doesn't block the loop
+    sink.release.set()
+    await stopping
+
+    assert sink.released is True
+    assert access_log.written == 1
+
+
+def test_access_log_restarts_thread_inherited_across_fork():
+    access_log = AccessLog(StreamSink(io.BytesIO()), flush_interval=60)
+    access_log.start()
+    thread, stopping = access_log._thread, access_log._stopping
+    access_log.start()
+    assert access_log._thread is thread
+
+    # as seen by a forked process
+    access_log._pid = -1
+    access_log.start()
+
+    assert access_log._thread is not thread
+    assert access_log._thread.is_alive()
+    access_log.stop()
+    stopping.set()
+    thread.join()
@@ -32,6 +32,7 @@ from shuttleasgi.context import RequestContext, _request_context
 from shuttleasgi.contents import FormPart
 from shuttleasgi.exceptions import Conflict, InternalServerError, NotFound, WrongMethod
 from shuttleasgi.server.application import Application, ApplicationSyncEvent
+from shuttleasgi.server.authorization import allow_anonymous
 from shuttleasgi.server.bindings import (
     ClientInfo,
     FromBytes,
@@ -47,6 +48,7 @@ from shuttleasgi.server.bindings import (
     RequestUser,
     ServerInfo,
 )
+from shuttleasgi.middlewares.pipeline import MiddlewareStep
 from shuttleasgi.middlewares.shuttle_headers import ShuttleHeadersDecoratorMiddleware, shuttle_headers
 from shuttleasgi.server.di import di_scope_middleware
 from shuttleasgi.server.normalization import ensure_response
@@ -520,6 +522,35 @@ async def test_application_middlewares_two(app):
     assert calls == [1, 3, 6, 5, 7, 4, 2]
 
 
+async def test_application_middlewares_add_one_frame_per_layer():
+    depths = []
+
+    def get_depth():
+        frame, depth = sys._getframe(), 0
+        while frame is not None:
+            frame, depth = frame.f_back, depth + 1
+        return depth
+
+    async def middleware(request, handler):
+        assert handler.allow_anonymous is True
+        return await handler(request)
+
+    for count in (0, 3):
+        app = FakeApplication(router=Router())
+        app.middlewares.extend([middleware] * count)
+
+        @allow_anonymous()
+        @app.router.get("/")
+        async def home():
+            depths.append(get_depth())
+            return "Hello World"
+
+        await app(get_example_scope("GET", "/"), MockReceive(), MockSend())
+        assert app.response.status == 200
+
+    assert depths[1] - depths[0] == 3
+
+
 async def test_application_middlewares_skip_handler(app):
     calls = []
 
@@ -3289,6 +3320,188 @@ async def test_default_headers(app):
     assert response.headers.get_first(b"Example") == b"Foo"
 
 
+async def test_response_chunk_threshold(app):
+    app.response_chunk_threshold = 4
+
+    @app.router.route("/")
+    async def home():
+        return text("Hello World")
+
+    mock_send = MockSend()
+    await app(get_example_scope("GET", "/", []), MockReceive(), mock_send)
+
+    assert [bytes(m["body"]) for m in mock_send.messages[1:]] == [
+        b"Hell",
+        b"o Wo",
+        b"rld",
+    ]
+
+
+def test_response_chunk_threshold_must_be_positive(app):
+    with pytest.raises(ValueError):
+        app.response_chunk_threshold = 0
+
+
+async def test_draining_application_responds_503(app):
+    @app.router.route("/")
+    async def home():
+        return text("Hello World")
+
+    await app.start()
+    app.in_flight.start_draining()
+    assert app.draining is True
+
+    mock_send = MockSend()
+    await app(get_example_scope("GET", "/", []), MockReceive(), mock_send)
+
+    response_start = mock_send.messages[0]
+    assert response_start["status"] == 503
+    assert (b"Retry-After", b"5") in response_start["headers"]
+
+
+async def test_drain_waits_for_requests_in_flight(app):
+    handling = asyncio.Event()
+
+    @app.router.route("/")
+    async def home():
+        handling.set()
+        await asyncio.sleep(0.1)
+        return text("Hello World")
+
+    await app.start()
+    mock_send = MockSend()
+    task = asyncio.create_task(
+        app(get_example_scope("GET", "/", []), MockReceive(), mock_send)
+    )
+    await handling.wait()
+
+    assert app.in_flight.get_info() == {
+        "draining": False,
+        "requests": 1,
+        "streams": 0,
+        "websockets": 0,
+    }
+    assert await app.drain(5) is True
+    assert task.done()
+    assert mock_send.messages[0]["status"] == 200
+    assert len(app.in_flight) == 0
+
+
+async def test_drain_counts_streams_and_cancels_after_timeout(app):
+    streaming = asyncio.Event()
+
+    @app.router.route("/")
+    async def home() -> AsyncIterable[ServerSentEvent]:
+        yield ServerSentEvent({"index": 0})
+        streaming.set()
+        await asyncio.sleep(10)
+        yield ServerSentEvent({"index": 1})
+
+    await app.start()
+    task = asyncio.create_task(
+        app(get_example_scope("GET", "/", []), MockReceive(), MockSend())
+    )
+    await streaming.wait()
+
+    assert app.in_flight.streams == 1
+    assert await app.drain(0.1) is False
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert app.in_flight.get_info()["streams"] == 0
+    assert len(app.in_flight) == 0
+
+
+async def test_use_metrics(app):
+    metrics = app.use_metrics()
+
+    @app.router.get("/cats/:cat_id")
+    async def get_cat(cat_id: int):
+        return text("Cat")
+
+    for path in ["/cats/1", "/cats/2", "/not-found"]:
+        await app(get_example_scope("GET", path, []), MockReceive(), MockSend())
+
+    snapshot = {item["route"]: item for item in metrics.get_snapshot()}
+    assert snapshot["/cats/:cat_id"]["statuses"] == {"2xx": 2}
+    assert snapshot["/cats/:cat_id"]["duration"]["count"] == 2
+    assert snapshot["<unmatched>"]["statuses"] == {"4xx": 1}
+
+    mock_send = MockSend()
+    await app(get_example_scope("GET", "/metrics", []), MockReceive(), mock_send)
+    body = mock_send.messages[1]["body"]
+    assert (
+        b'shuttleasgi_requests_total{method="GET",route="/cats/:cat_id",status="2xx"} 2'
+        in body
+    )
+
+
+async def test_stream_metrics(app):
+    metrics = app.use_metrics()
+    completed = []
+
+    @app.router.get("/events")
+    async def events() -> AsyncIterable[ServerSentEvent]:
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            yield ServerSentEvent({"index": i})
+
+    @app.on_stream_complete
+    async def on_stream_complete(application, request, recorder):
+        completed.append((request.method, recorder.get_info()))
+
+    await app.start()
+    await app(get_example_scope("GET", "/events", []), MockReceive(), MockSend())
+
+    assert len(completed) == 1
+    method, info = completed[0]
+    assert method == "GET"
+    assert info["route"] == "/events"
+    assert info["completed"] is True
+    assert info["chunks"] == 3
+    assert info["bytes"] == sum(
+        len(f'data: {{"index":{i}}}\n\n') for i in range(3)
+    )
+    assert info["time_to_first_byte"] >= 0.01
+    assert info["duration"] >= info["time_to_first_byte"]
+
+    streaming = metrics.get_snapshot()[0]["streaming"]
+    assert streaming["count"] == 1
+    assert streaming["incomplete"] == 0
+    assert streaming["chunk_gap"]["count"] == 2
+
+
+async def test_stream_metrics_interrupted_stream(app):
+    completed = []
+
+    @app.router.get("/events")
+    async def events() -> AsyncIterable[ServerSentEvent]:
+        for i in range(3):
+            yield ServerSentEvent({"index": i})
+
+    @app.on_stream_complete
+    async def on_stream_complete(application, request, recorder):
+        completed.append(recorder)
+
+    class DisconnectingSend(MockSend):
+        async def __call__(self, message):
+            if message.get("more_body") and len(self.messages) == 2:
+                raise OSError("Connection lost")
+            await super().__call__(message)
+
+    await app.start()
+    with pytest.raises(OSError):
+        await app(
+            get_example_scope("GET", "/events", []), MockReceive(), DisconnectingSend()
+        )
+
+    assert len(completed) == 1
+    assert completed[0].completed is False
+    assert completed[0].chunks == 1
+    # without request metrics, the route is not known
+    assert completed[0].route is None
+
+
 async def test_start_stop_events(app):
     on_start_called = False
     on_after_start_called = False
@@ -3329,6 +3542,33 @@ async def test_start_stop_events(app):
     assert on_stop_called is True
 
 
+async def test_prepare_configures_the_app_without_start_events(app):
+    events = []
+
+    @app.router.get("/")
+    async def home():
+        return text("Hello")
+
+    async def on_start(application):
+        events.append("on_start")
+
+    async def after_start(application):
+        events.append("after_start")
+
+    app.on_start += on_start
+    app.after_start += after_start
+
+    app.prepare()
+    assert events == []
+    assert app.started is False
+
+    await app.start()
+    assert events == ["on_start", "after_start"]
+
+    await app(get_example_scope("GET", "/", []), MockReceive(), MockSend())
+    assert app.response.status == 200
+
+
 @pytest.mark.parametrize("method", ["environ", "explicit"])
 async def test_mounted_app_auto_events(method: str):
     if method == "environ":
@@ -4358,6 +4598,103 @@ async def test_multiple_concurrent_requests_shuttle_headers_middleware():
         print(rid)
 
 
+async def test_shuttle_headers_middleware_applies_to_decorated_routes():
+    app = FakeApplication(show_error_details=True, router=Router())
+    middleware = ShuttleHeadersDecoratorMiddleware()
+    app.middlewares.append(middleware)
+
+    @app.router.get("/decorated")
+    @shuttle_headers()
+    async def decorated():
+        return "Hello World"
+
+    @app.router.get("/plain")
+    async def plain():
+        return "Hello World"
+
+    await app.start()
+
+    routes = {route.pattern: route for route in app.router}
+    assert middleware.applies_to(routes[b"/decorated"]) is True
+    assert middleware.applies_to(routes[b"/plain"]) is False
+    # the chain of undecorated routes doesn't include the middleware
+    assert routes[b"/decorated"].handler.middleware is middleware
+    assert not isinstance(routes[b"/plain"].handler, MiddlewareStep)
+
+    for path, expected in ((b"/decorated", True), (b"/plain", False)):
+        await app(get_example_scope("GET", path.decode(), []), MockReceive(), MockSend())
+        response = app.response
+        assert response.status == 200
+        assert response.headers.contains(b"x-request-id") is expected
+
+
+async def test_di_bound_middleware_applies_to_is_preserved():
+    app = FakeApplication(show_error_details=True, router=Router())
+    calls = []
+
+    async def middleware(request, handler, example: FromHeader[str]):
+        calls.append(example.value)
+        return await handler(request)
+
+    middleware.applies_to = lambda route: route.pattern == b"/filtered"
+    app.middlewares.append(middleware)
+
+    @app.router.get("/filtered")
+    async def filtered():
+        return "Hello World"
+
+    @app.router.get("/plain")
+    async def plain():
+        return "Hello World"
+
+    await app.start()
+
+    routes = {route.pattern: route for route in app.router}
+    assert isinstance(routes[b"/filtered"].handler, MiddlewareStep)
+    assert not isinstance(routes[b"/plain"].handler, MiddlewareStep)
+
+    for path in ("/filtered", "/plain"):
+        await app(
+            get_example_scope("GET", path, [(b"example", b"Lorem")]),
+            MockReceive(),
+            MockSend(),
+        )
+        assert app.response.status == 200
+
+    assert calls == ["Lorem"]
+
+
+async def test_shuttle_headers_request_context():
+    app = FakeApplication(show_error_details=True, router=Router())
+
+    app.middlewares.insert(0, ShuttleHeadersDecoratorMiddleware())
+    seen = {}
+
+    @app.router.get("/")
+    @shuttle_headers()
+    async def home():
+        state = RequestContext.current()
+        RequestContext.set("tenant", "example")
+        seen["request_id"] = RequestContext.get("request_id")
+        seen["tenant"] = state.get("tenant")
+        return "Hello World"
+
+    assert RequestContext.current() is None
+    assert RequestContext.get("request_id", "none") == "none"
+    with pytest.raises(LookupError):
+        RequestContext.set("tenant", "example")
+
+    await app(get_example_scope("GET", "/", []), MockReceive(), MockSend())
+
+    response = app.response
+    assert response is not None
+    assert seen["request_id"] == response.headers.get_first(b"x-request-id")
+    assert seen["tenant"] == "example"
+    state = _request_context.get()
+    assert state.request_id == seen["request_id"]
+    assert state.processing_time > 0
+
+
 async def test_application_sse_openai():
     app = FakeApplication(show_error_details=True, router=Router())
     get = app.router.get
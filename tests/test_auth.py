@@ -336,6 +336,35 @@ async def test_authorization_supports_allow_anonymous(app):
     assert app.response.status == 200
 
 
+async def test_authorization_middleware_skips_anonymous_routes(app):
+    from shuttleasgi.server.responses import text
+
+    app.use_authentication().add(MockNotAuthHandler())
+    app.use_authorization().default_policy += AuthenticatedRequirement()
+
+    @allow_anonymous()
+    @app.router.get("/")
+    async def home():
+        return text("Hi There!")
+
+    @app.router.get("/private")
+    async def private():
+        return text("Hi There!")
+
+    await app.start()
+
+    authorization_middleware = app.middlewares[1]
+    routes = {route.pattern: route for route in app.router}
+    assert authorization_middleware.applies_to(routes[b"/"]) is False
+    assert authorization_middleware.applies_to(routes[b"/private"]) is True
+
+    await app(get_example_scope("GET", "/"), MockReceive(), MockSend())
+    assert app.response.status == 200
+
+    await app(get_example_scope("GET", "/private"), MockReceive(), MockSend())
+    assert app.response.status == 401
+
+
 async def test_authentication_challenge_response(app):
     app.use_authentication().add(AccessTokenCrashingHandler())
 
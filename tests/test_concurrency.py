@@ -0,0 +1,203 @@
+import asyncio
+import time
+
+import pytest
+
+from shuttleasgi.server.application import Application
+from shuttleasgi.server.concurrency import (
+    AdaptiveConcurrencyMiddleware,
+    GradientLimit,
+    LoopLagMonitor,
+    priority,
+)
+from shuttleasgi.server.responses import text
+from shuttleasgi.testing.helpers import get_example_scope
+from shuttleasgi.testing.messages import MockReceive, MockSend
+
+
+async def _get(app, path="/"):
+    mock_send = MockSend()
+    await app(get_example_scope("GET", path, []), MockReceive(), mock_send)
+    return mock_send.messages[0]
+
+
+def test_gradient_limit_grows_with_stable_latency():
+    limit = GradientLimit(initial_limit=20, min_limit=1, max_limit=100)
+
+    for _ in range(50):
+        limit.update(0.01, in_flight=limit.limit)
+
+    assert limit.limit > 20
+
+
+def test_gradient_limit_shrinks_when_latency_grows():
+    limit = GradientLimit(initial_limit=50, min_limit=1, max_limit=100)
+
+    for _ in range(10):
+        limit.update(0.01, in_flight=50)
+    grown = limit.limit
+
+    for _ in range(20):
+        limit.update(0.2, in_flight=grown)
+
+    assert limit.limit < grown
+
+
+def test_gradient_limit_does_not_grow_when_unused():
+    limit = GradientLimit(initial_limit=20, min_limit=1, max_limit=100)
+
+    for _ in range(50):
+        limit.update(0.01, in_flight=1)
+
+    assert limit.limit == 20
+
+
+def test_gradient_limit_invalid_limits():
+    with pytest.raises(ValueError):
+        GradientLimit(initial_limit=5, min_limit=10)
+
+
+def test_invalid_priority():
+    with pytest.raises(ValueError):
+        priority("urgent")
+
+
+async def test_loop_lag_monitor():
+    monitor = LoopLagMonitor(interval=0.01, smoothing=1.0)
+    monitor.start()
+
+    await asyncio.sleep(0.02)
+    time.sleep(0.1)
+    await asyncio.sleep(0.02)
+    monitor.stop()
+
+    assert monitor.max_lag >= 0.05
+    assert monitor.running is False
+
+
+async def test_concurrency_middleware_rejects_over_budget():
+    app = Application()
+    limiter = AdaptiveConcurrencyMiddleware(
+        GradientLimit(initial_limit=1, min_limit=1, max_limit=1), queue_budget=0.05
+    )
+    app.middlewares.append(limiter)
+    release = asyncio.Event()
+
+    @app.router.get("/slow")
+    async def slow():
+        await release.wait()
+        return text("Slow")
+
+    @app.router.get("/")
+    async def home():
+        return text("Hello")
+
+    await app.start()
+    slow_request = asyncio.create_task(_get(app, "/slow"))
+    await asyncio.sleep(0)
+
+    response_start = await _get(app)
+    assert response_start["status"] == 503
+    assert (b"Retry-After", b"1") in response_start["headers"]
+    assert limiter.get_info()["rejected"] == 1
+
+    release.set()
+    assert (await slow_request)["status"] == 200
+    assert (await _get(app))["status"] == 200
+
+
+async def test_concurrency_middleware_queues_within_budget():
+    app = Application()
+    limiter = AdaptiveConcurrencyMiddleware(
+        GradientLimit(initial_limit=1, min_limit=1, max_limit=1), queue_budget=5
+    )
+    app.middlewares.append(limiter)
+
+    @app.router.get("/")
+    async def home():
+        await asyncio.sleep(0.01)
+        return text("Hello")
+
+    await app.start()
+    responses = await asyncio.gather(*[_get(app) for _ in range(5)])
+
+    assert [response["status"] for response in responses] == [200] * 5
+    assert limiter.get_info()["rejected"] == 0
+    assert limiter.in_flight == 0
+
+
+async def test_concurrency_middleware_sheds_by_priority_when_loop_lags():
+    app = Application()
+    lag_monitor = LoopLagMonitor()
+    limiter = AdaptiveConcurrencyMiddleware(lag_monitor=lag_monitor, max_loop_lag=0.1)
+    app.middlewares.append(limiter)
+
+    @priority("critical")
+    @app.router.get("/health")
+    async def health():
+        return text("OK")
+
+    @priority("low")
+    @app.router.get("/")
+    async def home():
+        return text("Hello")
+
+    await app.start()
+    lag_monitor.start()
+    lag_monitor.lag = 0.5
+
+    assert (await _get(app))["status"] == 503
+    assert (await _get(app, "/health"))["status"] == 200
+    assert limiter.limit.limit < 100
+    lag_monitor.stop()
+
+
+async def test_concurrency_middleware_reserves_slots_of_woken_requests():
+    limiter = AdaptiveConcurrencyMiddleware(
+        GradientLimit(initial_limit=1, min_limit=1, max_limit=1), queue_budget=5
+    )
+    release = asyncio.Event()
+    observed = []
+    tasks = []
+
+    async def record(request):
+        observed.append(limiter.in_flight)
+        await asyncio.sleep(0.01)
+        return text("Hello")
+
+    async def slow(request):
+        await release.wait()
+        # a request arriving while the queued one is being woken
+        tasks.append(asyncio.ensure_future(limiter(None, record)))
+        return text("Slow")
+
+    first = asyncio.ensure_future(limiter(None, slow))
+    await asyncio.sleep(0)
+    queued = asyncio.ensure_future(limiter(None, record))
+    await asyncio.sleep(0)
+    assert limiter.queued == 1
+
+    release.set()
+    await asyncio.gather(first, queued)
+    await asyncio.gather(*tasks)
+
+    assert observed == [1, 1]
+    assert limiter.in_flight == 0
+
+
+async def test_concurrency_middleware_install():
+    app = Application()
+    limiter = AdaptiveConcurrencyMiddleware()
+    limiter.install(app)
+
+    @app.router.get("/")
+    async def home():
+        return text("Hello")
+
+    await app.start()
+    assert limiter in app.middlewares
+    assert limiter.lag_monitor.running is True
+    assert (await _get(app))["status"] == 200
+
+    await app.stop()
+    assert limiter.lag_monitor.running is False
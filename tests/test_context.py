@@ -0,0 +1,53 @@
+import importlib.util
+import os
+
+import pytest
+
+import shuttleasgi.context as compiled_context
+
+
+def _load_fallback():
+    path = os.path.join(os.path.dirname(compiled_context.__file__), "context.py")
+    spec = importlib.util.spec_from_file_location("_context_fallback", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(params=["compiled", "fallback"])
+def context_module(request):
+    if request.param == "fallback":
+        return _load_fallback()
+    if compiled_context.__file__.endswith(".py"):
+        pytest.skip("the context module is not compiled")
+    return compiled_context
+
+
+def test_request_state_fields(context_module):
+    state = context_module.RequestState(b"req_1", 1.5)
+
+    assert state.request_id == b"req_1"
+    assert state.get("request_id") == b"req_1"
+    assert state.get("start_time") == 1.5
+    assert state.get("tenant", "none") == "none"
+
+    state.set("request_id", None)
+    state.set("tenant", "example")
+    assert state.get("request_id", b"default") == b"default"
+    assert state.get("tenant") == "example"
+
+
+@pytest.mark.parametrize("value", ["req_1", bytearray(b"req_1"), 1])
+def test_request_state_request_id_must_be_bytes(context_module, value):
+    state = context_module.RequestState()
+
+    with pytest.raises(TypeError):
+        state.request_id = value
+
+    with pytest.raises(TypeError):
+        state.set("request_id", value)
+
+    with pytest.raises(TypeError):
+        context_module.RequestState(value)
+
+    assert state.request_id is None
@@ -0,0 +1,62 @@
+import os
+import time
+import uuid
+
+import pytest
+
+from shuttleasgi.utils.ids import IdGenerator, generate_id, generate_id_str, uuid7
+
+
+def test_uuid7_layout():
+    before = time.time_ns() // 1000000
+    value = uuid.UUID(bytes=uuid7())
+    after = time.time_ns() // 1000000
+
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+    assert before <= value.int >> 80 <= after
+
+
+def test_generate_id_prefix():
+    value = generate_id(b"req_")
+    assert value.startswith(b"req_")
+    assert uuid.UUID(value[4:].decode()).version == 7
+
+    text = generate_id_str("chatcmpl-")
+    assert text.startswith("chatcmpl-")
+    assert len(text) == len("chatcmpl-") + 32
+
+
+def test_ids_are_unique_and_ordered():
+    generator = IdGenerator(batch_size=64)
+    values = [generator.new_id() for _ in range(10000)]
+
+    assert len(set(values)) == len(values)
+    assert values == sorted(values)
+
+
+def test_id_generator_batch_size():
+    with pytest.raises(ValueError):
+        IdGenerator(batch_size=8)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork")
+def test_ids_differ_after_fork():
+    generator = IdGenerator()
+    generator.new_id()
+    read_fd, write_fd = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        os.close(read_fd)
+        os.write(write_fd, generator.new_id())
+        os._exit(0)
+
+    os.close(write_fd)
+    value = generator.new_id()
+    child_value = os.read(read_fd, 64)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+
+    assert len(child_value) == 32
+    assert child_value[16:] != value[16:]
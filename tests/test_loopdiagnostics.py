@@ -0,0 +1,66 @@
+import asyncio
+import gc
+import time
+
+import pytest
+
+from shuttleasgi.server.loopdiagnostics import LoopDiagnostics, get_installed
+from shuttleasgi.server.responses import text
+from shuttleasgi.testing.helpers import get_example_scope
+from shuttleasgi.testing.messages import MockReceive, MockSend
+
+
+async def _get(app, path):
+    mock_send = MockSend()
+    await app(get_example_scope("GET", path, []), MockReceive(), mock_send)
+    return mock_send
+
+
+async def test_loop_diagnostics_records_slow_callbacks(app):
+    diagnostics = LoopDiagnostics(slow_callback_threshold=0.05, lag_interval=0.01)
+    diagnostics.install(app, path="/_diagnostics")
+
+    @app.router.get("/slow/{name}")
+    async def slow(name: str):
+        await asyncio.sleep(0)
+        time.sleep(0.06)
+        return text(name)
+
+    await app.start()
+    try:
+        assert get_installed() is diagnostics
+
+        # the request must run in its own task, like with ASGI servers
+        await asyncio.create_task(_get(app, "/slow/example"))
+        await asyncio.sleep(0.02)
+        gc.collect()
+
+        snapshot = diagnostics.get_snapshot()
+        assert snapshot["slow_callbacks"]["count"] >= 1
+        assert any(
+            record["route"] == "/slow/{name}" and record["duration"] >= 0.05
+            for record in snapshot["records"]
+        )
+        assert snapshot["loop_lag"]["count"] >= 1
+        assert snapshot["gc_pauses"]["count"] >= 1
+
+        mock_send = await _get(app, "/_diagnostics")
+        assert mock_send.messages[0]["status"] == 200
+        assert b"loop_lag" in mock_send.messages[1]["body"]
+    finally:
+        diagnostics.disable()
+
+    await app.stop()
+    assert get_installed() is None
+    assert diagnostics.enabled is False
+
+
+async def test_loop_diagnostics_single_instance():
+    first = LoopDiagnostics()
+    first.enable()
+    assert first.enabled is True
+    try:
+        with pytest.raises(RuntimeError):
+            LoopDiagnostics().enable()
+    finally:
+        first.disable()
@@ -0,0 +1,111 @@
+import pytest
+
+from shuttleasgi.server.metrics import (
+    OTHER_METHOD,
+    Histogram,
+    RequestMetrics,
+    StreamRecorder,
+    exponential_buckets,
+    write_prometheus,
+)
+
+
+def test_exponential_buckets():
+    assert exponential_buckets(1, 2, 4) == [1, 2, 4, 8]
+
+    with pytest.raises(ValueError):
+        exponential_buckets(0, 2, 4)
+
+
+def test_histogram():
+    histogram = Histogram([1, 2, 4, 8])
+
+    for value in [0.5, 1, 1.5, 3, 3, 3, 7, 100]:
+        histogram.record(value)
+
+    assert histogram.counts == [2, 1, 3, 1, 1]
+    assert histogram.count == 8
+    assert histogram.sum == 119
+    assert histogram.max == 100
+    assert histogram.percentile(50) == 4
+    assert histogram.percentile(100) == 100
+    assert histogram.snapshot()["p90"] == 100
+
+    histogram.reset()
+    assert histogram.count == 0
+    assert histogram.percentile(99) == 0.0
+
+
+def test_histogram_bounds_must_be_sorted():
+    with pytest.raises(ValueError):
+        Histogram([2, 1])
+
+
+def test_request_metrics_prometheus():
+    metrics = RequestMetrics([0.1, 1])
+    metrics.record("GET", b"/cats/:id", 200, 0.05)
+    metrics.record("GET", b"/cats/:id", 404, 0.5)
+    metrics.record("POST", None, 500, 2)
+
+    assert write_prometheus(metrics) == (
+        "# HELP shuttleasgi_requests_total Requests handled, by status class.\n"
+        "# TYPE shuttleasgi_requests_total counter\n"
+        'shuttleasgi_requests_total{method="GET",route="/cats/:id",status="2xx"} 1\n'
+        'shuttleasgi_requests_total{method="GET",route="/cats/:id",status="4xx"} 1\n'
+        'shuttleasgi_requests_total{method="POST",route="<unmatched>",status="5xx"} 1\n'
+        "# HELP shuttleasgi_request_duration_seconds Duration of request handling "
+        "in seconds.\n"
+        "# TYPE shuttleasgi_request_duration_seconds histogram\n"
+        'shuttleasgi_request_duration_seconds_bucket{method="GET",route="/cats/:id",le="0.1"} 1\n'
+        'shuttleasgi_request_duration_seconds_bucket{method="GET",route="/cats/:id",le="1"} 2\n'
+        'shuttleasgi_request_duration_seconds_bucket{method="GET",route="/cats/:id",le="+Inf"} 2\n'
+        'shuttleasgi_request_duration_seconds_sum{method="GET",route="/cats/:id"} 0.55\n'
+        'shuttleasgi_request_duration_seconds_count{method="GET",route="/cats/:id"} 2\n'
+        'shuttleasgi_request_duration_seconds_bucket{method="POST",route="<unmatched>",le="0.1"} 0\n'
+        'shuttleasgi_request_duration_seconds_bucket{method="POST",route="<unmatched>",le="1"} 0\n'
+        'shuttleasgi_request_duration_seconds_bucket{method="POST",route="<unmatched>",le="+Inf"} 1\n'
+        'shuttleasgi_request_duration_seconds_sum{method="POST",route="<unmatched>"} 2\n'
+        'shuttleasgi_request_duration_seconds_count{method="POST",route="<unmatched>"} 1\n'
+    )
+
+
+def test_request_metrics_group_unknown_methods():
+    metrics = RequestMetrics([0.1, 1])
+    for index in range(100):
+        metrics.record(f"X-{index}", None, 405, 0.05)
+    metrics.record("GET", None, 404, 0.05)
+
+    assert sorted(metrics.routes) == ["GET", OTHER_METHOD]
+
+    other = metrics.get_route_metrics("BREW", None)
+    assert other.method == OTHER_METHOD
+    assert other.duration.count == 100
+
+
+def test_stream_recorder():
+    metrics = RequestMetrics([0.1, 1])
+    route_metrics = metrics.record("GET", b"/events", 200, 0.001)
+
+    recorder = StreamRecorder(route_metrics)
+    recorder.on_chunk(10)
+    recorder.on_chunk(5)
+    recorder.on_end(True)
+
+    assert recorder.route == "/events"
+    assert recorder.chunks == 2
+    assert recorder.bytes == 15
+    assert recorder.completed is True
+
+    streaming = route_metrics.streaming
+    assert streaming.count == 1
+    assert streaming.bytes == 15
+    assert streaming.chunk_gap.count == 1
+    assert streaming.time_to_first_byte.count == 1
+
+    text = write_prometheus(metrics)
+    assert 'shuttleasgi_streams_total{method="GET",route="/events",completed="true"} 1' in text
+    assert 'shuttleasgi_stream_bytes_total{method="GET",route="/events"} 15' in text
+    assert (
+        'shuttleasgi_stream_duration_seconds_count{method="GET",route="/events"} 1'
+        in text
+    )
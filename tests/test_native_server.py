@@ -0,0 +1,287 @@
+import asyncio
+from typing import AsyncIterable
+
+import pytest
+
+from shuttleasgi import Content, Response
+from shuttleasgi.client import ClientSession
+from shuttleasgi.server import Application
+from shuttleasgi.server.native import create_socket, serve
+from shuttleasgi.server.responses import text
+from shuttleasgi.server.sse import ServerSentEvent
+
+pytest.importorskip("httptools")
+
+
+@pytest.fixture
+def native_app():
+    app = Application(show_error_details=True)
+
+    @app.router.get("/")
+    @app.router.head("/")
+    async def home():
+        return text("Hello, World")
+
+    @app.router.post("/echo")
+    async def echo(request):
+        return Response(
+            200, None, Content(b"application/octet-stream", await request.read())
+        )
+
+    @app.router.get("/events")
+    async def events() -> AsyncIterable[ServerSentEvent]:
+        for i in range(3):
+            yield ServerSentEvent({"index": i})
+
+    @app.router.get("/dated")
+    async def dated():
+        response = text("Hello, World")
+        response.add_header(b"date", b"Thu, 01 Jan 1970 00:00:00 GMT")
+        return response
+
+    @app.router.get("/large")
+    async def large():
+        return Response(200, None, Content(b"application/octet-stream", b"x" * 200_000))
+
+    return app
+
+
+@pytest.fixture
+async def server_port(native_app):
+    sock = create_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    started = asyncio.Event()
+    task = asyncio.create_task(serve(native_app, sock=sock, started=started))
+    await asyncio.wait(
+        [task, asyncio.ensure_future(started.wait())],
+        return_when=asyncio.FIRST_COMPLETED,
+    )
+    if task.done():
+        task.result()
+    yield port
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+async def _exchange(port: int, data: bytes) -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    await writer.drain()
+    response = await asyncio.wait_for(reader.read(), 5)
+    writer.close()
+    return response
+
+
+async def test_native_server_with_client_session(server_port):
+    base_url = f"http://127.0.0.1:{server_port}"
+
+    async with ClientSession(base_url=base_url) as client:
+        for _ in range(2):
+            response = await client.get("/")
+            assert response.status == 200
+            assert await response.text() == "Hello, World"
+            assert response.get_first_header(b"date")
+
+        body = b"x" * 300_000
+        response = await client.post("/echo", Content(b"application/octet-stream", body))
+        assert await response.read() == body
+
+        response = await client.get("/large")
+        assert len(await response.read()) == 200_000
+
+        response = await client.get("/not-found")
+        assert response.status == 404
+
+
+async def test_native_server_keeps_date_header_set_by_handler(server_port):
+    data = await _exchange(
+        server_port,
+        b"GET /dated HTTP/1.1\r\nhost: localhost\r\nconnection: close\r\n\r\n",
+    )
+
+    head = data.split(b"\r\n\r\n", 1)[0].lower()
+    assert head.count(b"\r\ndate: ") == 1
+    assert b"\r\ndate: thu, 01 jan 1970 00:00:00 gmt" in head
+
+
+async def test_native_server_pipelined_requests(server_port):
+    data = await _exchange(
+        server_port,
+        b"GET / HTTP/1.1\r\nhost: localhost\r\n\r\n"
+        b"POST /echo HTTP/1.1\r\nhost: localhost\r\ncontent-length: 3\r\n\r\nabc"
+        b"GET / HTTP/1.1\r\nhost: localhost\r\nconnection: close\r\n\r\n",
+    )
+
+    assert data.count(b"HTTP/1.1 200 OK\r\n") == 3
+    assert data.index(b"Hello, World") < data.index(b"abc")
+    assert data.endswith(b"Hello, World")
+    assert b"connection: close\r\n" in data
+
+
+async def test_native_server_http_1_0_closes_connection(server_port):
+    data = await _exchange(server_port, b"GET / HTTP/1.0\r\n\r\n")
+
+    assert data.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert b"connection: close\r\n" in data
+    assert data.endswith(b"Hello, World")
+
+
+async def test_native_server_head_request(server_port):
+    data = await _exchange(
+        server_port, b"HEAD / HTTP/1.1\r\nhost: localhost\r\nconnection: close\r\n\r\n"
+    )
+
+    assert b"content-length: 12\r\n" in data
+    assert data.endswith(b"\r\n\r\n")
+
+
+async def test_native_server_streams_chunked_responses(server_port):
+    data = await _exchange(
+        server_port,
+        b"GET /events HTTP/1.1\r\nhost: localhost\r\nconnection: close\r\n\r\n",
+    )
+
+    assert b"transfer-encoding: chunked\r\n" in data
+    assert b'data: {"index":2}' in data
+    assert data.endswith(b"0\r\n\r\n")
+
+
+async def test_native_server_records_streams(native_app, server_port):
+    metrics = native_app.use_metrics(path=None)
+    completed = []
+
+    @native_app.on_stream_complete
+    async def on_stream_complete(application, request, recorder):
+        completed.append(recorder)
+
+    data = await _exchange(
+        server_port,
+        b"GET /events HTTP/1.1\r\nhost: localhost\r\nconnection: close\r\n\r\n",
+    )
+
+    assert data.endswith(b'data: {"index":2}\n\n\r\n0\r\n\r\n')
+    assert len(completed) == 1
+    assert completed[0].completed is True
+    assert completed[0].chunks == 3
+    assert completed[0].route == "/events"
+    assert metrics.get_route_metrics("GET", b"/events").streaming.count == 1
+
+
+async def test_native_server_bad_request(server_port):
+    data = await _exchange(server_port, b"NOT HTTP\r\n\r\n")
+
+    assert data.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+
+
+async def test_native_server_does_not_support_mounts(native_app):
+    native_app.mount("/sub", Application())
+
+    with pytest.raises(RuntimeError):
+        await serve(native_app, sock=create_socket("127.0.0.1", 0))
+
+
+async def test_native_server_shutdown_waits_for_responses():
+    app = Application()
+    handling = asyncio.Event()
+
+    @app.router.get("/slow")
+    async def slow():
+        handling.set()
+        await asyncio.sleep(0.2)
+        return text("Done")
+
+    sock = create_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    started = asyncio.Event()
+    task = asyncio.create_task(serve(app, sock=sock, started=started))
+    await started.wait()
+
+    idle_reader, idle_writer = await asyncio.open_connection("127.0.0.1", port)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /slow HTTP/1.1\r\nhost: localhost\r\n\r\n")
+    await handling.wait()
+
+    task.cancel()
+    # idle connections are closed immediately
+    assert await asyncio.wait_for(idle_reader.read(), 1) == b""
+
+    data = await asyncio.wait_for(reader.read(), 5)
+    assert b"connection: close\r\n" in data
+    assert data.endswith(b"Done")
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    idle_writer.close()
+    writer.close()
+
+
+async def _start_server(app, **kwargs):
+    sock = create_socket("127.0.0.1", 0)
+    started = asyncio.Event()
+    task = asyncio.create_task(serve(app, sock=sock, started=started, **kwargs))
+    await started.wait()
+    return task, sock.getsockname()[1]
+
+
+async def _stop_server(task):
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+async def test_native_server_closes_idle_keep_alive_connections(native_app):
+    task, port = await _start_server(native_app, timeout_keep_alive=0.05)
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET / HTTP/1.1\r\nhost: localhost\r\n\r\n")
+
+        # the connection is kept alive after the response, until it is idle
+        # for the keep-alive timeout
+        data = await asyncio.wait_for(reader.read(), 1)
+        assert data.startswith(b"HTTP/1.1 200 OK\r\n")
+        assert data.endswith(b"Hello, World")
+        assert b"connection: close\r\n" not in data
+        writer.close()
+
+        idle_reader, idle_writer = await asyncio.open_connection("127.0.0.1", port)
+        assert await asyncio.wait_for(idle_reader.read(), 1) == b""
+        idle_writer.close()
+    finally:
+        await _stop_server(task)
+
+
+async def test_native_server_keep_alive_timer_is_reset_by_requests(native_app):
+    task, port = await _start_server(native_app, timeout_keep_alive=0.2)
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for _ in range(3):
+            await asyncio.sleep(0.1)
+            writer.write(b"GET / HTTP/1.1\r\nhost: localhost\r\n\r\n")
+            await asyncio.wait_for(reader.readuntil(b"Hello, World"), 1)
+        writer.close()
+    finally:
+        await _stop_server(task)
+
+
+async def test_native_server_refuses_too_large_headers(native_app):
+    task, port = await _start_server(native_app, max_header_size=1024)
+    try:
+        data = await _exchange(
+            port,
+            b"GET / HTTP/1.1\r\nhost: localhost\r\nx-large: "
+            + b"x" * 2048
+            + b"\r\n\r\n",
+        )
+        assert data.startswith(b"HTTP/1.1 431 Request Header Fields Too Large\r\n")
+
+        data = await _exchange(
+            port, b"GET / HTTP/1.1\r\nhost: localhost\r\nconnection: close\r\n\r\n"
+        )
+        assert data.endswith(b"Hello, World")
+    finally:
+        await _stop_server(task)
@@ -0,0 +1,158 @@
+import asyncio
+from typing import AsyncIterable
+
+import pytest
+
+pytest.importorskip("opentelemetry.sdk")
+
+from opentelemetry import trace  # noqa: E402
+from opentelemetry.sdk.trace import TracerProvider  # noqa: E402
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor  # noqa: E402
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (  # noqa: E402
+    InMemorySpanExporter,
+)
+
+from shuttleasgi.client.session import ClientSession  # noqa: E402
+from shuttleasgi.messages import Request  # noqa: E402
+from shuttleasgi.server import Application  # noqa: E402
+from shuttleasgi.server import otel  # noqa: E402
+from shuttleasgi.server.otel import (  # noqa: E402
+    OTELMiddleware,
+    propagation_middleware,
+    track_request_route,
+    use_open_telemetry,
+)
+from shuttleasgi.server.responses import text  # noqa: E402
+from shuttleasgi.server.sse import ServerSentEvent  # noqa: E402
+from shuttleasgi.testing.helpers import get_example_scope  # noqa: E402
+from shuttleasgi.testing.messages import MockReceive, MockSend  # noqa: E402
+
+exporter = InMemorySpanExporter()
+provider = TracerProvider()
+provider.add_span_processor(SimpleSpanProcessor(exporter))
+trace.set_tracer_provider(provider)
+
+
+@pytest.fixture
+def otel_app(app):
+    exporter.clear()
+    middleware = OTELMiddleware(app.handle_request_handler_exception)
+    middleware.end_spans_on_stream_complete(app)
+    app.middlewares.append(middleware)
+
+    @app.on_start
+    async def on_start(application):
+        track_request_route(application.router)
+
+    @app.after_start
+    async def prepare_routes(application):
+        middleware.apply_routes(application.router)
+
+    @app.router.get("/cats/:cat_id")
+    async def get_cat(cat_id: int):
+        return text("Cat")
+
+    @app.router.get("/events")
+    async def events() -> AsyncIterable[ServerSentEvent]:
+        for i in range(3):
+            await asyncio.sleep(0)
+            yield ServerSentEvent({"index": i})
+
+    return app
+
+
+async def test_otel_middleware_spans(otel_app):
+    await otel_app.start()
+
+    for path in ["/cats/1", "/cats/2"]:
+        await otel_app(get_example_scope("GET", path, []), MockReceive(), MockSend())
+
+    spans = exporter.get_finished_spans()
+    assert [span.name for span in spans] == ["GET /cats/:cat_id"] * 2
+    assert spans[0].attributes["http.route"] == "/cats/:cat_id"
+    assert spans[0].attributes["http.method"] == "GET"
+    assert spans[0].attributes["http.status_code"] == 200
+    assert spans[1].attributes["http.path"] == "/cats/2"
+
+
+async def test_otel_middleware_ends_stream_spans_when_sent(otel_app):
+    await otel_app.start()
+    mock_send = MockSend()
+
+    await otel_app(get_example_scope("GET", "/events", []), MockReceive(), mock_send)
+
+    (span,) = exporter.get_finished_spans()
+    assert span.name == "GET /events"
+    assert span.attributes["stream.chunks"] == 3
+    assert span.attributes["stream.completed"] is True
+    assert span.attributes["http.response.body.size"] == sum(
+        len(message.get("body", b"")) for message in mock_send.messages[1:]
+    )
+
+
+async def test_propagation_middleware():
+    request = Request("GET", b"https://example.com", None)
+
+    async def next_handler(request):
+        return request
+
+    await propagation_middleware(request, next_handler)
+    assert request.get_first_header(b"traceparent") is None
+
+    with trace.get_tracer(__name__).start_as_current_span("example") as span:
+        await propagation_middleware(request, next_handler)
+
+    trace_id = format(span.get_span_context().trace_id, "032x")
+    assert trace_id in request.get_first_header(b"traceparent").decode()
+
+
+async def test_client_session_default_middlewares():
+    ClientSession.default_middlewares.append(propagation_middleware)
+    try:
+        async with ClientSession() as client:
+            assert client.middlewares[1] is propagation_middleware
+    finally:
+        ClientSession.default_middlewares.remove(propagation_middleware)
+
+
+async def test_client_session_default_middlewares_registration():
+    ClientSession.add_default_middleware(propagation_middleware)
+    ClientSession.add_default_middleware(propagation_middleware)
+    try:
+        assert ClientSession.default_middlewares.count(propagation_middleware) == 1
+    finally:
+        ClientSession.remove_default_middleware(propagation_middleware)
+
+    assert propagation_middleware not in ClientSession.default_middlewares
+    # removing a middleware that is not registered has no effect
+    ClientSession.remove_default_middleware(propagation_middleware)
+
+
+async def test_use_open_telemetry_registers_propagation_once(monkeypatch):
+    monkeypatch.setattr(otel, "_configure_logging", lambda *args: None)
+    # the tracer provider of the tests must not be shut down on app stop
+    monkeypatch.setattr(provider, "shutdown", lambda: None)
+
+    app = Application()
+    for _ in range(2):
+        use_open_telemetry(app, None, None)  # type: ignore
+    assert ClientSession.default_middlewares.count(propagation_middleware) == 1
+
+    await app.start()
+    await app.stop()
+    assert propagation_middleware not in ClientSession.default_middlewares
+
+
+async def test_otel_middleware_unsampled_spans(otel_app):
+    from opentelemetry.sdk.trace.sampling import ALWAYS_OFF
+
+    otel_app.middlewares[0]._tracer = TracerProvider(sampler=ALWAYS_OFF).get_tracer(
+        __name__
+    )
+    await otel_app.start()
+    mock_send = MockSend()
+
+    await otel_app(get_example_scope("GET", "/events", []), MockReceive(), mock_send)
+
+    assert exporter.get_finished_spans() == ()
+    assert mock_send.messages[0]["status"] == 200
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+
+from shuttleasgi.server.profiling import NO_ROUTE, SamplingProfiler
+from shuttleasgi.server.responses import text
+from shuttleasgi.testing.helpers import get_example_scope
+from shuttleasgi.testing.messages import MockReceive, MockSend
+
+
+def _busy(seconds: float) -> None:
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+
+
+async def _get(app, path, query=b""):
+    mock_send = MockSend()
+    await app(get_example_scope("GET", path, [], query=query), MockReceive(), mock_send)
+    return mock_send
+
+
+def test_sampling_profiler_collects_stacks():
+    profiler = SamplingProfiler(interval=0.002)
+
+    profiler.start()
+    try:
+        _busy(0.1)
+    finally:
+        profiler.stop()
+
+    assert profiler.running is False
+    stacks = profiler.get_collapsed_stacks()
+    assert list(stacks) == [NO_ROUTE]
+    assert any(stack.split(";")[-1].startswith("_busy (") for stack in stacks[NO_ROUTE])
+
+    text = profiler.write_collapsed_stacks()
+    assert text.startswith(f"{NO_ROUTE};")
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in text.splitlines()) > 0
+
+
+async def test_sampling_profiler_tags_routes(app):
+    profiler = SamplingProfiler(interval=0.002)
+    profiler.install(app, path="/_profile")
+
+    @app.router.get("/busy/{name}")
+    async def busy(name: str):
+        await asyncio.sleep(0)
+        _busy(0.1)
+        return text(name)
+
+    await app.start()
+
+    profile = asyncio.create_task(_get(app, "/_profile", b"seconds=0.3"))
+    await asyncio.sleep(0.01)
+    await asyncio.create_task(_get(app, "/busy/example"))
+    mock_send = await profile
+
+    assert mock_send.messages[0]["status"] == 200
+    body = mock_send.messages[1]["body"].decode()
+    assert any(
+        line.startswith("/busy/{name};") and "_busy (" in line
+        for line in body.splitlines()
+    )
+    assert profiler.running is False
+
+
+@pytest.mark.parametrize("query", [b"seconds=0", b"seconds=1000"])
+async def test_sampling_profiler_route_validates_seconds(app, query):
+    SamplingProfiler().install(app, path="/_profile")
+    await app.start()
+
+    mock_send = await _get(app, "/_profile", query)
+
+    assert mock_send.messages[0]["status"] == 400
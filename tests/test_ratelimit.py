@@ -0,0 +1,135 @@
+import pytest
+
+from shuttleasgi.server.application import Application
+from shuttleasgi.server.ratelimit import (
+    InMemoryRateLimitBackend,
+    RateLimit,
+    RateLimitMiddleware,
+    RateLimitStore,
+    SlidingWindowAlgorithm,
+    TokenBucketAlgorithm,
+    key_by_header,
+    rate_limit,
+)
+from shuttleasgi.server.responses import text
+from shuttleasgi.testing.helpers import get_example_scope
+from shuttleasgi.testing.messages import MockReceive, MockSend
+
+
+async def _get(app, path="/", headers=None):
+    mock_send = MockSend()
+    await app(get_example_scope("GET", path, headers or []), MockReceive(), mock_send)
+    return mock_send.messages[0]
+
+
+def test_token_bucket_algorithm():
+    store = RateLimitStore(TokenBucketAlgorithm(2, 1.0))
+
+    assert store.try_acquire("a", 0.0) == 0.0
+    assert store.try_acquire("a", 0.0) == 0.0
+    assert store.try_acquire("a", 0.0) == pytest.approx(0.5)
+    # other keys have their own bucket
+    assert store.try_acquire("b", 0.0) == 0.0
+    # tokens are refilled lazily
+    assert store.try_acquire("a", 0.5) == 0.0
+    assert store.try_acquire("a", 0.5) > 0
+
+
+def test_token_bucket_algorithm_burst():
+    store = RateLimitStore(TokenBucketAlgorithm(1, 1.0, burst=3))
+
+    assert [store.try_acquire("a", 0.0) for _ in range(4)][:3] == [0.0] * 3
+    assert store.try_acquire("a", 0.0) == pytest.approx(1.0)
+
+
+def test_sliding_window_algorithm():
+    store = RateLimitStore(SlidingWindowAlgorithm(2, 10.0))
+
+    assert store.try_acquire("a", 1.0) == 0.0
+    assert store.try_acquire("a", 2.0) == 0.0
+    assert store.try_acquire("a", 3.0) == pytest.approx(7.0)
+
+    # at 15, the previous window weights half: 2 * 0.5 + 0 = 1
+    assert store.try_acquire("a", 15.0) == 0.0
+    assert store.try_acquire("a", 15.0) > 0
+
+    # windows older than the previous one are not counted
+    assert store.try_acquire("a", 40.0) == 0.0
+
+
+def test_store_sweeps_idle_buckets():
+    store = RateLimitStore(TokenBucketAlgorithm(10, 1.0), shards=1, sweep_interval=3)
+
+    store.try_acquire("a", 0.0)
+    store.try_acquire("b", 0.0)
+    assert len(store) == 2
+
+    # "a" and "b" are fully refilled after one second, and evicted
+    store.try_acquire("c", 2.0)
+    assert len(store) == 1
+
+
+def test_store_shards_must_be_power_of_two():
+    with pytest.raises(ValueError):
+        RateLimitStore(TokenBucketAlgorithm(10, 1.0), shards=3)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"limit": 0, "period": 1}, {"limit": 1, "period": 0}, {"algorithm": "leaky"}],
+)
+def test_invalid_rate_limit(kwargs):
+    with pytest.raises(ValueError):
+        RateLimit(**{"limit": 1, "period": 1, **kwargs})
+
+
+@pytest.mark.parametrize("backend", [None, InMemoryRateLimitBackend()])
+async def test_rate_limit_middleware(backend):
+    app = Application()
+    app.middlewares.append(RateLimitMiddleware(backend=backend))
+
+    @rate_limit(2, 60, key=key_by_header("X-API-Key"))
+    @app.router.get("/")
+    async def home():
+        return text("Hello")
+
+    @app.router.get("/free")
+    async def free():
+        return text("Free")
+
+    await app.start()
+    middleware = app.middlewares[0]
+    routes = {route.pattern: route for route in app.router}
+    assert middleware.applies_to(routes[b"/"]) is True
+    assert middleware.applies_to(routes[b"/free"]) is False
+    first_key = [(b"X-API-Key", b"first")]
+
+    assert (await _get(app, headers=first_key))["status"] == 200
+    assert (await _get(app, headers=first_key))["status"] == 200
+
+    response_start = await _get(app, headers=first_key)
+    assert response_start["status"] == 429
+    assert (b"Retry-After", b"30") in response_start["headers"]
+
+    assert (await _get(app, headers=[(b"X-API-Key", b"second")]))["status"] == 200
+    # requests without key are not limited
+    assert (await _get(app))["status"] == 200
+    # handlers without rate limit are not limited
+    for _ in range(3):
+        assert (await _get(app, "/free", headers=first_key))["status"] == 200
+
+
+async def test_rate_limit_middleware_default_limit():
+    app = Application()
+    app.middlewares.append(
+        RateLimitMiddleware(RateLimit(1, 60, algorithm="sliding-window"))
+    )
+
+    @app.router.get("/")
+    async def home():
+        return text("Hello")
+
+    await app.start()
+
+    assert (await _get(app))["status"] == 200
+    assert (await _get(app))["status"] == 429
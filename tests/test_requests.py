@@ -4,7 +4,7 @@ from shuttleasgi import Content, Request, scribe
 from shuttleasgi.contents import FormPart, MultiPartFormData, StreamedContent
 from shuttleasgi.exceptions import BadRequestFormat
 from shuttleasgi.messages import get_absolute_url_to_path, get_request_absolute_url
-from shuttleasgi.scribe import write_request, write_small_request
+from shuttleasgi.scribe import write_request, write_request_parts, write_small_request
 from shuttleasgi.server.asgi import (
     get_request_url,
     get_request_url_from_scope,
@@ -651,3 +651,30 @@ async def test_write_small_request_streamed_fixed_length():
 def test_request_charset(content_type_header, expected_charset):
     request = Request("POST", b"/", [(b"Content-Type", content_type_header.encode())])
     assert request.charset == expected_charset
+
+
+def test_write_request_parts_slices_body_without_copy():
+    body = b"a" * 100_000
+    request = Request("POST", b"https://foo.org/", []).with_content(
+        Content(b"text/plain", body)
+    )
+
+    head, *parts = write_request_parts(request)
+
+    assert bytes(head) == (
+        b"POST / HTTP/1.1\r\nhost: foo.org\r\ncontent-type: text/plain\r\n"
+        b"content-length: 100000\r\n\r\n"
+    )
+    assert [len(part) for part in parts] == [61440, 38560]
+    assert all(part.obj is body for part in parts)
+
+
+def test_write_request_parts_returns_none_for_streamed_content():
+    async def content_gen():
+        yield b"Hello"
+
+    request = Request("POST", b"/", []).with_content(
+        StreamedContent(b"text/plain", content_gen)
+    )
+
+    assert write_request_parts(request) is None
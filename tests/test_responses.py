@@ -186,6 +186,78 @@ async def test_write_http_response(response, cookies, expected_result):
     assert data == expected_result
 
 
+def test_content_headers_are_cached():
+    assert scribe.get_content_length_header(120) is scribe.get_content_length_header(
+        120
+    )
+    assert scribe.get_content_length_header(10**9) == (b"content-length", b"1000000000")
+    assert scribe.get_content_type_header(
+        b"application/json"
+    ) is scribe.get_content_type_header(b"application/json")
+    assert scribe.get_content_type_header(b"") == (
+        b"content-type",
+        b"application/octet-stream",
+    )
+
+
+def test_content_type_headers_with_boundary_are_not_cached():
+    content_type = b"multipart/form-data; boundary=----a1b2c3"
+
+    header = scribe.get_content_type_header(content_type)
+
+    assert header == (b"content-type", content_type)
+    assert scribe.get_content_type_header(content_type) is not header
+
+
+async def test_send_asgi_response_uses_cached_content_headers():
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    for _ in range(2):
+        await scribe.send_asgi_response(
+            Response(200, None, Content(b"application/json", b"{}")), send
+        )
+
+    first, second = [m["headers"] for m in messages if "headers" in m]
+    assert first == [(b"content-type", b"application/json"), (b"content-length", b"2")]
+    assert all(x is y for x, y in zip(first, second))
+
+
+async def test_send_asgi_response_single_message_below_threshold():
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    body = b"x" * 100_000
+    await scribe.send_asgi_response(
+        Response(200, None, Content(b"text/plain", body)), send, 200_000
+    )
+
+    assert len(messages) == 2
+    assert messages[1] == {"type": "http.response.body", "body": body, "more_body": False}
+
+
+async def test_send_asgi_response_chunks_above_threshold():
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    body = b"x" * 25_000
+    await scribe.send_asgi_response(
+        Response(200, None, Content(b"text/plain", body)), send, 10_000
+    )
+
+    body_messages = messages[1:]
+    assert [len(m["body"]) for m in body_messages] == [10_000, 10_000, 5_000]
+    assert [m["more_body"] for m in body_messages] == [True, True, False]
+    assert all(isinstance(m["body"], memoryview) for m in body_messages)
+    assert b"".join(m["body"] for m in body_messages) == body
+
+
 def test_is_redirect():
     # 301 Moved Permanently
     # 302 Found
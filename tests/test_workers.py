@@ -0,0 +1,150 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from shuttleasgi.server import Application
+from shuttleasgi.server.workers import Supervisor, Worker
+
+pytest.importorskip("httptools")
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "fork"), reason="Multiple workers require os.fork"
+)
+
+WORKERS_SCRIPT = """
+import os
+import sys
+
+from shuttleasgi.server import Application
+from shuttleasgi.server.responses import text
+from shuttleasgi.server.workers import run_workers
+
+app = Application()
+started_in = {}
+
+
+@app.on_start
+async def on_start(application):
+    # with preload, the start events run in each worker
+    started_in["pid"] = os.getpid()
+
+
+@app.router.get("/")
+async def home():
+    return text(str(started_in.get("pid")))
+
+
+run_workers(
+    app,
+    port=int(sys.argv[1]),
+    workers=2,
+    preload=True,
+    heartbeat_interval=0.1,
+    heartbeat_timeout=5,
+    health_file=sys.argv[2],
+)
+"""
+
+
+def _get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = condition()
+        if value:
+            return value
+        time.sleep(0.05)
+    raise AssertionError("Timed out waiting for the condition")
+
+
+def _read_health(path: Path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def test_worker_info():
+    info = Worker(0).get_info()
+
+    assert info["alive"] is False
+    assert info["restarts"] == 0
+    assert info["last_exit_code"] is None
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"workers": 0}, {"heartbeat_interval": 2, "heartbeat_timeout": 1}],
+)
+def test_supervisor_invalid_options(kwargs):
+    with pytest.raises(ValueError):
+        Supervisor(Application(), **kwargs)
+
+
+def test_workers_are_supervised(tmp_path):
+    port = _get_free_port()
+    health_path = tmp_path / "health.json"
+    root = Path(__file__).parent.parent
+
+    process = subprocess.Popen(
+        [sys.executable, "-c", WORKERS_SCRIPT, str(port), str(health_path)],
+        cwd=root,
+        env={**os.environ, "PYTHONPATH": str(root)},
+    )
+    try:
+
+        def workers_alive():
+            health = _read_health(health_path)
+            if health and all(worker["alive"] for worker in health["workers"]):
+                return health["workers"]
+
+        workers = _wait_for(workers_alive)
+        pids = {worker["pid"] for worker in workers}
+        assert len(pids) == 2
+
+        def get_pid():
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/") as response:
+                    return int(response.read())
+            except OSError:
+                return None
+
+        assert _wait_for(get_pid) in pids
+
+        # a worker that exits unexpectedly is restarted
+        killed = workers[0]["pid"]
+        os.kill(killed, signal.SIGKILL)
+
+        def worker_restarted():
+            health = _read_health(health_path)
+            worker = health and health["workers"][0]
+            if worker and worker["alive"] and worker["pid"] != killed:
+                return worker
+
+        worker = _wait_for(worker_restarted)
+        assert worker["restarts"] == 1
+        assert worker["last_exit_code"] == -signal.SIGKILL
+        assert _wait_for(get_pid) != killed
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(10) == 0
+
+        health = _read_health(health_path)
+        assert not any(worker["alive"] for worker in health["workers"])
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()